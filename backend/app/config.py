@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, List
+import os
+import re
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: Optional[str]
+    secret_key: str
+    pool_size: int
+    max_overflow: int
+    upload_dir: str
+    archive_dir: str
+    job_result_dir: str
+    settlement_dir: str
+    allowed_origins: List[str]
+    enable_scheduler: bool
+    forecast_hour: int
+    partition_hour: int
+    recurring_hour: int
+    anomaly_hour: int
+    compression_min_size: int
+    edge_database_path: Optional[str]
+    profiling: bool
+    profile_dir: str
+    loop_block_ms: int
+    audit_spool_dir: str
+    enable_job_runner: bool
+    multi_tenant: bool
+    tenant_rls: bool
+    tenant_rate_limit: int
+    tenant_max_connections: int
+    card_dir: str
+    card_workers: int
+    card_font: Optional[str]
+    change_log_retention_days: int
+    
+    @property
+    def edge_mode(self) -> bool:
+        """Outlet offline: backend berjalan di SQLite lokal dan disinkronkan ke central lewat sync.py."""
+        return bool(self.edge_database_path)
+    
+    @property
+    def async_database_url(self) -> str:
+        if self.edge_mode:
+            return f"sqlite+aiosqlite:///{self.edge_database_path}"
+        if not self.database_url:
+            raise ValueError("DATABASE_URL environment variable is required. Make sure Replit PostgreSQL database is provisioned.")
+    
+        url = self.database_url
+        if url.startswith("postgres://"):
+            url = url.replace("postgres://", "postgresql+asyncpg://", 1)
+        elif url.startswith("postgresql://"):
+            url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    
+        if "sslmode=" in url:
+            url = re.sub(r'[&?]sslmode=[^&]*', '', url)
+            if url.endswith('?'):
+                url = url[:-1]
+    
+        return url
+
+def load_settings() -> Settings:
+    allowed_origins = [
+        "http://localhost:5000",
+        "http://localhost:3000",
+        "http://127.0.0.1:5000",
+    ]
+    
+    replit_domains = os.getenv("REPLIT_DOMAINS", "")
+    if replit_domains:
+        for domain in replit_domains.split(","):
+            allowed_origins.append(f"https://{domain.strip()}")
+    
+    return Settings(
+        database_url=os.getenv("DATABASE_URL"),
+        secret_key=os.getenv("SESSION_SECRET", "your-secret-key-change-in-production"),
+        # serve.py membagi max_connections Postgres ke semua worker lewat env ini
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        upload_dir=os.getenv("UPLOAD_DIR", "uploads"),
+        archive_dir=os.getenv("ARCHIVE_DIR", "archive"),
+        # Bukan di bawah UPLOAD_DIR: direktori itu disajikan publik lewat /uploads
+        job_result_dir=os.getenv("JOB_RESULT_DIR", "job_results"),
+        settlement_dir=os.getenv("SETTLEMENT_DIR", "settlements"),
+        allowed_origins=allowed_origins,
+        enable_scheduler=os.getenv("ENABLE_SCHEDULER", "true").lower() in ("1", "true", "yes"),
+        forecast_hour=int(os.getenv("FORECAST_HOUR", "2")),
+        partition_hour=int(os.getenv("PARTITION_HOUR", "1")),
+        recurring_hour=int(os.getenv("RECURRING_HOUR", "3")),
+        anomaly_hour=int(os.getenv("ANOMALY_HOUR", "4")),
+        # Respons lebih kecil dari ini dikirim tanpa kompresi (0 = kompresi semua)
+        compression_min_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+        edge_database_path=os.getenv("EDGE_DATABASE_PATH") or None,
+        # Server-Timing dan X-Profile untuk super_admin; nonaktif = tanpa overhead
+        profiling=os.getenv("PROFILING", "false").lower() in ("1", "true", "yes"),
+        profile_dir=os.getenv("PROFILE_DIR", "profiles"),
+        # Log stack jika event loop terblokir lebih lama dari ini (0 = nonaktif)
+        loop_block_ms=int(os.getenv("LOOP_BLOCK_MS", "0")),
+        # Entri audit yang belum masuk database (antrian penuh, database gagal, shutdown)
+        audit_spool_dir=os.getenv("AUDIT_SPOOL_DIR", "audit_spool"),
+        enable_job_runner=os.getenv("ENABLE_JOB_RUNNER", "true").lower() in ("1", "true", "yes"),
+        multi_tenant=os.getenv("MULTI_TENANT", "false").lower() in ("1", "true", "yes"),
+        # Row-level security Postgres sebagai lapisan kedua isolasi tenant
+        tenant_rls=os.getenv("TENANT_RLS", "false").lower() in ("1", "true", "yes"),
+        # Per worker: request per menit (0 = tanpa batas) dan request bersamaan per tenant,
+        # default separuh pool agar satu tenant tidak bisa memakai semua koneksi
+        tenant_rate_limit=int(os.getenv("TENANT_RATE_LIMIT", "600")),
+        tenant_max_connections=int(os.getenv(
+            "TENANT_MAX_CONNECTIONS",
+            str(max(1, (int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "10"))) // 2))
+        )),
+        # Kartu ringkasan (teks/PNG) per kunci konten; aman dihapus, dibuat ulang saat diminta
+        card_dir=os.getenv("CARD_DIR", "summary_cards"),
+        card_workers=int(os.getenv("CARD_WORKERS", "2")),
+        # File TTF untuk PNG kartu; default font bawaan Pillow
+        card_font=os.getenv("CARD_FONT") or None,
+        # Umur entri change_log di central sebelum dihapus; edge yang tertinggal menerima snapshot (0 = simpan semua)
+        change_log_retention_days=int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30")),
+    )
+
+@lru_cache
+def get_settings() -> Settings:
+    return load_settings()
@@ -1,48 +1,88 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import event, text
 from contextlib import asynccontextmanager
-import os
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is required. Make sure Replit PostgreSQL database is provisioned.")
-
-if DATABASE_URL.startswith("postgres://"):
-    ASYNC_DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+asyncpg://", 1)
-elif DATABASE_URL.startswith("postgresql://"):
-    ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
-else:
-    ASYNC_DATABASE_URL = DATABASE_URL
-
-if "sslmode=" in ASYNC_DATABASE_URL:
-    import re
-    ASYNC_DATABASE_URL = re.sub(r'[&?]sslmode=[^&]*', '', ASYNC_DATABASE_URL)
-    if ASYNC_DATABASE_URL.endswith('?'):
-        ASYNC_DATABASE_URL = ASYNC_DATABASE_URL[:-1]
-
-engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,
-    pool_pre_ping=True,
-    echo=False,
-)
-
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
+from contextvars import ContextVar
+from typing import Optional
+import asyncio
+
+from .config import Settings, get_settings
 
 Base = declarative_base()
 
+# Tenant request/job yang sedang berjalan (mode multi-tenant); None berarti konteks
+# sistem atau single-tenant. Dibaca default kolom tenant_id dan services.tenancy.
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[async_sessionmaker] = None
+
+def init_engine(settings: Optional[Settings] = None) -> AsyncEngine:
+    """Buat engine dan session maker. Dipanggil dari lifespan, bukan saat import."""
+    global _engine, _session_maker
+    
+    settings = settings or get_settings()
+    
+    _engine = create_async_engine(
+        settings.async_database_url,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        echo=False,
+    )
+    if settings.edge_mode:
+        event.listen(_engine.sync_engine, "connect", configure_sqlite)
+    if settings.profiling:
+        from .services.profiling import instrument_engine
+        instrument_engine(_engine.sync_engine)
+    
+    _session_maker = async_sessionmaker(
+        _engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+    
+    return _engine
+
+def configure_sqlite(dbapi_connection, connection_record):
+    # WAL: pembaca tidak menunggu penulis; busy_timeout: penulis antri, bukan "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+def get_engine() -> AsyncEngine:
+    if _engine is None:
+        init_engine()
+    return _engine
+
+def get_session_maker() -> async_sessionmaker:
+    if _session_maker is None:
+        init_engine()
+    return _session_maker
+
+async def dispose_engine():
+    global _engine, _session_maker
+    
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_maker = None
+
+def __getattr__(name: str):
+    # Kompatibilitas untuk kode lama yang mengimpor engine/async_session_maker langsung
+    if name == "engine":
+        return get_engine()
+    if name == "async_session_maker":
+        return get_session_maker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 async def get_db():
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
         try:
             yield session
         finally:
@@ -50,8 +90,17 @@ async def get_db():
 
 @asynccontextmanager
 async def get_db_context():
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
         try:
             yield session
         finally:
             await session.close()
+
+async def warm_pool(size: Optional[int] = None):
+    engine = get_engine()
+    
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    await asyncio.gather(*(ping() for _ in range(size or get_settings().pool_size)))
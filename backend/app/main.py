@@ -2,15 +2,106 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
-from .routers import auth, outlets, sales, expenses
+from .config import get_settings
+from .database import init_engine, dispose_engine, warm_pool
+from .routers import (
+    auth, outlets, sales, expenses, recurring_expenses, analytics, forecast, jobs, anomalies, settlements, sync,
+    profiling, audit, cards
+)
+from .services.audit import start_audit, stop_audit
+from .services.cards import start_card_refresher
+from .services.compression import CompressionMiddleware
+from .services.jobs import start_runner, stop_runner
+from .services.profiling import LoopWatchdog, ProfilingMiddleware
+from .services.partitions import maintain_partitions
+from .services.recurring import nightly_materialize
+from .services.scheduler import run_daily
+from .services.search import ensure_search_index
+from .services.sync import ensure_change_log, prune_change_log
+from .services.tenancy import (
+    TenantLimitMiddleware, TenantLimits, ensure_tenant_policies, for_each_tenant, register_events as register_tenant_events
+)
+
+settings = get_settings()
+
+tenant_limits = TenantLimits(settings.tenant_rate_limit, settings.tenant_max_connections) if settings.multi_tenant else None
 
-os.makedirs("uploads/proofs", exist_ok=True)
+async def nightly_forecast():
+    from .services.forecast import nightly_refresh
+    await for_each_tenant(nightly_refresh)
+
+async def nightly_anomalies():
+    from .services.anomalies import nightly_scan
+    await for_each_tenant(nightly_scan)
+
+async def nightly_recurring():
+    await for_each_tenant(nightly_materialize)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    os.makedirs(os.path.join(settings.upload_dir, "proofs"), exist_ok=True)
+    init_engine(settings)
+    # Buka koneksi pool sebelum menerima traffic supaya request pertama
+    # tidak membayar handshake TCP/TLS ke Postgres.
+    await warm_pool()
+    await maintain_partitions()
+    await ensure_search_index()
+    await ensure_change_log()
+    if settings.multi_tenant:
+        register_tenant_events(settings.tenant_rls)
+        if settings.tenant_rls:
+            await ensure_tenant_policies()
+    # Sebelum scheduler/job runner agar perubahan mereka ikut masuk antrian audit
+    start_audit(settings.audit_spool_dir)
+    
+    watchdog = None
+    if settings.loop_block_ms > 0:
+        watchdog = LoopWatchdog(settings.loop_block_ms / 1000)
+        watchdog.start()
+    
+    background_tasks = []
+    if settings.enable_scheduler:
+        background_tasks.append(asyncio.create_task(
+            run_daily("production_forecasts", settings.forecast_hour, nightly_forecast)
+        ))
+        background_tasks.append(asyncio.create_task(
+            run_daily("partitions", settings.partition_hour, maintain_partitions)
+        ))
+        # Di edge, pengeluaran berulang dibuat oleh central lalu diterima lewat sync
+        if not settings.edge_mode:
+            background_tasks.append(asyncio.create_task(
+                run_daily("recurring_expenses", settings.recurring_hour, nightly_recurring)
+            ))
+        background_tasks.append(asyncio.create_task(
+            run_daily("sales_anomalies", settings.anomaly_hour, nightly_anomalies)
+        ))
+        # Di edge change_log adalah antrian push, dibuang setelah diterima central
+        if not settings.edge_mode:
+            background_tasks.append(asyncio.create_task(
+                run_daily("change_log", settings.partition_hour, prune_change_log)
+            ))
+    if settings.enable_job_runner:
+        background_tasks.append(start_runner())
+    if tenant_limits is not None:
+        background_tasks.append(asyncio.create_task(tenant_limits.run()))
+    if settings.card_workers > 0:
+        background_tasks.append(start_card_refresher(settings.card_dir, settings.card_workers))
+    
     yield
+    
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Job yang sedang berjalan dikembalikan ke antrian sebelum koneksi ditutup
+    await stop_runner()
+    # Sisa antrian audit ditulis (atau ke spool) selagi engine masih terbuka
+    await stop_audit()
+    await dispose_engine()
+    if watchdog is not None:
+        watchdog.stop()
 
 app = FastAPI(
     title="Pukis Monitoring API",
@@ -19,31 +110,39 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-allowed_origins = [
-    "http://localhost:5000",
-    "http://localhost:3000",
-    "http://127.0.0.1:5000",
-]
-
-replit_domains = os.getenv("REPLIT_DOMAINS", "")
-if replit_domains:
-    for domain in replit_domains.split(","):
-        allowed_origins.append(f"https://{domain.strip()}")
+# Di dalam CORS agar respons 429/503 tetap membawa header CORS
+if tenant_limits is not None:
+    app.add_middleware(TenantLimitMiddleware, limits=tenant_limits)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=allowed_origins,
+    allow_origins=settings.allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+if settings.profiling:
+    app.add_middleware(ProfilingMiddleware, profile_dir=settings.profile_dir)
+
+# check_dir=False: direktori dibuat di lifespan, bukan saat import
+app.mount("/uploads", StaticFiles(directory=settings.upload_dir, check_dir=False), name="uploads")
 
 app.include_router(auth.router)
 app.include_router(outlets.router)
 app.include_router(sales.router)
 app.include_router(expenses.router)
+app.include_router(recurring_expenses.router)
+app.include_router(analytics.router)
+app.include_router(forecast.router)
+app.include_router(jobs.router)
+app.include_router(anomalies.router)
+app.include_router(settlements.router)
+app.include_router(sync.router)
+app.include_router(profiling.router)
+app.include_router(audit.router)
+app.include_router(cards.router)
 
 @app.get("/")
 async def root():
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Text, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, String, Integer, BigInteger, Float, DateTime, ForeignKey, ForeignKeyConstraint, Text, Enum, Index, Boolean, JSON
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declared_attr, relationship
 from sqlalchemy.sql import func
 import uuid
 import enum
 
-from ..database import Base
+from ..database import Base, current_tenant
 
 class UserRole(str, enum.Enum):
     super_admin = "super_admin"
@@ -20,7 +23,38 @@ class ExpenseType(str, enum.Enum):
 def generate_uuid():
     return str(uuid.uuid4())
 
-class User(Base):
+def tenant_default():
+    return current_tenant.get()
+
+class Tenant(Base):
+    """Franchise/operator dalam mode multi-tenant (MULTI_TENANT=true)."""
+    __tablename__ = "tenants"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    name = Column(String, nullable=False)
+    # Override batas per tenant; NULL berarti TENANT_RATE_LIMIT / TENANT_MAX_CONNECTIONS
+    rate_limit = Column(Integer, nullable=True)
+    max_connections = Column(Integer, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+class TenantMixin:
+    """
+    Kolom tenant_id untuk semua tabel data. Diisi otomatis dari tenant request/job yang
+    sedang berjalan, dan setiap query ORM dibatasi ke tenant itu (services.tenancy).
+    NULL untuk data single-tenant dan akun platform.
+    """
+    
+    @declared_attr
+    def tenant_id(cls):
+        return Column(String, ForeignKey("tenants.id"), nullable=True, default=tenant_default)
+
+def tenant_outlet_fk(table: str, column: str = "outlet_id") -> ForeignKeyConstraint:
+    """Outlet yang dirujuk harus milik tenant yang sama; tidak dicek selama tenant_id NULL (MATCH SIMPLE)."""
+    return ForeignKeyConstraint(
+        ["tenant_id", column], ["outlets.tenant_id", "outlets.id"], name=f"FK_{table}_tenant_outlet"
+    )
+
+class User(TenantMixin, Base):
     __tablename__ = "users"
     
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -33,21 +67,35 @@ class User(Base):
     assigned_outlet_id = Column(String, ForeignKey("outlets.id"), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     
-    assigned_outlet = relationship("Outlet", back_populates="assigned_users")
+    assigned_outlet = relationship("Outlet", back_populates="assigned_users", foreign_keys=[assigned_outlet_id])
+    
+    __table_args__ = (
+        tenant_outlet_fk("users", "assigned_outlet_id"),
+        Index("IDX_users_tenant", "tenant_id"),
+    )
 
-class Outlet(Base):
+class Outlet(TenantMixin, Base):
     __tablename__ = "outlets"
     
     id = Column(String, primary_key=True, default=generate_uuid)
     name = Column(String, nullable=False)
     cogs_per_piece = Column(Float, default=0)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
-    sales = relationship("Sale", back_populates="outlet", cascade="all, delete-orphan")
-    expenses = relationship("Expense", back_populates="outlet", cascade="all, delete-orphan")
-    assigned_users = relationship("User", back_populates="assigned_outlet")
+    # foreign_keys: tabel anak juga punya FK (tenant_id, outlet_id) ke outlets
+    sales = relationship("Sale", back_populates="outlet", cascade="all, delete-orphan", foreign_keys="Sale.outlet_id")
+    expenses = relationship(
+        "Expense", back_populates="outlet", cascade="all, delete-orphan", foreign_keys="Expense.outlet_id"
+    )
+    assigned_users = relationship("User", back_populates="assigned_outlet", foreign_keys="User.assigned_outlet_id")
+    
+    __table_args__ = (
+        # Tujuan FK (tenant_id, outlet_id) tabel lain, sekaligus daftar outlet per tenant
+        Index("IDX_outlets_tenant_id", "tenant_id", "id", unique=True),
+    )
 
-class Sale(Base):
+class Sale(TenantMixin, Base):
     __tablename__ = "sales"
     
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -68,10 +116,18 @@ class Sale(Base):
     sold_out_time = Column(String, nullable=True)
     
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    outlet = relationship("Outlet", back_populates="sales", foreign_keys=[outlet_id])
     
-    outlet = relationship("Outlet", back_populates="sales")
+    __table_args__ = (
+        tenant_outlet_fk("sales"),
+        Index("IDX_sales_outlet_date", "outlet_id", "date"),
+        # Ringkasan semua outlet tenant per rentang tanggal
+        Index("IDX_sales_tenant_date", "tenant_id", "date"),
+    )
 
-class Expense(Base):
+class Expense(TenantMixin, Base):
     __tablename__ = "expenses"
     
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -82,5 +138,211 @@ class Expense(Base):
     amount = Column(Float, nullable=False)
     proof_url = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    outlet = relationship("Outlet", back_populates="expenses", foreign_keys=[outlet_id])
+    
+    __table_args__ = (
+        tenant_outlet_fk("expenses"),
+        Index("IDX_expenses_outlet_date", "outlet_id", "date"),
+        Index("IDX_expenses_tenant_date", "tenant_id", "date"),
+    )
+
+class OutletCogs(TenantMixin, Base):
+    __tablename__ = "outlet_cogs"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    outlet_id = Column(String, ForeignKey("outlets.id"), nullable=False)
+    effective_from = Column(String, nullable=False)
+    cogs_per_piece = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        tenant_outlet_fk("outlet_cogs"),
+        Index("IDX_outlet_cogs_outlet_effective", "outlet_id", "effective_from", unique=True),
+    )
+
+class ProductionForecast(TenantMixin, Base):
+    __tablename__ = "production_forecasts"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    outlet_id = Column(String, ForeignKey("outlets.id"), nullable=False)
+    weekday = Column(Integer, nullable=False)
+    forecast_demand = Column(Float, default=0)
+    demand_std = Column(Float, default=0)
+    recommended_production = Column(Integer, default=0)
+    observations = Column(Integer, default=0)
+    sold_out_rate = Column(Float, default=0)
+    computed_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        tenant_outlet_fk("production_forecasts"),
+        Index("IDX_production_forecasts_outlet_weekday", "outlet_id", "weekday", unique=True),
+    )
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class Job(TenantMixin, Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    type = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=JobStatus.queued.value)
+    params = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False, default=dict)
+    result = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    result_path = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_by = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("IDX_jobs_status_type", "status", "type", "created_at"),
+        Index("IDX_jobs_created_by", "created_by", "created_at"),
+        Index("IDX_jobs_tenant_created", "tenant_id", "created_at"),
+    )
+
+class RecurringExpense(TenantMixin, Base):
+    """Template pengeluaran berulang (sewa bulanan, gaji) yang dibuat otomatis setiap periode 10-9."""
+    __tablename__ = "recurring_expenses"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    outlet_id = Column(String, ForeignKey("outlets.id"), nullable=False)
+    type = Column(String, nullable=False, default=ExpenseType.bulanan.value)
+    description = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    # Tanggal (1-28) entri dalam periode; 10-28 jatuh di bulan awal periode, 1-9 di bulan berikutnya
+    day_of_month = Column(Integer, nullable=False, default=10)
+    # Awal periode (YYYY-MM-10) pertama dan terakhir yang dibuat; end_period NULL berarti tanpa batas
+    start_period = Column(String, nullable=False)
+    end_period = Column(String, nullable=True)
+    # Awal periode terakhir yang sudah dibuat, penanda idempoten
+    last_period = Column(String, nullable=True)
+    active = Column(Boolean, nullable=False, default=True)
+    created_by = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        tenant_outlet_fk("recurring_expenses"),
+        Index("IDX_recurring_expenses_outlet", "outlet_id"),
+    )
+
+class SalesBaseline(TenantMixin, Base):
+    """Jendela bergulir metrik harian per outlet x hari dalam minggu, untuk deteksi anomali inkremental."""
+    __tablename__ = "sales_baselines"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    outlet_id = Column(String, ForeignKey("outlets.id"), nullable=False)
+    weekday = Column(Integer, nullable=False)
+    # [[tanggal, [nilai per metrik]], ...] terurut tanggal, paling banyak WINDOW entri
+    history = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False, default=list)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        tenant_outlet_fk("sales_baselines"),
+        Index("IDX_sales_baselines_outlet_weekday", "outlet_id", "weekday", unique=True),
+    )
+
+class SalesAnomaly(TenantMixin, Base):
+    __tablename__ = "sales_anomalies"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    outlet_id = Column(String, ForeignKey("outlets.id"), nullable=False)
+    sale_id = Column(String, nullable=True)
+    date = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)
+    score = Column(Float, nullable=False)
+    observations = Column(Integer, nullable=False, default=0)
+    acknowledged = Column(Boolean, nullable=False, default=False)
+    detected_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        tenant_outlet_fk("sales_anomalies"),
+        Index("IDX_sales_anomalies_outlet_date_metric", "outlet_id", "date", "metric", unique=True),
+        Index("IDX_sales_anomalies_tenant_date", "tenant_id", "date"),
+    )
+
+class PlatformAccount(TenantMixin, Base):
+    """Kode toko/merchant di platform delivery untuk mencocokkan file settlement ke outlet."""
+    __tablename__ = "platform_accounts"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    outlet_id = Column(String, ForeignKey("outlets.id"), nullable=False)
+    platform = Column(String, nullable=False)
+    external_id = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        tenant_outlet_fk("platform_accounts"),
+        Index("IDX_platform_accounts_platform_external", "platform", "external_id", unique=True),
+    )
+
+class ChangeLog(TenantMixin, Base):
+    """
+    Baris sales/expenses/outlet_cogs/outlets yang berubah, diisi trigger database.
+    Di central menjadi sumber pull untuk outlet edge; di edge menjadi antrian push.
+    """
+    __tablename__ = "change_log"
+    
+    # INTEGER PRIMARY KEY di SQLite agar tetap autoincrement
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(String, nullable=False)
+    outlet_id = Column(String, nullable=True)
+    # date untuk sales/expenses, effective_from untuk outlet_cogs
+    date = Column(String, nullable=True)
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("IDX_change_log_outlet_id", "outlet_id", "id"),
+        # Pull owner (semua outlet tenant) berurutan id
+        Index("IDX_change_log_tenant_id", "tenant_id", "id"),
+    )
+
+class AuditLog(TenantMixin, Base):
+    """
+    Riwayat perubahan sales/expenses (siapa, kapan, nilai sebelum/sesudah). Diisi
+    services.audit secara batch di luar jalur request, bukan oleh handler.
+    """
+    __tablename__ = "audit_log"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(String, nullable=False)
+    outlet_id = Column(String, nullable=True)
+    date = Column(String, nullable=True)
+    action = Column(String, nullable=False)
+    # Null untuk perubahan oleh scheduler/job sistem
+    user_id = Column(String, nullable=True)
+    # {kolom: [sebelum, sesudah]}
+    changes = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False, default=dict)
+    # Waktu commit di aplikasi, bukan waktu batch ditulis
+    changed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("IDX_audit_log_entity", "entity", "entity_id", "changed_at"),
+        Index("IDX_audit_log_outlet_date", "outlet_id", "date"),
+        Index("IDX_audit_log_changed_at", "changed_at"),
+        Index("IDX_audit_log_tenant_changed_at", "tenant_id", "changed_at"),
+    )
+
+class SyncState(Base):
+    """Cursor push/pull dan penanda penerapan delta; hanya dipakai di database edge."""
+    __tablename__ = "sync_state"
     
-    outlet = relationship("Outlet", back_populates="expenses")
+    name = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
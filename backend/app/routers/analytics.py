@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date
+
+from ..database import get_db
+from ..services.scope import Scope, get_scope
+
+# NumPy diimpor lewat services.analytics di dalam handler agar startup tetap cepat
+
+router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+def validate_range(start_date: str, end_date: str):
+    try:
+        start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format tanggal harus YYYY-MM-DD"
+        )
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tanggal mulai harus sebelum tanggal akhir"
+        )
+
+@router.get("/summary")
+async def get_summary(
+    start_date: str = Query(..., pattern=DATE_PATTERN),
+    end_date: str = Query(..., pattern=DATE_PATTERN),
+    outlet_id: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    from ..services.analytics import load_frame, summarize
+    
+    validate_range(start_date, end_date)
+    frame = await load_frame(db, scope.outlet_ids(outlet_id), start_date, end_date)
+    return summarize(frame, start_date, end_date)
+
+@router.get("/channel-mix")
+async def get_channel_mix(
+    start_date: str = Query(..., pattern=DATE_PATTERN),
+    end_date: str = Query(..., pattern=DATE_PATTERN),
+    outlet_id: Optional[str] = Query(None),
+    by_outlet: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    from ..services.analytics import load_frame, channel_mix
+    
+    validate_range(start_date, end_date)
+    frame = await load_frame(db, scope.outlet_ids(outlet_id), start_date, end_date)
+    return channel_mix(frame, start_date, end_date, by_outlet=by_outlet)
+
+@router.get("/trend")
+async def get_trend(
+    start_date: str = Query(..., pattern=DATE_PATTERN),
+    end_date: str = Query(..., pattern=DATE_PATTERN),
+    outlet_id: Optional[str] = Query(None),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    from ..services.analytics import load_frame, trend
+    
+    validate_range(start_date, end_date)
+    frame = await load_frame(db, scope.outlet_ids(outlet_id), start_date, end_date)
+    return trend(frame, start_date, end_date, granularity=granularity)
+
+@router.get("/outlets")
+async def get_outlet_comparison(
+    start_date: str = Query(..., pattern=DATE_PATTERN),
+    end_date: str = Query(..., pattern=DATE_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    from ..services.analytics import load_frame, outlet_comparison
+    
+    validate_range(start_date, end_date)
+    frame = await load_frame(db, scope.outlet_ids(), start_date, end_date)
+    return outlet_comparison(frame, start_date, end_date)
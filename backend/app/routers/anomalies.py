@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from typing import List, Optional
+
+from ..database import get_db
+from ..models.models import SalesAnomaly, Outlet, User
+from ..schemas.schemas import SalesAnomalyResponse, AnomalyScanParams
+from ..services.auth import require_roles
+from ..services.jobs import submit_job
+from ..services.scope import Scope, get_scope
+
+# NumPy diimpor lewat services.anomalies oleh job runner, bukan di router ini
+
+router = APIRouter(prefix="/api/anomalies", tags=["Anomalies"])
+
+@router.get("", response_model=List[SalesAnomalyResponse])
+async def get_anomalies(
+    outlet_id: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    metric: Optional[str] = Query(None),
+    acknowledged: Optional[bool] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    """Anomali terbaru lebih dulu; skor positif berarti di atas kebiasaan, negatif di bawah."""
+    query = select(SalesAnomaly, Outlet.name).outerjoin(
+        Outlet, SalesAnomaly.outlet_id == Outlet.id
+    ).where(*scope.outlets(SalesAnomaly.outlet_id, outlet_id))
+    
+    if start_date:
+        query = query.where(SalesAnomaly.date >= start_date)
+    if end_date:
+        query = query.where(SalesAnomaly.date <= end_date)
+    if metric:
+        query = query.where(SalesAnomaly.metric == metric)
+    if acknowledged is not None:
+        query = query.where(SalesAnomaly.acknowledged == acknowledged)
+    
+    result = await db.execute(
+        query.order_by(SalesAnomaly.date.desc(), SalesAnomaly.outlet_id, SalesAnomaly.metric).limit(limit)
+    )
+    return [
+        SalesAnomalyResponse.model_validate(anomaly).model_copy(update={"outletName": outlet_name})
+        for anomaly, outlet_name in result.all()
+    ]
+
+@router.post("/{anomaly_id}/acknowledge", response_model=SalesAnomalyResponse)
+async def acknowledge_anomaly(
+    anomaly_id: str,
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    result = await db.execute(
+        update(SalesAnomaly).where(SalesAnomaly.id == anomaly_id, *scope.outlets(SalesAnomaly.outlet_id))
+        .values(acknowledged=True)
+        .returning(SalesAnomaly)
+    )
+    anomaly = result.scalar_one_or_none()
+    
+    if not anomaly:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Anomali tidak ditemukan"
+        )
+    
+    await db.commit()
+    
+    return SalesAnomalyResponse.model_validate(anomaly)
+
+@router.post("/scan", status_code=status.HTTP_202_ACCEPTED)
+async def scan_sales_anomalies(
+    request: AnomalyScanParams,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(["super_admin", "owner"]))
+):
+    # Dijalankan oleh job runner; pantau lewat /api/jobs/{jobId}
+    job = await submit_job(db, current_user, "anomaly_scan", request)
+    return {"message": "Deteksi anomali sedang dijalankan", "jobId": job.id}
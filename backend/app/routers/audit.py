@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from ..database import get_db
+from ..models.models import AuditLog, User
+from ..schemas.schemas import AuditLogResponse
+from ..services.auth import require_roles
+
+router = APIRouter(prefix="/api/audit", tags=["Audit"])
+
+def user_name(user: Optional[User]) -> Optional[str]:
+    if user is None:
+        return None
+    name = " ".join(part for part in (user.first_name, user.last_name) if part)
+    return name or user.email
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # changed_at disimpan sebagai UTC tanpa zona waktu
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@router.get("", response_model=List[AuditLogResponse])
+async def get_audit_log(
+    entity: Optional[str] = Query(None, pattern="^(sales|expenses)$"),
+    entity_id: Optional[str] = Query(None),
+    outlet_id: Optional[str] = Query(None),
+    date: Optional[str] = Query(None, description="Tanggal transaksi (YYYY-MM-DD) yang berubah"),
+    user_id: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None, description="Waktu perubahan, UTC"),
+    end: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(["super_admin", "owner"]))
+):
+    """
+    Perubahan terbaru lebih dulu. Entri muncul beberapa saat setelah commit karena
+    ditulis secara batch; mis. `?entity=sales&outlet_id=...&date=...` untuk siapa yang
+    mengubah angka satu hari.
+    """
+    query = select(AuditLog, User).outerjoin(User, AuditLog.user_id == User.id)
+    
+    if entity:
+        query = query.where(AuditLog.entity == entity)
+    if entity_id:
+        query = query.where(AuditLog.entity_id == entity_id)
+    if outlet_id:
+        query = query.where(AuditLog.outlet_id == outlet_id)
+    if date:
+        query = query.where(AuditLog.date == date)
+    if user_id:
+        query = query.where(AuditLog.user_id == user_id)
+    if start:
+        query = query.where(AuditLog.changed_at >= as_utc(start))
+    if end:
+        query = query.where(AuditLog.changed_at <= as_utc(end))
+    
+    result = await db.execute(query.order_by(AuditLog.changed_at.desc(), AuditLog.id.desc()).limit(limit))
+    return [
+        AuditLogResponse.model_validate(entry).model_copy(update={"userName": user_name(user)})
+        for entry, user in result.all()
+    ]
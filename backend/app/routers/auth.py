@@ -35,7 +35,7 @@ async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
         )
     
     access_token = create_access_token(
-        data={"sub": user.id, "role": user.role},
+        data={"sub": user.id, "role": user.role, "tenant": user.tenant_id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
@@ -58,7 +58,10 @@ async def register_admin(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles(["super_admin"]))
 ):
-    result = await db.execute(select(User).where(User.email == request.email))
+    # Email unik di semua tenant karena login hanya memakai email
+    result = await db.execute(
+        select(User).where(User.email == request.email).execution_options(all_tenants=True)
+    )
     existing_user = result.scalar_one_or_none()
     
     if existing_user:
@@ -77,6 +80,10 @@ async def register_admin(
         password=hashed_password,
         assigned_outlet_id=request.assigned_outlet_id
     )
+    # Hanya akun platform (tanpa tenant) yang boleh membuat user untuk tenant lain;
+    # selain itu tenant_id diisi tenant pembuat
+    if current_user.tenant_id is None and request.tenant_id:
+        new_user.tenant_id = request.tenant_id
     
     db.add(new_user)
     await db.commit()
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import date as date_type
+from typing import Optional
+import os
+
+from ..config import get_settings
+from ..database import get_db
+from ..models.models import Outlet
+from ..schemas.schemas import SummaryCardResponse
+from ..services.cards import CardSpec, card_path, get_card
+from ..services.conditional import CACHE_CONTROL, etag_matches
+from ..services.scope import Scope, get_scope
+
+router = APIRouter(prefix="/api/summary-cards", tags=["Summary Cards"])
+
+# URL file memuat kunci konten, jadi isinya tidak pernah berubah
+IMMUTABLE = "public, max-age=31536000, immutable"
+MEDIA_TYPES = {"png": "image/png", "txt": "text/plain; charset=utf-8"}
+
+@router.get("", response_model=SummaryCardResponse)
+async def get_summary_card(
+    request: Request,
+    response: Response,
+    date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Default hari ini"),
+    outlet_id: Optional[str] = Query(None, description="Kosong berarti semua outlet dalam akses user"),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    """
+    Ringkasan harian + MTD sebagai teks siap salin dan URL gambar. Data yang sama
+    selalu menghasilkan `key` (dan URL) yang sama; ETag-nya juga `key`.
+    """
+    day = date or date_type.today().isoformat()
+    try:
+        date_type.fromisoformat(day)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tanggal tidak valid")
+    
+    if outlet_id:
+        if not scope.can_access_outlet(outlet_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Anda tidak memiliki akses ke outlet ini"
+            )
+        if await db.scalar(select(Outlet.id).where(Outlet.id == outlet_id)) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outlet tidak ditemukan")
+    
+    card = await get_card(db, CardSpec(scope, outlet_id, day))
+    key = card["key"]
+    headers = {"ETag": f'"{key}"', "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    return SummaryCardResponse(
+        key=key,
+        text=card["text"],
+        textUrl=f"{router.prefix}/{key}.txt",
+        imageUrl=f"{router.prefix}/{key}.png" if card["hasImage"] else None,
+        data=card["data"],
+    )
+
+@router.get("/{name}")
+async def get_summary_card_file(name: str = Path(pattern=r"^[0-9a-f]{32}\.(png|txt)$")):
+    """Tanpa login: kunci 128-bit dari HMAC tidak bisa ditebak dan hanya didapat lewat endpoint di atas."""
+    key, extension = name.split(".")
+    path = card_path(get_settings().card_dir, key, extension)
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Kartu tidak ditemukan atau sudah kedaluwarsa; minta ulang ringkasannya"
+        )
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[extension],
+        headers={"Cache-Control": IMMUTABLE, "ETag": f'"{key}.{extension}"'},
+    )
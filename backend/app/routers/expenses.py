@@ -1,99 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete
 from typing import List, Optional
 import os
 import uuid
-import aiofiles
 
+from ..config import get_settings
 from ..database import get_db
 from ..models.models import Expense, User, Outlet
-from ..schemas.schemas import ExpenseCreate, ExpenseUpdate, ExpenseResponse
-from ..services.auth import get_current_user, require_roles
+from ..schemas.schemas import ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseSearchResult
+from ..services.auth import get_current_user
+from ..services.scope import Scope, get_scope
+from ..services.conditional import conditional_get, version_columns
+from ..services.archive import overlapping_years, archive_version, read_archive
+from ..services.search import search_criteria
+from ..services.tenancy import model_columns
 
 router = APIRouter(prefix="/api/expenses", tags=["Expenses"])
 
-UPLOAD_DIR = "uploads/proofs"
-
 @router.get("", response_model=List[ExpenseResponse])
 async def get_expenses(
+    request: Request,
+    response: Response,
     outlet_id: Optional[str] = Query(None),
     outletId: Optional[str] = Query(None),
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
     type: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    effective_outlet_id = outlet_id or outletId
+    filters = scope.expenses(outlet_id or outletId)
+    archive_filters = scope.archive_filters(outlet_id or outletId, expenses=True)
     
-    query = select(Expense, Outlet.name.label("outlet_name")).outerjoin(
-        Outlet, Expense.outlet_id == Outlet.id
-    )
+    if start_date:
+        filters.append(Expense.date >= start_date)
+    if end_date:
+        filters.append(Expense.date <= end_date)
+    if type:
+        filters.append(Expense.type == type)
+        archive_filters.append(("type", "==", type))
     
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id:
-        query = query.where(Expense.outlet_id == current_user.assigned_outlet_id)
-        query = query.where(Expense.type != "gaji")
-    elif effective_outlet_id:
-        query = query.where(Expense.outlet_id == effective_outlet_id)
+    archived = overlapping_years("expenses", start_date, end_date)
     
-    if current_user.role not in ["super_admin", "owner"]:
-        query = query.where(Expense.type != "gaji")
+    not_modified = await conditional_get(
+        request, response, db, scope,
+        *version_columns(Expense, *filters),
+        *version_columns(Outlet),
+        extra=archive_version("expenses", archived)
+    )
+    if not_modified:
+        return not_modified
+    
+    query = select(*model_columns(Expense), Outlet.name.label("outletName")).outerjoin(
+        Outlet, Expense.outlet_id == Outlet.id
+    ).where(*filters).order_by(Expense.date.desc())
+    result = await db.execute(query)
+    rows = [dict(row) for row in result.mappings().all()]
+    
+    if archived:
+        archive_rows = await read_archive("expenses", archived, start_date, end_date, archive_filters)
+        if archive_rows:
+            outlet_result = await db.execute(select(Outlet.id, Outlet.name))
+            outlet_names = dict(outlet_result.all())
+            for row in archive_rows:
+                row["outletName"] = outlet_names.get(row["outlet_id"])
+            rows.extend(archive_rows)
+            rows.sort(key=lambda row: row["date"], reverse=True)
+    
+    return [ExpenseResponse(**row) for row in rows]
+
+@router.get("/search", response_model=List[ExpenseSearchResult])
+async def search_expenses(
+    q: str = Query(..., min_length=2, max_length=100),
+    outlet_id: Optional[str] = Query(None),
+    outletId: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    type: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    """Cari deskripsi pengeluaran, diurutkan dari yang paling mirip. Hanya data aktif, arsip tidak dicari."""
+    keyword = q.strip()
+    if len(keyword) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Kata kunci minimal 2 karakter"
+        )
     
+    filters = scope.expenses(outlet_id or outletId)
     if start_date:
-        query = query.where(Expense.date >= start_date)
+        filters.append(Expense.date >= start_date)
     if end_date:
-        query = query.where(Expense.date <= end_date)
+        filters.append(Expense.date <= end_date)
     if type:
-        query = query.where(Expense.type == type)
+        filters.append(Expense.type == type)
     
-    query = query.order_by(Expense.date.desc())
-    result = await db.execute(query)
-    rows = result.all()
-    
-    expenses_with_outlet = []
-    for expense, outlet_name in rows:
-        expense_dict = {
-            "id": expense.id,
-            "outlet_id": expense.outlet_id,
-            "date": expense.date,
-            "type": expense.type,
-            "description": expense.description,
-            "amount": expense.amount,
-            "proof_url": expense.proof_url,
-            "created_at": expense.created_at,
-            "outletName": outlet_name
-        }
-        expenses_with_outlet.append(ExpenseResponse(**expense_dict))
-    
-    return expenses_with_outlet
+    match, score = await search_criteria(db, keyword)
+    query = select(*model_columns(Expense), Outlet.name.label("outletName")).outerjoin(
+        Outlet, Expense.outlet_id == Outlet.id
+    ).where(match, *filters)
+    
+    if score is not None:
+        query = query.add_columns(score.label("score")).order_by(score.desc(), Expense.date.desc())
+    else:
+        query = query.order_by(Expense.date.desc())
+    
+    result = await db.execute(query.limit(limit))
+    return [ExpenseSearchResult(**row) for row in result.mappings().all()]
+
+def expense_not_found() -> HTTPException:
+    # Baris di luar scope (outlet lain atau gaji) juga 404, agar keberadaannya tidak bocor
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Data pengeluaran tidak ditemukan"
+    )
+
+def check_salary_access(scope: Scope, expense_type: Optional[str], detail: str):
+    if expense_type == "gaji" and not scope.sees_salaries:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=detail
+        )
 
 @router.get("/{expense_id}", response_model=ExpenseResponse)
 async def get_expense(
     expense_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    result = await db.execute(select(Expense).where(Expense.id == expense_id))
+    result = await db.execute(select(Expense).where(Expense.id == expense_id, *scope.expenses()))
     expense = result.scalar_one_or_none()
     
     if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Data pengeluaran tidak ditemukan"
-        )
-    
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != expense.outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data ini"
-        )
-    
-    if expense.type == "gaji" and current_user.role not in ["super_admin", "owner"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data gaji"
-        )
+        raise expense_not_found()
     
     return ExpenseResponse.model_validate(expense)
 
@@ -101,19 +143,17 @@ async def get_expense(
 async def create_expense(
     request: ExpenseCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != request.outlet_id:
+    if not scope.can_access_outlet(request.outlet_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Anda tidak memiliki akses ke outlet ini"
         )
+    if await db.scalar(select(Outlet.id).where(Outlet.id == request.outlet_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outlet tidak ditemukan")
     
-    if request.type == "gaji" and current_user.role not in ["super_admin", "owner"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Hanya owner yang dapat menambahkan pengeluaran gaji"
-        )
+    check_salary_access(scope, request.type, "Hanya owner yang dapat menambahkan pengeluaran gaji")
     
     expense = Expense(**request.model_dump())
     
@@ -128,35 +168,25 @@ async def update_expense(
     expense_id: str,
     request: ExpenseUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    result = await db.execute(select(Expense).where(Expense.id == expense_id))
-    expense = result.scalar_one_or_none()
-    
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Data pengeluaran tidak ditemukan"
-        )
+    update_data = request.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_expense(expense_id, db, scope)
     
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != expense.outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data ini"
-        )
+    check_salary_access(scope, update_data.get("type"), "Anda tidak memiliki akses ke data gaji")
     
-    if expense.type == "gaji" and current_user.role not in ["super_admin", "owner"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data gaji"
-        )
+    result = await db.execute(
+        update(Expense).where(Expense.id == expense_id, *scope.expenses())
+        .values(**update_data)
+        .returning(Expense)
+    )
+    expense = result.scalar_one_or_none()
     
-    update_data = request.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(expense, key, value)
+    if not expense:
+        raise expense_not_found()
     
     await db.commit()
-    await db.refresh(expense)
     
     return ExpenseResponse.model_validate(expense)
 
@@ -164,30 +194,15 @@ async def update_expense(
 async def delete_expense(
     expense_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    result = await db.execute(select(Expense).where(Expense.id == expense_id))
-    expense = result.scalar_one_or_none()
-    
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Data pengeluaran tidak ditemukan"
-        )
+    result = await db.execute(
+        delete(Expense).where(Expense.id == expense_id, *scope.expenses()).returning(Expense.id)
+    )
     
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != expense.outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data ini"
-        )
+    if result.scalar_one_or_none() is None:
+        raise expense_not_found()
     
-    if expense.type == "gaji" and current_user.role not in ["super_admin", "owner"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data gaji"
-        )
-    
-    await db.delete(expense)
     await db.commit()
     
     return {"message": "Data pengeluaran berhasil dihapus"}
@@ -197,11 +212,14 @@ async def upload_proof(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    import aiofiles
+    
+    upload_dir = os.path.join(get_settings().upload_dir, "proofs")
+    os.makedirs(upload_dir, exist_ok=True)
     
     file_extension = os.path.splitext(file.filename)[1]
     unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    file_path = os.path.join(upload_dir, unique_filename)
     
     async with aiofiles.open(file_path, 'wb') as out_file:
         content = await file.read()
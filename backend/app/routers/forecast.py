@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from datetime import date, timedelta
+from typing import Optional
+
+from ..database import get_db
+from ..models.models import ProductionForecast, Outlet, User
+from ..schemas.schemas import ForecastRefreshParams
+from ..services.auth import require_roles
+from ..services.jobs import submit_job
+from ..services.scheduler import exclusive
+from ..services.scope import Scope, get_scope
+
+router = APIRouter(prefix="/api/forecast", tags=["Forecast"])
+
+WEEKDAY_NAMES = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+
+def forecast_to_response(forecast: ProductionForecast, outlet_name: str, target_date: str) -> dict:
+    return {
+        "outletId": forecast.outlet_id,
+        "outletName": outlet_name,
+        "date": target_date,
+        "weekday": forecast.weekday,
+        "weekdayName": WEEKDAY_NAMES[forecast.weekday],
+        "forecastDemand": forecast.forecast_demand,
+        "demandStd": forecast.demand_std,
+        "recommendedProduction": forecast.recommended_production,
+        "observations": forecast.observations,
+        "soldOutRate": forecast.sold_out_rate,
+        "computedAt": forecast.computed_at.isoformat() if forecast.computed_at else None
+    }
+
+@router.get("/production")
+async def get_production_forecast(
+    date_: Optional[str] = Query(None, alias="date", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    outlet_id: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    target_date = date_ or (date.today() + timedelta(days=1)).isoformat()
+    try:
+        target_weekday = date.fromisoformat(target_date).weekday()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format tanggal harus YYYY-MM-DD"
+        )
+    
+    count_query = select(func.count()).select_from(ProductionForecast)
+    if await db.scalar(count_query) == 0:
+        # Belum pernah dihitung (mis. deploy pertama): hitung sekali secara langsung, di
+        # bawah lock yang sama dengan nightly_refresh. Request lain selama perhitungan
+        # menerima daftar kosong, bukan ikut menghitung (dan bentrok di index unik).
+        from ..services.forecast import refresh_forecasts
+        async with exclusive(db, "production_forecasts") as acquired:
+            if not acquired:
+                return []
+            # Request lain mungkin selesai menghitung sebelum lock didapat
+            if await db.scalar(count_query) == 0:
+                await refresh_forecasts(db)
+    
+    query = select(ProductionForecast, Outlet.name).join(
+        Outlet, ProductionForecast.outlet_id == Outlet.id
+    ).where(ProductionForecast.weekday == target_weekday)
+    
+    query = query.where(*scope.outlets(ProductionForecast.outlet_id, outlet_id))
+    
+    result = await db.execute(query.order_by(Outlet.name))
+    return [forecast_to_response(forecast, outlet_name, target_date) for forecast, outlet_name in result.all()]
+
+@router.post("/refresh", status_code=status.HTTP_202_ACCEPTED)
+async def refresh_production_forecast(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(["super_admin", "owner"]))
+):
+    # Dijalankan oleh job runner; pantau lewat /api/jobs/{jobId}
+    job = await submit_job(db, current_user, "forecast_refresh", ForecastRefreshParams())
+    return {"message": "Perkiraan produksi sedang diperbarui", "jobId": job.id}
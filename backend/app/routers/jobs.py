@@ -0,0 +1,145 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+from typing import List, Optional
+import os
+
+from ..database import get_db
+from ..models.models import Job, JobStatus, User
+from ..schemas.schemas import JobCreate, JobResponse
+from ..services.auth import get_current_user
+from ..services.jobs import JOB_TYPES, submit_job, get_runner
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+MEDIA_TYPES = {"csv": "text/csv"}
+
+def job_to_response(job: Job) -> JobResponse:
+    response = JobResponse.model_validate(job)
+    if job.status == JobStatus.succeeded.value and job.result_path:
+        response.download_url = f"/api/jobs/{job.id}/download"
+    return response
+
+async def get_visible_job(db: AsyncSession, job_id: str, current_user: User) -> Job:
+    query = select(Job).where(Job.id == job_id)
+    if current_user.role != "super_admin":
+        query = query.where(Job.created_by == current_user.id)
+    
+    result = await db.execute(query)
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job tidak ditemukan"
+        )
+    return job
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    request: JobCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job_type = JOB_TYPES.get(request.type)
+    if not job_type:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Jenis job harus salah satu dari: {', '.join(JOB_TYPES)}"
+        )
+    
+    if current_user.role not in job_type.roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Anda tidak memiliki akses untuk fitur ini"
+        )
+    
+    try:
+        params = job_type.params(**request.params)
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=exc.errors(include_url=False, include_context=False)
+        )
+    
+    job = await submit_job(db, current_user, request.type, params)
+    return job_to_response(job)
+
+@router.get("", response_model=List[JobResponse])
+async def get_jobs(
+    status_: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = select(Job)
+    if current_user.role != "super_admin":
+        query = query.where(Job.created_by == current_user.id)
+    if status_:
+        query = query.where(Job.status == status_)
+    
+    result = await db.execute(query.order_by(Job.created_at.desc()).limit(limit))
+    return [job_to_response(job) for job in result.scalars().all()]
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return job_to_response(await get_visible_job(db, job_id, current_user))
+
+@router.get("/{job_id}/download")
+async def download_job_result(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await get_visible_job(db, job_id, current_user)
+    
+    if job.status != JobStatus.succeeded.value or not job.result_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Hasil job belum tersedia"
+        )
+    if not os.path.exists(job.result_path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="File hasil job sudah dihapus"
+        )
+    
+    extension = JOB_TYPES[job.type].output
+    created = job.created_at.strftime("%Y%m%d-%H%M%S") if job.created_at else job.id
+    return FileResponse(
+        job.result_path,
+        media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+        filename=f"{job.type}-{created}.{extension}"
+    )
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await get_visible_job(db, job_id, current_user)
+    
+    # Job antrian langsung dibatalkan; job berjalan ditandai dan dihentikan oleh
+    # worker yang menjalankannya (segera jika di proses ini, atau saat heartbeat)
+    await db.execute(
+        update(Job).where(Job.id == job.id, Job.status == JobStatus.queued.value)
+        .values(status=JobStatus.cancelled.value, finished_at=func.now())
+    )
+    await db.execute(
+        update(Job).where(Job.id == job.id, Job.status == JobStatus.running.value)
+        .values(cancel_requested=True)
+    )
+    await db.commit()
+    
+    runner = get_runner()
+    if runner is not None:
+        runner.cancel_local(job.id)
+    
+    await db.refresh(job)
+    return job_to_response(job)
@@ -1,26 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 
 from ..database import get_db
-from ..models.models import Outlet, User
-from ..schemas.schemas import OutletCreate, OutletUpdate, OutletResponse
-from ..services.auth import get_current_user, require_roles
+from ..models.models import Outlet, OutletCogs, User
+from ..schemas.schemas import OutletCreate, OutletUpdate, OutletResponse, OutletCogsCreate, OutletCogsResponse
+from ..services.auth import require_roles
+from ..services.scope import Scope, get_scope
+from ..services.conditional import conditional_get, version_columns
+from ..services.cogs import set_outlet_cogs
 
 router = APIRouter(prefix="/api/outlets", tags=["Outlets"])
 
 @router.get("", response_model=List[OutletResponse])
 async def get_outlets(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id:
-        result = await db.execute(
-            select(Outlet).where(Outlet.id == current_user.assigned_outlet_id)
-        )
-    else:
-        result = await db.execute(select(Outlet).order_by(Outlet.name))
+    filters = scope.outlets(Outlet.id)
+    
+    not_modified = await conditional_get(
+        request, response, db, scope,
+        *version_columns(Outlet, *filters)
+    )
+    if not_modified:
+        return not_modified
+    
+    result = await db.execute(select(Outlet).where(*filters).order_by(Outlet.name))
     
     outlets = result.scalars().all()
     return [OutletResponse.model_validate(o) for o in outlets]
@@ -29,9 +38,9 @@ async def get_outlets(
 async def get_outlet(
     outlet_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    result = await db.execute(select(Outlet).where(Outlet.id == outlet_id))
+    result = await db.execute(select(Outlet).where(Outlet.id == outlet_id, *scope.outlets(Outlet.id)))
     outlet = result.scalar_one_or_none()
     
     if not outlet:
@@ -40,12 +49,6 @@ async def get_outlet(
             detail="Outlet tidak ditemukan"
         )
     
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke outlet ini"
-        )
-    
     return OutletResponse.model_validate(outlet)
 
 @router.post("", response_model=OutletResponse)
@@ -83,14 +86,53 @@ async def update_outlet(
     
     if request.name is not None:
         outlet.name = request.name
-    if request.cogs_per_piece is not None:
-        outlet.cogs_per_piece = request.cogs_per_piece
+    if request.cogs_per_piece is not None or request.cogs_effective_from is not None:
+        # Dibandingkan dengan timeline pada tanggal berlaku, bukan nilai hari ini: nilai yang
+        # sama dengan hari ini bisa membatalkan perubahan terjadwal. Tanpa cogs_per_piece,
+        # nilai hari ini berlaku mulai cogs_effective_from.
+        cogs_per_piece = request.cogs_per_piece if request.cogs_per_piece is not None else outlet.cogs_per_piece or 0
+        await set_outlet_cogs(db, outlet, cogs_per_piece, request.cogs_effective_from)
     
     await db.commit()
     await db.refresh(outlet)
     
     return OutletResponse.model_validate(outlet)
 
+@router.get("/{outlet_id}/cogs", response_model=List[OutletCogsResponse])
+async def get_outlet_cogs_history(
+    outlet_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(["super_admin", "owner", "finance"]))
+):
+    result = await db.execute(
+        select(OutletCogs)
+        .where(OutletCogs.outlet_id == outlet_id)
+        .order_by(OutletCogs.effective_from.desc())
+    )
+    return [OutletCogsResponse.model_validate(entry) for entry in result.scalars().all()]
+
+@router.post("/{outlet_id}/cogs", response_model=OutletCogsResponse)
+async def create_outlet_cogs(
+    outlet_id: str,
+    request: OutletCogsCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(["super_admin", "owner"]))
+):
+    result = await db.execute(select(Outlet).where(Outlet.id == outlet_id))
+    outlet = result.scalar_one_or_none()
+    
+    if not outlet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Outlet tidak ditemukan"
+        )
+    
+    entry = await set_outlet_cogs(db, outlet, request.cogs_per_piece, request.effective_from)
+    await db.commit()
+    await db.refresh(entry)
+    
+    return OutletCogsResponse.model_validate(entry)
+
 @router.delete("/{outlet_id}")
 async def delete_outlet(
     outlet_id: str,
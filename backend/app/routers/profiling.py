@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
+from fastapi.responses import PlainTextResponse, Response
+import asyncio
+import os
+
+from ..config import get_settings
+from ..models.models import User
+from ..services.auth import require_roles
+from ..services.profiling import PROFILE_ROLES, list_profiles, parse_collapsed, profile_path, render_flamegraph
+
+router = APIRouter(prefix="/api/profiles", tags=["Profiling"])
+
+def read_profile(profile_id: str) -> str:
+    path = profile_path(get_settings().profile_dir, profile_id)
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profil tidak ditemukan (profil disimpan per server, maksimal 50 terakhir)"
+        )
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+@router.get("")
+async def get_profiles(current_user: User = Depends(require_roles(PROFILE_ROLES))):
+    return await asyncio.to_thread(list_profiles, get_settings().profile_dir)
+
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str = Path(pattern=r"^[0-9a-f]{32}$"),
+    format: str = Query("svg", pattern="^(svg|collapsed)$"),
+    current_user: User = Depends(require_roles(PROFILE_ROLES))
+):
+    """Hasil `X-Profile: 1`: flamegraph SVG, atau collapsed stack untuk speedscope/flamegraph.pl."""
+    collapsed = await asyncio.to_thread(read_profile, profile_id)
+    if format == "collapsed":
+        return PlainTextResponse(collapsed)
+    
+    svg = await asyncio.to_thread(render_flamegraph, parse_collapsed(collapsed))
+    return Response(svg, media_type="image/svg+xml")
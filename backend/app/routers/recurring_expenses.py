@@ -0,0 +1,172 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+from typing import List, Optional
+from datetime import date
+
+from ..database import get_db
+from ..models.models import RecurringExpense, Outlet, User
+from ..schemas.schemas import (
+    RecurringExpenseCreate, RecurringExpenseUpdate, RecurringExpenseResponse,
+    RecurringMaterializeRequest, RecurringMaterializeResponse, RecurringEntry
+)
+from ..services.auth import require_roles
+from ..services.scope import Scope
+from ..services.recurring import period_start, period_end, materialize
+
+router = APIRouter(prefix="/api/recurring-expenses", tags=["Recurring Expenses"])
+
+MANAGER_ROLES = ["super_admin", "owner", "finance"]
+RECURRING_TYPES = ["bulanan", "gaji"]
+
+def parse_period(value: Optional[str], default: Optional[date] = None) -> Optional[date]:
+    """Tanggal mana pun dibulatkan ke awal periodenya (tanggal 10)."""
+    if not value:
+        return default
+    try:
+        return period_start(date.fromisoformat(value))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format tanggal harus YYYY-MM-DD"
+        )
+
+def template_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Pengeluaran berulang tidak ditemukan"
+    )
+
+@router.get("", response_model=List[RecurringExpenseResponse])
+async def get_recurring_expenses(
+    outlet_id: Optional[str] = Query(None),
+    active: Optional[bool] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    query = select(RecurringExpense).where(
+        *Scope.for_user(current_user).expenses(outlet_id, model=RecurringExpense)
+    )
+    if active is not None:
+        query = query.where(RecurringExpense.active == active)
+    
+    result = await db.execute(query.order_by(RecurringExpense.outlet_id, RecurringExpense.description))
+    return [RecurringExpenseResponse.model_validate(template) for template in result.scalars().all()]
+
+@router.post("", response_model=RecurringExpenseResponse)
+async def create_recurring_expense(
+    request: RecurringExpenseCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    if request.type not in RECURRING_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Jenis pengeluaran berulang harus 'bulanan' atau 'gaji'"
+        )
+    if request.type == "gaji" and not Scope.for_user(current_user).sees_salaries:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya owner yang dapat menambahkan pengeluaran gaji"
+        )
+    if await db.scalar(select(Outlet.id).where(Outlet.id == request.outlet_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outlet tidak ditemukan")
+    
+    start = parse_period(request.start_period, period_start(date.today()))
+    end = parse_period(request.end_period)
+    if end and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Periode akhir tidak boleh sebelum periode awal"
+        )
+    
+    template = RecurringExpense(
+        **request.model_dump(exclude={"start_period", "end_period"}),
+        start_period=start.isoformat(),
+        end_period=end.isoformat() if end else None,
+        created_by=current_user.id
+    )
+    
+    db.add(template)
+    await db.commit()
+    await db.refresh(template)
+    
+    return RecurringExpenseResponse.model_validate(template)
+
+@router.patch("/{template_id}", response_model=RecurringExpenseResponse)
+async def update_recurring_expense(
+    template_id: str,
+    request: RecurringExpenseUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    # Perubahan hanya berlaku untuk periode yang belum dibuat
+    update_data = request.model_dump(exclude_unset=True)
+    if "end_period" in update_data:
+        end = parse_period(update_data["end_period"])
+        update_data["end_period"] = end.isoformat() if end else None
+    
+    scope = Scope.for_user(current_user).expenses(model=RecurringExpense)
+    if not update_data:
+        result = await db.execute(select(RecurringExpense).where(RecurringExpense.id == template_id, *scope))
+    else:
+        result = await db.execute(
+            update(RecurringExpense).where(RecurringExpense.id == template_id, *scope)
+            .values(**update_data)
+            .returning(RecurringExpense)
+        )
+    template = result.scalar_one_or_none()
+    
+    if not template:
+        raise template_not_found()
+    
+    await db.commit()
+    
+    return RecurringExpenseResponse.model_validate(template)
+
+@router.delete("/{template_id}")
+async def delete_recurring_expense(
+    template_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    # Entri pengeluaran yang sudah dibuat tidak ikut terhapus
+    result = await db.execute(
+        delete(RecurringExpense).where(
+            RecurringExpense.id == template_id,
+            *Scope.for_user(current_user).expenses(model=RecurringExpense)
+        ).returning(RecurringExpense.id)
+    )
+    
+    if result.scalar_one_or_none() is None:
+        raise template_not_found()
+    
+    await db.commit()
+    
+    return {"message": "Pengeluaran berulang berhasil dihapus"}
+
+@router.post("/materialize", response_model=RecurringMaterializeResponse)
+async def materialize_recurring_expenses(
+    request: RecurringMaterializeRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    """
+    Buat semua entri yang jatuh tempo sampai periode `as_of` (default hari ini).
+    Aman dijalankan ulang; `dry_run` hanya menampilkan entri yang akan dibuat.
+    """
+    target = parse_period(request.as_of, period_start(date.today()))
+    rows = await materialize(
+        db, target, dry_run=request.dry_run,
+        filters=Scope.for_user(current_user).expenses(model=RecurringExpense)
+    )
+    if not request.dry_run:
+        await db.commit()
+    
+    return RecurringMaterializeResponse(
+        period_start=target.isoformat(),
+        period_end=period_end(target).isoformat(),
+        dry_run=request.dry_run,
+        count=len(rows),
+        entries=[RecurringEntry(**row) for row in rows]
+    )
@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional, Any
+from sqlalchemy import select, update, delete
+from typing import Callable, Dict, List, Optional, Tuple, Any
+from types import SimpleNamespace
 
 from ..database import get_db
-from ..models.models import Sale, Outlet, User
+from ..models.models import Sale, Outlet, OutletCogs
 from ..schemas.schemas import SaleCreate, SaleUpdate
-from ..services.auth import get_current_user
+from ..services.scope import Scope, get_scope
+from ..services.conditional import conditional_get, version_columns
+from ..services.cogs import get_cogs_index, join_effective_cogs
+from ..services.archive import overlapping_years, archive_version, read_archive
+from ..services.profiling import stage
+from ..services.tenancy import model_columns
 
 router = APIRouter(prefix="/api/sales", tags=["Sales"])
 
-def sale_to_response(sale: Sale, outlet: Outlet = None) -> dict:
-    cogs_per_piece = outlet.cogs_per_piece if outlet else 0
+CHANNELS = ["cash", "qris", "grab", "gofood", "shopee", "tiktok"]
+
+def sale_to_response(sale: Sale, outlet: Outlet = None, cogs_per_piece: Optional[float] = None) -> dict:
+    if cogs_per_piece is None:
+        cogs_per_piece = outlet.cogs_per_piece if outlet else 0
     outlet_name = outlet.name if outlet else None
     
     total_revenue = sale.cash + sale.qris + sale.grab + sale.gofood + sale.shopee + sale.tiktok
@@ -45,79 +54,225 @@ def sale_to_response(sale: Sale, outlet: Outlet = None) -> dict:
 
 @router.get("")
 async def get_sales(
+    request: Request,
+    response: Response,
     outlet_id: Optional[str] = Query(None),
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
-    date: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    fields: Optional[str] = Query(None, description="Daftar field dipisah koma, mis. date,outletId,totalRevenue"),
+    format: str = Query("rows", pattern="^(rows|columnar)$"),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    query = select(Sale)
-    
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id:
-        query = query.where(Sale.outlet_id == current_user.assigned_outlet_id)
-    elif outlet_id:
-        query = query.where(Sale.outlet_id == outlet_id)
+    """
+    `fields` membatasi field tiap baris sekaligus kolom yang di-SELECT.
+    `format=columnar` mengembalikan satu array per field ditambah kamus outlet,
+    tanpa outletName berulang di setiap baris.
+    """
+    selected = parse_fields(fields)
+    filters = scope.sales(outlet_id)
     
     if date:
-        query = query.where(Sale.date == date)
+        filters.append(Sale.date == date)
     if start_date:
-        query = query.where(Sale.date >= start_date)
+        filters.append(Sale.date >= start_date)
     if end_date:
-        query = query.where(Sale.date <= end_date)
+        filters.append(Sale.date <= end_date)
+    
+    archive_start = max(filter(None, [date, start_date]), default=None)
+    archive_end = min(filter(None, [date, end_date]), default=None)
+    archived = overlapping_years("sales", archive_start, archive_end)
+    
+    not_modified = await conditional_get(
+        request, response, db, scope,
+        *version_columns(Sale, *filters),
+        *version_columns(Outlet),
+        *version_columns(OutletCogs),
+        extra=archive_version("sales", archived)
+    )
+    if not_modified:
+        return not_modified
     
-    query = query.order_by(Sale.date.desc())
-    result = await db.execute(query)
-    sales = result.scalars().all()
+    projected = selected is not None or format == "columnar"
+    if not projected:
+        result = await db.execute(scoped_sales_query(*filters).order_by(Sale.date.desc()))
+        with stage("serialize"):
+            sales = [sale_to_response(sale, outlet, cogs) for sale, outlet, cogs in result.all()]
+    else:
+        keys = selected or list(SALE_FIELDS)
+        if format == "columnar":
+            keys = list(dict.fromkeys([*keys, "outletId", "outletName"]))
+        # date dibutuhkan untuk menggabungkan urutan dengan arsip
+        internal = keys if "date" in keys or not archived else [*keys, "date"]
     
-    results = []
-    for sale in sales:
-        outlet_result = await db.execute(select(Outlet).where(Outlet.id == sale.outlet_id))
-        outlet = outlet_result.scalar_one_or_none()
-        results.append(sale_to_response(sale, outlet))
+        result = await db.execute(projected_sales_query(internal, *filters).order_by(Sale.date.desc()))
+        with stage("serialize"):
+            sales = [project_sale(row, internal) for row in result.all()]
     
-    return results
+    if archived:
+        archive_filters = scope.archive_filters(outlet_id)
+        archive_rows = await archived_sales(db, archived, archive_start, archive_end, archive_filters)
+        if projected:
+            archive_rows = [{key: row[key] for key in internal} for row in archive_rows]
+        sales.extend(archive_rows)
+        sales.sort(key=lambda sale: sale["date"], reverse=True)
+        if projected and internal is not keys:
+            for sale in sales:
+                del sale["date"]
+    
+    if format == "columnar":
+        return to_columnar(sales, keys)
+    return sales
 
-@router.get("/{sale_id}")
-async def get_sale(
-    sale_id: str,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    result = await db.execute(select(Sale).where(Sale.id == sale_id))
-    sale = result.scalar_one_or_none()
+def revenue_of(row) -> float:
+    return sum(getattr(row, channel) for channel in CHANNELS)
+
+def gross_margin_of(row) -> float:
+    return revenue_of(row) - row.total_sold * row.effective_cogs
+
+def gross_margin_percentage_of(row) -> float:
+    revenue = revenue_of(row)
+    return round(gross_margin_of(row) / revenue * 100, 2) if revenue > 0 else 0
+
+# Field respons -> (kolom yang dibutuhkan, nilai). Perhitungan sama dengan sale_to_response;
+# outlet_name dan effective_cogs hanya di-join jika ada field yang membutuhkannya.
+SALE_FIELDS: Dict[str, Tuple[List[str], Callable[[Any], Any]]] = {
+    "id": (["id"], lambda row: row.id),
+    "outletId": (["outlet_id"], lambda row: row.outlet_id),
+    "date": (["date"], lambda row: row.date),
+    **{channel: ([channel], lambda row, channel=channel: getattr(row, channel)) for channel in CHANNELS},
+    "totalSold": (["total_sold"], lambda row: row.total_sold),
+    "remaining": (["remaining"], lambda row: row.remaining),
+    "returned": (["returned"], lambda row: row.returned),
+    "totalProduction": (["total_production"], lambda row: row.total_production),
+    "soldOutTime": (["sold_out_time"], lambda row: row.sold_out_time),
+    "createdAt": (["created_at"], lambda row: row.created_at.isoformat() if row.created_at else None),
+    "totalRevenue": (CHANNELS, revenue_of),
+    "cogsSold": (["total_sold", "effective_cogs"], lambda row: row.total_sold * row.effective_cogs),
+    "grossMargin": ([*CHANNELS, "total_sold", "effective_cogs"], gross_margin_of),
+    "grossMarginPercentage": ([*CHANNELS, "total_sold", "effective_cogs"], gross_margin_percentage_of),
+    "outletName": (["outlet_name"], lambda row: row.outlet_name),
+    "cogsPerPiece": (["effective_cogs"], lambda row: row.effective_cogs),
+}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if fields is None:
+        return None
     
-    if not sale:
+    selected = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in selected if name not in SALE_FIELDS]
+    if unknown or not selected:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Data penjualan tidak ditemukan"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Field tidak dikenal: {', '.join(unknown) or '-'}. Pilihan: {', '.join(SALE_FIELDS)}"
         )
+    return selected
+
+def projected_sales_query(keys: List[str], *criteria):
+    """SELECT hanya kolom yang dibutuhkan field `keys`; join outlet/COGS hanya jika perlu."""
+    columns = {column for key in keys for column in SALE_FIELDS[key][0]}
+    query = select(*[
+        column for column in model_columns(Sale) if column.key in columns or column.key == "date"
+    ])
     
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != sale.outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data ini"
-        )
+    if columns & {"outlet_name", "effective_cogs"}:
+        query = query.outerjoin(Outlet, Sale.outlet_id == Outlet.id)
+    if "outlet_name" in columns:
+        query = query.add_columns(Outlet.name.label("outlet_name"))
+    if "effective_cogs" in columns:
+        query, effective_cogs = join_effective_cogs(query)
+        query = query.add_columns(effective_cogs)
+    return query.where(*criteria)
+
+def project_sale(row, keys: List[str]) -> dict:
+    return {key: SALE_FIELDS[key][1](row) for key in keys}
+
+def to_columnar(sales: List[dict], keys: List[str]) -> dict:
+    """Satu array per field; nama outlet sekali per outlet di `outlets`, bukan per baris."""
+    keys = [key for key in keys if key != "outletName"]
+    return {
+        "fields": keys,
+        "count": len(sales),
+        "outlets": {sale["outletId"]: sale["outletName"] for sale in sales},
+        "columns": {key: [sale[key] for sale in sales] for key in keys},
+    }
+
+def scoped_sales_query(*criteria):
+    """Sale beserta outlet dan COGS yang berlaku pada tanggalnya, dalam satu query."""
+    query = select(Sale, Outlet).outerjoin(Outlet, Sale.outlet_id == Outlet.id)
+    query, effective_cogs = join_effective_cogs(query)
+    return query.add_columns(effective_cogs).where(*criteria)
+
+async def archived_sales(db: AsyncSession, years: List[int], start_date, end_date, filters) -> List[dict]:
+    """Baris dari arsip Parquet, dengan HPP per tanggal dari riwayat COGS."""
+    rows = await read_archive("sales", years, start_date, end_date, filters)
+    if not rows:
+        return []
+    
+    outlet_result = await db.execute(select(Outlet))
+    outlets = {outlet.id: outlet for outlet in outlet_result.scalars().all()}
+    cogs_index = await get_cogs_index(db)
     
+    return [
+        sale_to_response(
+            SimpleNamespace(**row),
+            outlets.get(row["outlet_id"]),
+            cogs_index.lookup(row["outlet_id"], row["date"])
+        )
+        for row in rows
+    ]
+
+async def saved_sale_response(db: AsyncSession, sale: Sale) -> dict:
     outlet_result = await db.execute(select(Outlet).where(Outlet.id == sale.outlet_id))
     outlet = outlet_result.scalar_one_or_none()
+    cogs_index = await get_cogs_index(db)
     
-    return sale_to_response(sale, outlet)
+    return sale_to_response(sale, outlet, cogs_index.lookup(sale.outlet_id, sale.date))
+
+async def observe_sale(outlet_id: str, sale_date: str, sale: Optional[Sale] = None):
+    """Perbarui anomali dan jendela outlet x hari setelah sale tersimpan (NumPy diimpor saat dipakai)."""
+    from ..services.anomalies import observe_after_commit
+    await observe_after_commit(outlet_id, sale_date, sale)
+
+def sale_not_found() -> HTTPException:
+    # Baris di luar scope juga 404, agar keberadaannya tidak bocor
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Data penjualan tidak ditemukan"
+    )
+
+@router.get("/{sale_id}")
+async def get_sale(
+    sale_id: str,
+    db: AsyncSession = Depends(get_db),
+    scope: Scope = Depends(get_scope)
+):
+    result = await db.execute(scoped_sales_query(Sale.id == sale_id, *scope.sales()))
+    row = result.one_or_none()
+    
+    if not row:
+        raise sale_not_found()
+    
+    sale, outlet, cogs = row
+    return sale_to_response(sale, outlet, cogs)
 
 @router.post("")
 async def create_sale(
     request: SaleCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != request.outlet_id:
+    if not scope.can_access_outlet(request.outlet_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Anda tidak memiliki akses ke outlet ini"
         )
+    if await db.scalar(select(Outlet.id).where(Outlet.id == request.outlet_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outlet tidak ditemukan")
     
     existing_result = await db.execute(
-        select(Sale).where(
+        select(Sale.id).where(
             Sale.outlet_id == request.outlet_id,
             Sale.date == request.date
         )
@@ -135,68 +290,51 @@ async def create_sale(
     db.add(sale)
     await db.commit()
     await db.refresh(sale)
+    await observe_sale(sale.outlet_id, sale.date, sale)
     
-    outlet_result = await db.execute(select(Outlet).where(Outlet.id == sale.outlet_id))
-    outlet = outlet_result.scalar_one_or_none()
-    
-    return sale_to_response(sale, outlet)
+    return await saved_sale_response(db, sale)
 
 @router.patch("/{sale_id}")
 async def update_sale(
     sale_id: str,
     request: SaleUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    result = await db.execute(select(Sale).where(Sale.id == sale_id))
+    update_data = request.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_sale(sale_id, db, scope)
+    
+    result = await db.execute(
+        update(Sale).where(Sale.id == sale_id, *scope.sales())
+        .values(**update_data)
+        .returning(Sale)
+    )
     sale = result.scalar_one_or_none()
     
     if not sale:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Data penjualan tidak ditemukan"
-        )
-    
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != sale.outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data ini"
-        )
-    
-    update_data = request.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(sale, key, value)
+        raise sale_not_found()
     
     await db.commit()
-    await db.refresh(sale)
+    await observe_sale(sale.outlet_id, sale.date, sale)
     
-    outlet_result = await db.execute(select(Outlet).where(Outlet.id == sale.outlet_id))
-    outlet = outlet_result.scalar_one_or_none()
-    
-    return sale_to_response(sale, outlet)
+    return await saved_sale_response(db, sale)
 
 @router.delete("/{sale_id}")
 async def delete_sale(
     sale_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    scope: Scope = Depends(get_scope)
 ):
-    result = await db.execute(select(Sale).where(Sale.id == sale_id))
-    sale = result.scalar_one_or_none()
-    
-    if not sale:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Data penjualan tidak ditemukan"
-        )
+    result = await db.execute(
+        delete(Sale).where(Sale.id == sale_id, *scope.sales()).returning(Sale.outlet_id, Sale.date)
+    )
+    deleted = result.one_or_none()
     
-    if current_user.role == "admin_outlet" and current_user.assigned_outlet_id != sale.outlet_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Anda tidak memiliki akses ke data ini"
-        )
+    if deleted is None:
+        raise sale_not_found()
     
-    await db.delete(sale)
     await db.commit()
+    await observe_sale(deleted.outlet_id, deleted.date)
     
     return {"message": "Data penjualan berhasil dihapus"}
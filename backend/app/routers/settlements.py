@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+import os
+import uuid
+
+from ..config import get_settings
+from ..database import get_db
+from ..models.models import PlatformAccount, Outlet, User
+from ..schemas.schemas import SettlementReconcileParams, PlatformAccountCreate, PlatformAccountResponse
+from ..services.auth import require_roles
+from ..services.jobs import submit_job
+from ..services.scope import Scope
+from ..services.settlements import PLATFORMS
+
+router = APIRouter(prefix="/api/settlements", tags=["Settlements"])
+
+MANAGER_ROLES = ["super_admin", "owner", "finance"]
+CHUNK_SIZE = 1024 * 1024
+
+def check_platform(platform: Optional[str]):
+    if platform is not None and platform not in PLATFORMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Platform harus salah satu dari: {', '.join(PLATFORMS)}"
+        )
+
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_settlement(
+    file: UploadFile = File(...),
+    platform: Optional[str] = Form(None),
+    outlet_id: Optional[str] = Form(None),
+    tolerance: float = Form(500, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    """
+    Unggah CSV settlement platform lalu cocokkan dengan data penjualan di job runner.
+    `platform` wajib jika CSV tidak memiliki kolom platform. Hasil (ringkasan dan
+    laporan CSV) dipantau lewat /api/jobs/{jobId}.
+    """
+    import aiofiles
+    
+    check_platform(platform)
+    
+    upload_id = uuid.uuid4().hex
+    directory = get_settings().settlement_dir
+    os.makedirs(directory, exist_ok=True)
+    
+    # Disalin per chunk agar file besar tidak dimuat utuh ke memori
+    async with aiofiles.open(os.path.join(directory, f"{upload_id}.csv"), "wb") as out_file:
+        while chunk := await file.read(CHUNK_SIZE):
+            await out_file.write(chunk)
+    
+    params = SettlementReconcileParams(
+        upload_id=upload_id, platform=platform, outlet_id=outlet_id, tolerance=tolerance
+    )
+    job = await submit_job(db, current_user, "settlement_reconcile", params)
+    return {"message": "File settlement sedang dicocokkan", "jobId": job.id}
+
+@router.get("/accounts", response_model=List[PlatformAccountResponse])
+async def get_platform_accounts(
+    outlet_id: Optional[str] = Query(None),
+    platform: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    query = select(PlatformAccount).where(
+        *Scope.for_user(current_user).outlets(PlatformAccount.outlet_id, outlet_id)
+    )
+    if platform:
+        query = query.where(PlatformAccount.platform == platform)
+    
+    result = await db.execute(query.order_by(PlatformAccount.platform, PlatformAccount.external_id))
+    return [PlatformAccountResponse.model_validate(account) for account in result.scalars().all()]
+
+@router.post("/accounts", response_model=PlatformAccountResponse)
+async def create_platform_account(
+    request: PlatformAccountCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    check_platform(request.platform)
+    
+    outlet = await db.get(Outlet, request.outlet_id)
+    if not outlet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Outlet tidak ditemukan"
+        )
+    
+    account = PlatformAccount(**request.model_dump(exclude={"external_id"}), external_id=request.external_id.strip())
+    db.add(account)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Kode toko ini sudah terdaftar untuk platform tersebut"
+        )
+    await db.refresh(account)
+    
+    return PlatformAccountResponse.model_validate(account)
+
+@router.delete("/accounts/{account_id}")
+async def delete_platform_account(
+    account_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_roles(MANAGER_ROLES))
+):
+    result = await db.execute(
+        delete(PlatformAccount).where(PlatformAccount.id == account_id).returning(PlatformAccount.id)
+    )
+    
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Akun platform tidak ditemukan"
+        )
+    
+    await db.commit()
+    
+    return {"message": "Akun platform berhasil dihapus"}
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import zlib
+
+from ..database import get_db
+from ..models.models import User
+from ..schemas.schemas import SyncPushRequest
+from ..services.auth import get_current_user
+from ..services.scope import Scope
+from ..services.sync import BATCH_SIZE, apply_changes, collect_changes, row_values
+
+router = APIRouter(prefix="/api/sync", tags=["Sync"])
+
+MAX_PUSH_BYTES = 50 * 1024 * 1024
+
+async def read_body(request: Request) -> bytes:
+    """Body push dikirim gzip oleh sync.py; ukuran hasil dekompresi dibatasi."""
+    body = await request.body()
+    if request.headers.get("content-encoding", "").lower() != "gzip":
+        return body
+    
+    try:
+        decompressor = zlib.decompressobj(31)
+        body = decompressor.decompress(body, MAX_PUSH_BYTES)
+    except zlib.error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body gzip tidak valid"
+        )
+    if decompressor.unconsumed_tail:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Batch sinkronisasi terlalu besar"
+        )
+    return body
+
+@router.post("/push")
+async def push_changes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Terima perubahan sales/expenses dari outlet edge. Konflik: updated_at terbaru menang."""
+    try:
+        payload = SyncPushRequest.model_validate_json(await read_body(request))
+    except ValidationError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error.errors(include_url=False, include_context=False, include_input=False)
+        )
+    
+    try:
+        result = await apply_changes(
+            db, [change.model_dump() for change in payload.changes], Scope.for_user(current_user)
+        )
+    except PermissionError as error:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(error))
+    except ValueError as error:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    
+    await db.commit()
+    return result
+
+@router.get("/pull")
+async def pull_changes(
+    since: int = Query(0, ge=0),
+    outlet_id: Optional[str] = Query(None),
+    limit: int = Query(BATCH_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Delta untuk outlet edge setelah cursor `since` (0 = snapshot penuh). Respons
+    dikompresi oleh CompressionMiddleware. Cursor yang lebih tua dari retensi
+    change_log juga dijawab dengan snapshot (`snapshot: true`).
+    
+    Hanya snapshot yang membawa baris akun user (termasuk hash password) agar edge
+    bisa login offline; delta biasa tidak. Perubahan password sampai ke edge pada
+    `sync.py pull --full` berikutnya.
+    """
+    payload = await collect_changes(db, Scope.for_user(current_user), outlet_id, since, limit)
+    if payload["snapshot"]:
+        payload["user"] = row_values(User, current_user)
+    return payload
@@ -1,8 +1,16 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import AfterValidator, BaseModel, EmailStr, Field
+from typing import Annotated, Optional, List, Any, Dict
+from datetime import date, datetime
 from enum import Enum
 
+def check_calendar_date(value: str) -> str:
+    # Pola saja masih meloloskan tanggal seperti 2026-02-30
+    date.fromisoformat(value)
+    return value
+
+# Tanggal YYYY-MM-DD yang dibandingkan sebagai string (urutan leksikografis = kronologis)
+IsoDate = Annotated[str, Field(pattern=r"^\d{4}-\d{2}-\d{2}$"), AfterValidator(check_calendar_date)]
+
 class UserRole(str, Enum):
     super_admin = "super_admin"
     owner = "owner"
@@ -20,6 +28,7 @@ class UserBase(BaseModel):
     last_name: Optional[str] = None
     role: str = "owner"
     assigned_outlet_id: Optional[str] = None
+    tenant_id: Optional[str] = None
 
 class UserCreate(UserBase):
     password: Optional[str] = None
@@ -50,7 +59,8 @@ class OutletCreate(OutletBase):
 
 class OutletUpdate(BaseModel):
     name: Optional[str] = None
-    cogs_per_piece: Optional[float] = None
+    cogs_per_piece: Optional[float] = Field(default=None, ge=0)
+    cogs_effective_from: Optional[IsoDate] = None
 
 class OutletResponse(OutletBase):
     id: str
@@ -59,6 +69,18 @@ class OutletResponse(OutletBase):
     class Config:
         from_attributes = True
 
+class OutletCogsCreate(BaseModel):
+    effective_from: IsoDate
+    cogs_per_piece: float = Field(ge=0)
+
+class OutletCogsResponse(OutletCogsCreate):
+    id: str
+    outlet_id: str
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 class SaleBase(BaseModel):
     outletId: str = Field(alias="outlet_id")
     date: str
@@ -157,6 +179,60 @@ class ExpenseResponse(ExpenseBase):
     class Config:
         from_attributes = True
 
+class ExpenseSearchResult(ExpenseResponse):
+    # Kemiripan trigram 0-1; None jika database tidak mendukung pg_trgm
+    score: Optional[float] = None
+
+class RecurringExpenseBase(BaseModel):
+    outlet_id: str
+    type: str = "bulanan"
+    description: str
+    amount: float = Field(ge=0)
+    day_of_month: int = Field(default=10, ge=1, le=28)
+
+class RecurringExpenseCreate(RecurringExpenseBase):
+    # Tanggal mana pun di periode pertama/terakhir, dibulatkan ke awal periode (tanggal 10)
+    start_period: Optional[str] = None
+    end_period: Optional[str] = None
+
+class RecurringExpenseUpdate(BaseModel):
+    description: Optional[str] = None
+    amount: Optional[float] = Field(default=None, ge=0)
+    day_of_month: Optional[int] = Field(default=None, ge=1, le=28)
+    end_period: Optional[str] = None
+    active: Optional[bool] = None
+
+class RecurringExpenseResponse(RecurringExpenseBase):
+    id: str
+    start_period: str
+    end_period: Optional[str] = None
+    last_period: Optional[str] = None
+    active: bool = True
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class RecurringMaterializeRequest(BaseModel):
+    as_of: Optional[str] = None
+    dry_run: bool = False
+
+class RecurringEntry(BaseModel):
+    recurring_id: str
+    period_start: str
+    outlet_id: str
+    date: str
+    type: str
+    description: str
+    amount: float
+
+class RecurringMaterializeResponse(BaseModel):
+    period_start: str
+    period_end: str
+    dry_run: bool
+    count: int
+    entries: List[RecurringEntry]
+
 class MTDSummary(BaseModel):
     outlet_id: str
     outlet_name: str
@@ -169,3 +245,115 @@ class MTDSummary(BaseModel):
     net_profit: float
     total_sold: int
     days_count: int
+
+class JobCreate(BaseModel):
+    type: str
+    params: Dict[str, Any] = {}
+
+class SalesExportParams(BaseModel):
+    outlet_id: Optional[str] = None
+    start_date: Optional[IsoDate] = None
+    end_date: Optional[IsoDate] = None
+
+class ExpensesExportParams(SalesExportParams):
+    type: Optional[str] = None
+
+class YearReportParams(BaseModel):
+    year: int = Field(ge=2000, le=2100)
+
+class ForecastRefreshParams(BaseModel):
+    as_of: Optional[str] = None
+
+class SettlementReconcileParams(BaseModel):
+    # Diisi oleh POST /api/settlements/import, bukan path file
+    upload_id: str = Field(pattern=r"^[0-9a-f]{32}$")
+    platform: Optional[str] = Field(default=None, pattern="^(grab|gofood|shopee|tiktok)$")
+    outlet_id: Optional[str] = None
+    tolerance: float = Field(default=500, ge=0)
+
+class AnomalyScanParams(BaseModel):
+    as_of: Optional[str] = None
+    days: int = Field(default=35, ge=1, le=366)
+
+class JobResponse(BaseModel):
+    id: str
+    type: str
+    status: str
+    params: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    cancel_requested: bool = False
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class SalesAnomalyResponse(BaseModel):
+    id: str
+    outlet_id: str
+    outletName: Optional[str] = None
+    sale_id: Optional[str] = None
+    date: str
+    metric: str
+    value: float
+    # Median jendela pembanding (hari yang sama, minggu-minggu sebelumnya)
+    expected: float
+    score: float
+    observations: int
+    acknowledged: bool = False
+    detected_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class PlatformAccountCreate(BaseModel):
+    outlet_id: str
+    platform: str
+    external_id: str = Field(min_length=1)
+
+class PlatformAccountResponse(PlatformAccountCreate):
+    id: str
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class AuditLogResponse(BaseModel):
+    id: int
+    entity: str
+    entity_id: str
+    outlet_id: Optional[str] = None
+    date: Optional[str] = None
+    action: str
+    user_id: Optional[str] = None
+    userName: Optional[str] = None
+    # {kolom: [sebelum, sesudah]}
+    changes: Dict[str, Any]
+    changed_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class SummaryCardResponse(BaseModel):
+    key: str
+    text: str
+    textUrl: str
+    # None jika Pillow tidak terpasang di server
+    imageUrl: Optional[str] = None
+    # Angka yang dipakai kartu: hari itu, MTD sejak tanggal 10, dan per outlet
+    data: Dict[str, Any]
+
+class SyncChange(BaseModel):
+    table: str = Field(pattern="^(outlets|outlet_cogs|sales|expenses)$")
+    op: str = Field(pattern="^(upsert|delete)$")
+    # Kunci baris untuk delete, mis. {"outlet_id": ..., "date": ...} untuk sales
+    key: Dict[str, Any] = {}
+    row: Optional[Dict[str, Any]] = None
+    changed_at: Optional[str] = None
+
+class SyncPushRequest(BaseModel):
+    changes: List[SyncChange] = Field(max_length=5000)
@@ -0,0 +1,363 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional, List
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import current_tenant
+from ..models.models import Sale, Outlet, OutletCogs
+from .conditional import version_columns
+from .cogs import join_effective_cogs
+
+CHANNELS = ["cash", "qris", "grab", "gofood", "shopee", "tiktok"]
+METRICS = ["revenue", "cogs", "totalSold", "totalProduction", "returned"]
+
+# 52 minggu: perbandingan tahunan tetap jatuh pada hari yang sama dalam minggu
+YEAR_DAYS = 364
+WEEK_DAYS = 7
+
+FRAME_CACHE_SIZE = 4
+_frame_cache: "OrderedDict[tuple, SalesFrame]" = OrderedDict()
+
+def to_day(value: str) -> int:
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+def from_day(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+def weekday(day: np.ndarray) -> np.ndarray:
+    """Senin = 0. Hari ke-0 epoch (1970-01-01) jatuh pada hari Kamis."""
+    return (day + 3) % 7
+
+def parse_minutes(values) -> np.ndarray:
+    """Ubah jam "HH:mm" menjadi menit sejak tengah malam; kosong/tidak valid menjadi NaN."""
+    minutes = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        if value:
+            try:
+                hours, mins = value.split(":")[:2]
+                minutes[i] = int(hours) * 60 + int(mins)
+            except ValueError:
+                pass
+    return minutes
+
+@dataclass
+class SalesFrame:
+    """Snapshot kolumnar penjualan: satu array per kolom, satu elemen per baris sale."""
+    outlet_ids: List[str]
+    outlet_names: List[str]
+    outlet: np.ndarray
+    day: np.ndarray
+    channels: np.ndarray
+    total_sold: np.ndarray
+    total_production: np.ndarray
+    returned: np.ndarray
+    sold_out_minute: np.ndarray
+    unit_cogs: np.ndarray
+    
+    @property
+    def size(self) -> int:
+        return len(self.day)
+    
+    @cached_property
+    def revenue(self) -> np.ndarray:
+        return self.channels.sum(axis=0)
+    
+    @cached_property
+    def cogs(self) -> np.ndarray:
+        return self.total_sold * self.unit_cogs
+    
+    @cached_property
+    def metrics(self) -> np.ndarray:
+        """Matriks (len(METRICS), n) agar semua metrik dijumlahkan dalam satu operasi."""
+        return np.vstack([self.revenue, self.cogs, self.total_sold, self.total_production, self.returned])
+    
+    def mask(self, start_day: int, end_day: int) -> np.ndarray:
+        return (self.day >= start_day) & (self.day <= end_day)
+    
+    def group_sums(self, values: np.ndarray, groups: np.ndarray, mask: np.ndarray, n_groups: int) -> np.ndarray:
+        """
+        Jumlah per grup untuk setiap baris `values`. Baris di luar mask diarahkan ke
+        grup buangan (n_groups) alih-alih disalin, sehingga array besar tidak diduplikasi.
+        Selalu float64: bincount atas array kosong menghasilkan int64.
+        """
+        index = np.where(mask, groups, n_groups)
+        return np.vstack([
+            np.bincount(index, weights=row, minlength=n_groups + 1)[:n_groups] for row in values
+        ]).astype(np.float64, copy=False)
+
+def empty_frame(outlet_ids: List[str], outlet_names: List[str]) -> SalesFrame:
+    return SalesFrame(
+        outlet_ids=outlet_ids,
+        outlet_names=outlet_names,
+        outlet=np.zeros(0, dtype=np.int32),
+        day=np.zeros(0, dtype=np.int32),
+        channels=np.zeros((len(CHANNELS), 0)),
+        total_sold=np.zeros(0),
+        total_production=np.zeros(0),
+        returned=np.zeros(0),
+        sold_out_minute=np.zeros(0),
+        unit_cogs=np.zeros(0),
+    )
+
+async def load_frame(
+    db: AsyncSession,
+    outlet_ids: Optional[List[str]],
+    start_date: str,
+    end_date: str,
+    comparison: bool = True
+) -> SalesFrame:
+    """
+    Muat penjualan dalam rentang, ditambah periode pembanding sebelumnya (minimal
+    364 hari untuk YoY), sebagai array NumPy. Frame di-cache per scope dan versi
+    data (max(updated_at) + count), sehingga refresh dashboard tanpa perubahan data
+    tidak memuat ulang baris. comparison=False memuat rentang apa adanya.
+    """
+    length = to_day(end_date) - to_day(start_date) + 1
+    load_start = from_day(to_day(start_date) - max(YEAR_DAYS, length)) if comparison else start_date
+    
+    sale_filters = [Sale.date >= load_start, Sale.date <= end_date]
+    outlet_filters = []
+    if outlet_ids is not None:
+        sale_filters.append(Sale.outlet_id.in_(outlet_ids))
+        outlet_filters.append(Outlet.id.in_(outlet_ids))
+    
+    version_result = await db.execute(
+        select(
+            *version_columns(Sale, *sale_filters),
+            *version_columns(Outlet, *outlet_filters),
+            *version_columns(OutletCogs)
+        )
+    )
+    cache_key = (
+        current_tenant.get(),
+        tuple(outlet_ids) if outlet_ids is not None else None,
+        load_start,
+        end_date,
+        tuple(version_result.one())
+    )
+    
+    cached = _frame_cache.get(cache_key)
+    if cached is not None:
+        _frame_cache.move_to_end(cache_key)
+        return cached
+    
+    outlet_result = await db.execute(
+        select(Outlet.id, Outlet.name).where(*outlet_filters).order_by(Outlet.name)
+    )
+    outlet_rows = outlet_result.all()
+    outlet_index = {row.id: i for i, row in enumerate(outlet_rows)}
+    
+    # COGS per baris diambil dari riwayat yang berlaku pada tanggal sale (range join),
+    # sehingga perubahan COGS tidak mengubah margin historis
+    sale_query, effective_cogs = join_effective_cogs(
+        select(
+            Sale.outlet_id,
+            Sale.date,
+            *[getattr(Sale, channel) for channel in CHANNELS],
+            Sale.total_sold,
+            Sale.total_production,
+            Sale.returned,
+            Sale.sold_out_time,
+        ).join(Outlet, Sale.outlet_id == Outlet.id)
+    )
+    sale_result = await db.execute(sale_query.add_columns(effective_cogs).where(*sale_filters))
+    rows = sale_result.all()
+    
+    if not rows:
+        frame = empty_frame([row.id for row in outlet_rows], [row.name for row in outlet_rows])
+    else:
+        columns = list(zip(*rows))
+        n = len(rows)
+        frame = SalesFrame(
+            outlet_ids=[row.id for row in outlet_rows],
+            outlet_names=[row.name for row in outlet_rows],
+            outlet=np.fromiter((outlet_index[o] for o in columns[0]), dtype=np.int32, count=n),
+            day=np.array(columns[1], dtype="datetime64[D]").astype(np.int32),
+            channels=np.array(columns[2:2 + len(CHANNELS)], dtype=np.float64),
+            total_sold=np.array(columns[-5], dtype=np.float64),
+            total_production=np.array(columns[-4], dtype=np.float64),
+            returned=np.array(columns[-3], dtype=np.float64),
+            sold_out_minute=parse_minutes(columns[-2]),
+            unit_cogs=np.array(columns[-1], dtype=np.float64),
+        )
+    
+    _frame_cache[cache_key] = frame
+    if len(_frame_cache) > FRAME_CACHE_SIZE:
+        _frame_cache.popitem(last=False)
+    
+    return frame
+
+def pct_change(current, previous):
+    current = np.asarray(current, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.float64)
+    change = np.full(np.broadcast(current, previous).shape, np.nan)
+    np.divide((current - previous) * 100, previous, out=change, where=previous != 0)
+    return change
+
+def to_json(values):
+    """Bulatkan ke 2 desimal dan ubah NaN menjadi None agar bisa diserialisasi."""
+    values = np.round(np.asarray(values, dtype=np.float64), 2)
+    if values.ndim == 0:
+        return None if np.isnan(values) else float(values)
+    return [None if np.isnan(v) else float(v) for v in values]
+
+def metric_dict(values: np.ndarray) -> dict:
+    revenue, cogs, total_sold, total_production, returned = values
+    gross_margin = revenue - cogs
+    gross_margin_percentage = gross_margin / revenue * 100 if revenue else 0
+    return {
+        "totalRevenue": to_json(revenue),
+        "cogsSold": to_json(cogs),
+        "grossMargin": to_json(gross_margin),
+        "grossMarginPercentage": to_json(gross_margin_percentage),
+        "totalSold": int(total_sold),
+        "totalProduction": int(total_production),
+        "returned": int(returned),
+    }
+
+def period_totals(frame: SalesFrame, start_day: int, end_day: int) -> np.ndarray:
+    return frame.metrics @ frame.mask(start_day, end_day).astype(np.float64)
+
+def summarize(frame: SalesFrame, start_date: str, end_date: str) -> dict:
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    length = end_day - start_day + 1
+    
+    current = period_totals(frame, start_day, end_day)
+    previous = period_totals(frame, start_day - length, end_day - length)
+    last_year = period_totals(frame, start_day - YEAR_DAYS, end_day - YEAR_DAYS)
+    
+    changes_previous = pct_change(current, previous)
+    changes_last_year = pct_change(current, last_year)
+    
+    return {
+        "startDate": start_date,
+        "endDate": end_date,
+        **metric_dict(current),
+        "previousPeriod": metric_dict(previous),
+        "lastYear": metric_dict(last_year),
+        "revenueChange": to_json(changes_previous[0]),
+        "revenueChangeYoY": to_json(changes_last_year[0]),
+        "totalSoldChange": to_json(changes_previous[2]),
+        "totalSoldChangeYoY": to_json(changes_last_year[2]),
+    }
+
+def channel_mix(frame: SalesFrame, start_date: str, end_date: str, by_outlet: bool = False) -> dict:
+    mask = frame.mask(to_day(start_date), to_day(end_date))
+    totals = frame.channels @ mask.astype(np.float64)
+    grand_total = totals.sum()
+    shares = totals / grand_total * 100 if grand_total else np.zeros(len(CHANNELS))
+    
+    result = {
+        "startDate": start_date,
+        "endDate": end_date,
+        "totalRevenue": to_json(grand_total),
+        "channels": [
+            {"channel": channel, "amount": to_json(totals[i]), "share": to_json(shares[i])}
+            for i, channel in enumerate(CHANNELS)
+        ],
+    }
+    
+    if by_outlet:
+        n_outlets = len(frame.outlet_ids)
+        per_outlet = frame.group_sums(frame.channels, frame.outlet, mask, n_outlets)
+        outlet_totals = per_outlet.sum(axis=0)
+        outlet_shares = np.divide(per_outlet * 100, outlet_totals, out=np.zeros_like(per_outlet), where=outlet_totals != 0)
+        result["outlets"] = [
+            {
+                "outletId": frame.outlet_ids[j],
+                "outletName": frame.outlet_names[j],
+                "totalRevenue": to_json(outlet_totals[j]),
+                "channels": {channel: to_json(per_outlet[i, j]) for i, channel in enumerate(CHANNELS)},
+                "shares": {channel: to_json(outlet_shares[i, j]) for i, channel in enumerate(CHANNELS)},
+            }
+            for j in range(n_outlets)
+        ]
+    
+    return result
+
+def bucket_series(frame: SalesFrame, start_day: int, end_day: int, size: int) -> np.ndarray:
+    """Jumlahkan METRICS per bucket `size` hari mulai start_day; hasil (len(METRICS), n_buckets)."""
+    n_buckets = (end_day - start_day) // size + 1
+    mask = frame.mask(start_day, end_day)
+    bucket = np.maximum(frame.day - start_day, 0) // size
+    return frame.group_sums(frame.metrics, bucket, mask, n_buckets)
+
+def trend(frame: SalesFrame, start_date: str, end_date: str, granularity: str = "day") -> dict:
+    size = WEEK_DAYS if granularity == "week" else 1
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    # Satu minggu ekstra di depan supaya bucket pertama juga punya pembanding WoW
+    lookback = WEEK_DAYS // size
+    series = bucket_series(frame, start_day - WEEK_DAYS, end_day, size)
+    last_year = bucket_series(frame, start_day - YEAR_DAYS, end_day - YEAR_DAYS, size)
+    
+    current = series[:, lookback:]
+    previous_week = series[:, :series.shape[1] - lookback]
+    revenue, cogs, total_sold = current[0], current[1], current[2]
+    gross_margin = revenue - cogs
+    margin_pct = np.divide(gross_margin * 100, revenue, out=np.zeros_like(revenue), where=revenue != 0)
+    wow = pct_change(revenue, previous_week[0])
+    yoy = pct_change(revenue, last_year[0, :current.shape[1]])
+    
+    return {
+        "startDate": start_date,
+        "endDate": end_date,
+        "granularity": "week" if size == WEEK_DAYS else "day",
+        "points": [
+            {
+                "date": from_day(start_day + i * size),
+                "totalRevenue": to_json(revenue[i]),
+                "cogsSold": to_json(cogs[i]),
+                "grossMargin": to_json(gross_margin[i]),
+                "grossMarginPercentage": to_json(margin_pct[i]),
+                "totalSold": int(total_sold[i]),
+                "revenueChangeWoW": to_json(wow[i]),
+                "revenueChangeYoY": to_json(yoy[i]),
+            }
+            for i in range(current.shape[1])
+        ],
+    }
+
+def outlet_comparison(frame: SalesFrame, start_date: str, end_date: str) -> dict:
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    length = end_day - start_day + 1
+    n_outlets = len(frame.outlet_ids)
+    
+    def per_outlet(first_day: int, last_day: int) -> np.ndarray:
+        return frame.group_sums(frame.metrics, frame.outlet, frame.mask(first_day, last_day), n_outlets)
+    
+    current = per_outlet(start_day, end_day)
+    previous = per_outlet(start_day - length, end_day - length)
+    revenue, cogs, total_sold, total_production, returned = current
+    gross_margin = revenue - cogs
+    margin_pct = np.divide(gross_margin * 100, revenue, out=np.zeros_like(revenue), where=revenue != 0)
+    sell_through = np.divide(total_sold * 100, total_production, out=np.zeros_like(revenue), where=total_production != 0)
+    total_revenue = revenue.sum()
+    share = revenue / total_revenue * 100 if total_revenue else np.zeros_like(revenue)
+    change = pct_change(revenue, previous[0])
+    order = np.argsort(-revenue, kind="stable")
+    
+    return {
+        "startDate": start_date,
+        "endDate": end_date,
+        "outlets": [
+            {
+                "rank": rank + 1,
+                "outletId": frame.outlet_ids[j],
+                "outletName": frame.outlet_names[j],
+                "totalRevenue": to_json(revenue[j]),
+                "cogsSold": to_json(cogs[j]),
+                "grossMargin": to_json(gross_margin[j]),
+                "grossMarginPercentage": to_json(margin_pct[j]),
+                "totalSold": int(total_sold[j]),
+                "totalProduction": int(total_production[j]),
+                "returned": int(returned[j]),
+                "sellThrough": to_json(sell_through[j]),
+                "revenueShare": to_json(share[j]),
+                "revenueChange": to_json(change[j]),
+            }
+            for rank, j in enumerate(order)
+        ],
+    }
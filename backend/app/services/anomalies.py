@@ -0,0 +1,257 @@
+"""
+Deteksi anomali harian penjualan per outlet: robust z-score (median/MAD) terhadap
+WINDOW observasi terakhir pada hari yang sama dalam minggu, untuk total per channel,
+rasio return dan sisa produksi (total_production - total_sold).
+
+Jalur inkremental (setiap create/update sale) membaca satu baris sales_baselines
+berisi jendela bergulir outlet x hari, sehingga biayanya tetap per penulisan.
+Jalur batch (malam hari) menghitung ulang semua outlet dalam satu lintasan vektor
+dan membangun ulang jendelanya.
+"""
+from datetime import date, timedelta
+from typing import List, Optional
+import logging
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Sale, SalesAnomaly, SalesBaseline
+from .analytics import CHANNELS, SalesFrame, load_frame, to_day, from_day, weekday
+from .scheduler import exclusive
+
+logger = logging.getLogger(__name__)
+
+METRICS = ["revenue", *CHANNELS, "returnRate", "waste"]
+
+# Delapan minggu terakhir pada hari yang sama; minimal empat untuk mulai menilai
+WINDOW = 8
+MIN_HISTORY = 4
+# Ambang modified z-score (Iglewicz & Hoaglin)
+THRESHOLD = 3.5
+# MAD / 0.6745 mendekati simpangan baku untuk data normal
+MAD_SCALE = 0.6745
+
+# Batas bawah skala agar riwayat yang hampir konstan (MAD = 0) tidak menandai
+# selisih kecil: 5% dari median, dan minimal nilai absolut per metrik
+MIN_RELATIVE_SCALE = 0.05
+MIN_SCALE = np.array([10_000.0] * (1 + len(CHANNELS)) + [0.02, 5.0])
+
+# Rentang yang dinilai ulang oleh batch malam hari
+RESCAN_DAYS = 35
+
+def metric_matrix(frame: SalesFrame) -> np.ndarray:
+    """Matriks (len(METRICS), n). Rasio return NaN jika tidak ada produksi."""
+    production = frame.total_production
+    return_rate = np.divide(
+        frame.returned, production, out=np.full(frame.size, np.nan), where=production > 0
+    )
+    return np.vstack([frame.revenue, frame.channels, return_rate, production - frame.total_sold])
+
+def sale_metrics(sale) -> List[Optional[float]]:
+    channels = [float(getattr(sale, channel) or 0) for channel in CHANNELS]
+    production = sale.total_production or 0
+    return_rate = (sale.returned or 0) / production if production > 0 else None
+    return [sum(channels), *channels, return_rate, float(production - (sale.total_sold or 0))]
+
+def robust_scores(history: np.ndarray, values: np.ndarray):
+    """
+    `history` berbentuk (..., k) dengan NaN untuk observasi kosong, `values` (...).
+    Mengembalikan (z-score, median, jumlah observasi); z NaN jika riwayat kurang.
+    """
+    with warnings.catch_warnings():
+        # Jendela tanpa observasi sama sekali menghasilkan NaN, bukan error
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(history, axis=-1)
+        mad = np.nanmedian(np.abs(history - median[..., None]), axis=-1)
+    
+    observations = (~np.isnan(history)).sum(axis=-1)
+    min_scale = MIN_SCALE.reshape((-1,) + (1,) * (median.ndim - 1))
+    scale = np.maximum(mad / MAD_SCALE, np.maximum(MIN_RELATIVE_SCALE * np.abs(median), min_scale))
+    score = (values - median) / scale
+    score[observations < MIN_HISTORY] = np.nan
+    return score, median, observations
+
+def flagged_rows(outlet_id: str, sale_date: str, values, score, median, observations) -> List[dict]:
+    return [
+        {
+            "outlet_id": outlet_id,
+            "date": sale_date,
+            "metric": metric,
+            "value": round(float(values[i]), 4),
+            "expected": round(float(median[i]), 4),
+            "score": round(float(score[i]), 2),
+            "observations": int(observations[i]),
+        }
+        for i, metric in enumerate(METRICS)
+        if not np.isnan(score[i]) and abs(score[i]) >= THRESHOLD
+    ]
+
+def to_json_values(values) -> List[Optional[float]]:
+    return [None if value is None or np.isnan(value) else float(value) for value in values]
+
+def from_json_values(values) -> List[float]:
+    return [np.nan if value is None else value for value in values]
+
+def detect(frame: SalesFrame, start_day: int):
+    """
+    Nilai semua sale dengan day >= start_day terhadap WINDOW observasi sebelumnya
+    pada outlet x hari yang sama. Mengembalikan (baris anomali, jendela terakhir per grup).
+    """
+    if frame.size == 0:
+        return [], {}
+    
+    groups = frame.outlet.astype(np.int64) * 7 + weekday(frame.day)
+    order = np.lexsort((frame.day, groups))
+    sorted_groups = groups[order]
+    
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    counts = np.diff(np.r_[starts, frame.size])
+    group_index = np.repeat(np.arange(len(starts)), counts)
+    rank = np.arange(frame.size) - np.repeat(starts, counts)
+    
+    # Grid (metrik, grup, posisi) dengan WINDOW NaN di depan; jendela ke-i adalah
+    # WINDOW observasi tepat sebelum posisi i, tanpa menyalin data per baris
+    values = metric_matrix(frame)[:, order]
+    grid = np.full((len(METRICS), len(starts), counts.max() + WINDOW), np.nan)
+    grid[:, group_index, rank + WINDOW] = values
+    windows = sliding_window_view(grid, WINDOW, axis=2)
+    
+    target = np.flatnonzero(frame.day[order] >= start_day)
+    history = windows[:, group_index[target], rank[target]]
+    score, median, observations = robust_scores(history, values[:, target])
+    
+    anomalies = []
+    for column, position in enumerate(target):
+        row = order[position]
+        anomalies.extend(flagged_rows(
+            frame.outlet_ids[frame.outlet[row]], from_day(frame.day[row]), values[:, position],
+            score[:, column], median[:, column], observations[:, column]
+        ))
+    
+    baselines = {}
+    for g, start in enumerate(starts):
+        tail = np.arange(max(start, start + counts[g] - WINDOW), start + counts[g])
+        first = order[start]
+        key = (frame.outlet_ids[frame.outlet[first]], int(weekday(frame.day[first])))
+        baselines[key] = [[from_day(frame.day[order[i]]), to_json_values(values[:, i])] for i in tail]
+    
+    return anomalies, baselines
+
+async def replace_anomalies(db: AsyncSession, rows: List[dict], *criteria):
+    """Ganti anomali dalam `criteria` dengan `rows`, dengan status acknowledged dipertahankan."""
+    result = await db.execute(
+        select(SalesAnomaly.outlet_id, SalesAnomaly.date, SalesAnomaly.metric)
+        .where(SalesAnomaly.acknowledged.is_(True), *criteria)
+    )
+    acknowledged = {tuple(row) for row in result.all()}
+    
+    await db.execute(delete(SalesAnomaly).where(*criteria))
+    if rows:
+        for row in rows:
+            row["acknowledged"] = (row["outlet_id"], row["date"], row["metric"]) in acknowledged
+        await db.execute(insert(SalesAnomaly), rows)
+
+async def seed_history(db: AsyncSession, outlet_id: str, sale_date: date) -> list:
+    """Jendela awal dari WINDOW minggu sebelumnya, lewat index (outlet_id, date)."""
+    dates = [(sale_date - timedelta(weeks=week)).isoformat() for week in range(WINDOW, 0, -1)]
+    result = await db.execute(
+        select(Sale).where(Sale.outlet_id == outlet_id, Sale.date.in_(dates)).order_by(Sale.date)
+    )
+    return [[sale.date, to_json_values(sale_metrics(sale))] for sale in result.scalars().all()]
+
+async def observe_sale(db: AsyncSession, outlet_id: str, sale_date: str, sale=None) -> List[dict]:
+    """
+    Nilai satu sale terhadap jendela outlet x hari-nya lalu geser jendela tersebut.
+    `sale` None berarti sale dihapus. Biaya tetap: satu baris baseline, tanpa scan.
+    Tidak melakukan commit.
+    """
+    day = date.fromisoformat(sale_date)
+    result = await db.execute(
+        select(SalesBaseline).where(
+            SalesBaseline.outlet_id == outlet_id, SalesBaseline.weekday == day.weekday()
+        ).with_for_update()
+    )
+    baseline = result.scalar_one_or_none()
+    if baseline is None:
+        baseline = SalesBaseline(
+            outlet_id=outlet_id, weekday=day.weekday(), history=await seed_history(db, outlet_id, day)
+        )
+        db.add(baseline)
+    
+    history = [entry for entry in baseline.history or [] if entry[0] != sale_date]
+    rows = []
+    if sale is not None:
+        values = sale_metrics(sale)
+        prior = [from_json_values(entry[1]) for entry in history if entry[0] < sale_date][-WINDOW:]
+        if prior:
+            current = np.array(from_json_values(values), dtype=np.float64)
+            score, median, observations = robust_scores(np.array(prior, dtype=np.float64).T, current)
+            rows = flagged_rows(outlet_id, sale_date, current, score, median, observations)
+            for row in rows:
+                row["sale_id"] = sale.id
+        history.append([sale_date, to_json_values(values)])
+    
+    baseline.history = sorted(history)[-WINDOW:]
+    await replace_anomalies(db, rows, SalesAnomaly.outlet_id == outlet_id, SalesAnomaly.date == sale_date)
+    return rows
+
+async def observe_after_commit(outlet_id: str, sale_date: str, sale=None):
+    """
+    Dipanggil router setelah sale tersimpan. Kegagalan deteksi tidak menggagalkan request:
+    deteksi memakai session sendiri, jadi rollback-nya tidak menyentuh session request
+    yang masih dipakai untuk menyusun response.
+    """
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        try:
+            await observe_sale(db, outlet_id, sale_date, sale)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception("Deteksi anomali gagal untuk outlet %s tanggal %s", outlet_id, sale_date)
+
+async def scan_anomalies(db: AsyncSession, as_of: Optional[str] = None, days: int = RESCAN_DAYS) -> int:
+    """
+    Nilai ulang `days` hari terakhir untuk semua outlet dan bangun ulang semua jendela.
+    Sale yang ditulis selama scan akan dinilai ulang pada scan berikutnya.
+    """
+    end_day = to_day(as_of or date.today().isoformat())
+    start_day = end_day - days + 1
+    # Cukup riwayat agar sale pertama di rentang punya WINDOW minggu pembanding,
+    # dengan cadangan untuk minggu-minggu tanpa data
+    load_start = start_day - WINDOW * 7 * 2
+    
+    frame = await load_frame(db, None, from_day(load_start), from_day(end_day), comparison=False)
+    anomalies, baselines = detect(frame, start_day)
+    
+    for row in anomalies:
+        row["sale_id"] = None
+    await replace_anomalies(
+        db, anomalies, SalesAnomaly.date >= from_day(start_day), SalesAnomaly.date <= from_day(end_day)
+    )
+    
+    await db.execute(delete(SalesBaseline))
+    if baselines:
+        await db.execute(insert(SalesBaseline), [
+            {"outlet_id": outlet_id, "weekday": day, "history": history}
+            for (outlet_id, day), history in baselines.items()
+        ])
+    await db.commit()
+    
+    return len(anomalies)
+
+async def nightly_scan():
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        async with exclusive(db, "sales_anomalies") as acquired:
+            if not acquired:
+                return
+    
+            count = await scan_anomalies(db)
+            if count:
+                logger.info("%d anomali penjualan terdeteksi", count)
@@ -0,0 +1,152 @@
+"""
+Arsip dingin tahun tertutup sales/expenses ke file Parquet
+({ARCHIVE_DIR}/{tabel}/{tahun}.parquet), dibaca kembali secara transparan
+oleh endpoint daftar untuk rentang tanggal lama.
+"""
+from datetime import date
+from typing import List, Optional
+import asyncio
+import os
+
+from sqlalchemy import select, delete, Integer, Float, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models.models import Sale, Expense
+from .partitions import is_partitioned, drop_year_partitions
+
+ARCHIVE_TABLES = {"sales": Sale, "expenses": Expense}
+BATCH_SIZE = 50_000
+
+def archive_path(table: str, year: int) -> str:
+    return os.path.join(get_settings().archive_dir, table, f"{year}.parquet")
+
+def archived_years(table: str) -> List[int]:
+    directory = os.path.join(get_settings().archive_dir, table)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        int(name.removesuffix(".parquet"))
+        for name in os.listdir(directory)
+        if name.endswith(".parquet") and name.removesuffix(".parquet").isdigit()
+    )
+
+def overlapping_years(table: str, start_date: Optional[str], end_date: Optional[str]) -> List[int]:
+    """Tahun arsip yang beririsan dengan rentang filter (None berarti tidak dibatasi)."""
+    return [
+        year for year in archived_years(table)
+        if (not start_date or year >= int(start_date[:4]))
+        and (not end_date or year <= int(end_date[:4]))
+    ]
+
+def archive_version(table: str, years: List[int]) -> tuple:
+    """Bagian ETag untuk arsip: file hanya berubah saat diarsipkan ulang."""
+    return tuple((year, os.stat(archive_path(table, year)).st_mtime_ns) for year in years)
+
+def arrow_schema(model):
+    import pyarrow as pa
+    
+    def arrow_type(column):
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+    
+    return pa.schema([(column.name, arrow_type(column)) for column in model.__table__.columns])
+
+def read_rows(
+    table: str,
+    years: List[int],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    filters: Optional[list] = None
+) -> List[dict]:
+    """
+    Baca baris arsip dengan filter gaya pyarrow, mis. [("outlet_id", "==", id)].
+    Predikat diteruskan ke pembaca Parquet sehingga row group di luar rentang dilewati.
+    """
+    import pyarrow.parquet as pq
+    
+    expression = list(filters or [])
+    # Scope tanpa outlet sama sekali (mis. admin_outlet tanpa penugasan)
+    if any(op == "in" and not values for _, op, values in expression):
+        return []
+    if start_date:
+        expression.append(("date", ">=", start_date))
+    if end_date:
+        expression.append(("date", "<=", end_date))
+    
+    rows = []
+    for year in years:
+        path = archive_path(table, year)
+        # Arsip dari sebelum mode multi-tenant tidak punya kolom tenant_id: tidak ada baris milik tenant
+        names = set(pq.read_schema(path).names)
+        if any(column not in names for column, _, _ in expression):
+            continue
+        rows.extend(pq.read_table(path, filters=expression or None).to_pylist())
+    return rows
+
+async def read_archive(table: str, years: List[int], *args, **kwargs) -> List[dict]:
+    if not years:
+        return []
+    return await asyncio.to_thread(read_rows, table, years, *args, **kwargs)
+
+async def archive_year(db: AsyncSession, table: str, year: int) -> int:
+    """
+    Ekspor satu tahun ke Parquet lalu hapus barisnya dari database
+    (DROP partisi bulanan jika tabel berpartisi). File baru dipindah ke nama
+    akhirnya tepat sebelum commit, sehingga baris tidak pernah ada di dua tempat.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    model = ARCHIVE_TABLES[table]
+    if year >= date.today().year:
+        raise ValueError(f"Tahun {year} belum tertutup")
+    
+    path = archive_path(table, year)
+    if os.path.exists(path):
+        raise ValueError(f"{table} tahun {year} sudah diarsipkan")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    in_year = (model.date >= f"{year}-01-01", model.date <= f"{year}-12-31")
+    schema = arrow_schema(model)
+    temp_path = f"{path}.tmp"
+    
+    # Urut per outlet agar statistik row group efektif untuk filter outlet_id
+    result = await db.stream(
+        select(model.__table__).where(*in_year)
+        .order_by(model.outlet_id, model.date)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    count = 0
+    with pq.ParquetWriter(temp_path, schema, compression="zstd") as writer:
+        async for batch in result.mappings().partitions():
+            columns = {
+                field.name: pa.array([row[field.name] for row in batch]).cast(field.type)
+                for field in schema
+            }
+            await asyncio.to_thread(writer.write_table, pa.table(columns, schema=schema))
+            count += len(batch)
+    
+    if pq.read_metadata(temp_path).num_rows != count:
+        os.remove(temp_path)
+        raise RuntimeError(f"Jumlah baris arsip {table} {year} tidak cocok")
+    
+    if await is_partitioned(db, table):
+        await drop_year_partitions(db, table, year)
+    # Sisa baris (mis. di partisi default atau tabel tanpa partisi); data sudah ada di
+    # arsip, jadi tidak dicatat per baris ke audit log
+    await db.execute(delete(model).where(*in_year), execution_options={"audit": False})
+    
+    os.replace(temp_path, path)
+    try:
+        await db.commit()
+    except Exception:
+        os.replace(path, temp_path)
+        raise
+    
+    return count
@@ -0,0 +1,353 @@
+"""
+Audit log perubahan sales dan expenses tanpa INSERT tambahan di jalur request.
+Perubahan ditangkap event Session SQLAlchemy, disimpan di session.info sampai commit,
+lalu masuk antrian in-memory terbatas yang ditulis AuditWriter secara batch
+(INSERT multi-baris) ke tabel audit_log.
+
+- db.add/ubah atribut/db.delete: diff diambil dari state objek saat flush;
+- insert(Model): nilai dari parameter statement;
+- update()/delete() berbasis statement: satu SELECT ... FOR UPDATE dengan WHERE yang
+  sama dijalankan sebelumnya untuk nilai "sebelum". Baris itu memang akan dikunci
+  statement-nya, jadi tidak menambah kontensi.
+
+Entri yang tidak bisa ditulis (antrian penuh, database gagal, shutdown) ditulis ke
+file spool AUDIT_SPOOL_DIR dan diputar ulang oleh writer berikutnya, jadi perubahan
+yang sudah commit tidak hilang dari audit. Statement dengan execution option
+`audit=False` (mis. penghapusan arsip tahunan) tidak diaudit.
+"""
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from typing import List, Optional
+import asyncio
+import json
+import logging
+import os
+
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from ..database import current_tenant
+from ..models.models import AuditLog, Expense, Sale
+from .tenancy import model_columns
+
+logger = logging.getLogger(__name__)
+
+AUDITED = {"sales": Sale, "expenses": Expense}
+# Berubah di setiap update, tidak informatif sebagai diff
+IGNORED_COLUMNS = {"created_at", "updated_at", "tenant_id"}
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+# Jeda pengumpulan batch; entri muncul di audit paling lambat sekitar selama ini
+FLUSH_INTERVAL = 0.5
+RETRY_INTERVAL = 5.0
+
+PENDING_KEY = "audit_pending"
+
+# User yang sedang membuat perubahan; diisi get_current_user, None untuk job sistem
+audit_actor: ContextVar[Optional[str]] = ContextVar("audit_actor", default=None)
+
+_writer: Optional["AuditWriter"] = None
+
+def encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def audited_columns(model) -> List[str]:
+    return [column.key for column in model.__table__.columns if column.key not in IGNORED_COLUMNS]
+
+def make_entry(entity: str, action: str, before: dict, after: dict) -> Optional[dict]:
+    model = AUDITED[entity]
+    changes = {}
+    for key in audited_columns(model):
+        old, new = encode(before.get(key)), encode(after.get(key))
+        if action == "update" and (key not in after or old == new):
+            continue
+        if old is None and new is None:
+            continue
+        changes[key] = [old, new]
+    if action == "update" and not changes:
+        return None
+    
+    row = after if action != "delete" else before
+    return {
+        "entity": entity,
+        "entity_id": str(row.get("id") or before.get("id")),
+        "outlet_id": row.get("outlet_id") or before.get("outlet_id"),
+        "date": row.get("date") or before.get("date"),
+        "action": action,
+        "user_id": audit_actor.get(),
+        # Ditulis writer di task lain, jadi default kolom tenant_id tidak berlaku
+        "tenant_id": current_tenant.get(),
+        "changes": changes,
+    }
+
+def pending(session: Session) -> list:
+    return session.info.setdefault(PENDING_KEY, [])
+
+def add_entries(session: Session, entity: str, action: str, pairs):
+    entries = pending(session)
+    for before, after in pairs:
+        entry = make_entry(entity, action, before, after)
+        if entry is not None:
+            entries.append(entry)
+
+def statement_values(statement) -> dict:
+    """Nilai literal kolom di VALUES/SET. Parameter WHERE diberi sufiks (`id_1`) sehingga tidak tercampur."""
+    columns = set(statement.table.columns.keys())
+    return {key: value for key, value in statement.compile().params.items() if key in columns}
+
+def on_orm_execute(state: ORMExecuteState):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    if not state.execution_options.get("audit", True):
+        return
+    statement = state.statement
+    entity = statement.table.name
+    model = AUDITED.get(entity)
+    if model is None:
+        return
+    
+    if state.is_insert:
+        rows = state.parameters
+        if not rows:
+            rows = [statement_values(statement)]
+        elif isinstance(rows, dict):
+            rows = [{**statement_values(statement), **rows}]
+        add_entries(state.session, entity, "create", (({}, row) for row in rows))
+        return
+    
+    before = select(*model_columns(model))
+    if statement.whereclause is not None:
+        before = before.where(statement.whereclause)
+    before_rows = state.session.execute(
+        before.with_for_update(), execution_options={"audit": False}
+    ).mappings().all()
+    
+    if state.is_delete:
+        add_entries(state.session, entity, "delete", ((dict(row), {}) for row in before_rows))
+    else:
+        values = statement_values(statement)
+        add_entries(state.session, entity, "update", ((dict(row), values) for row in before_rows))
+
+def object_values(obj) -> dict:
+    # Hanya state yang sudah dimuat; atribut ter-expire (server default) tidak di-refresh di tengah flush
+    return dict(inspect(obj).dict)
+
+def after_flush(session: Session, flush_context):
+    for obj in session.new:
+        entity = obj.__tablename__
+        if entity in AUDITED:
+            add_entries(session, entity, "create", [({}, object_values(obj))])
+    
+    for obj in session.dirty:
+        entity = obj.__tablename__
+        if entity not in AUDITED or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        before, after = {}, {}
+        for key in audited_columns(AUDITED[entity]):
+            history = state.attrs[key].history
+            if history.has_changes():
+                before[key] = history.deleted[0] if history.deleted else None
+                after[key] = history.added[0] if history.added else None
+            else:
+                before[key] = state.dict.get(key)
+        add_entries(session, entity, "update", [(before, after)])
+    
+    for obj in session.deleted:
+        entity = obj.__tablename__
+        if entity in AUDITED:
+            add_entries(session, entity, "delete", [(object_values(obj), {})])
+
+def after_commit(session: Session):
+    entries = session.info.pop(PENDING_KEY, None)
+    if not entries:
+        return
+    changed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    for entry in entries:
+        entry["changed_at"] = changed_at
+    
+    if _writer is not None:
+        _writer.enqueue(entries)
+    else:
+        # Writer belum/tidak lagi berjalan (startup, shutdown): langsung ke spool
+        from ..config import get_settings
+        spool(get_settings().audit_spool_dir, entries)
+
+def after_rollback(session: Session):
+    session.info.pop(PENDING_KEY, None)
+
+def spool_path(spool_dir: str, pid: int) -> str:
+    return os.path.join(spool_dir, f"{pid}.jsonl")
+
+def spool(spool_dir: str, entries: List[dict]):
+    os.makedirs(spool_dir, exist_ok=True)
+    with open(spool_path(spool_dir, os.getpid()), "a", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(json.dumps({**entry, "changed_at": entry["changed_at"].isoformat()}) + "\n")
+    logger.warning("%d entri audit ditulis ke spool %s", len(entries), spool_dir)
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def claim_spools(spool_dir: str) -> List[str]:
+    """
+    Ambil file spool milik proses ini atau proses yang sudah mati. File di-rename dulu
+    (atomik) sehingga worker lain tidak memutar ulang file yang sama.
+    """
+    if not os.path.isdir(spool_dir):
+        return []
+    own_pid = os.getpid()
+    claimed = []
+    for entry in os.scandir(spool_dir):
+        name, extension = os.path.splitext(entry.name)
+        if extension != ".jsonl" or not name.isdigit():
+            continue
+        pid = int(name)
+        if pid != own_pid and is_running(pid):
+            continue
+        target = os.path.join(spool_dir, f"{name}.{own_pid}.replay")
+        try:
+            os.rename(entry.path, target)
+        except FileNotFoundError:
+            continue
+        claimed.append(target)
+    # Sisa replay yang terputus sebelumnya (proses ini sudah mati)
+    for entry in os.scandir(spool_dir):
+        if entry.name.endswith(".replay") and entry.path not in claimed:
+            pid = entry.name.split(".")[1]
+            if pid.isdigit() and (int(pid) == own_pid or not is_running(int(pid))):
+                claimed.append(entry.path)
+    return claimed
+
+def read_spool(path: str) -> List[dict]:
+    entries = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                entry["changed_at"] = datetime.fromisoformat(entry["changed_at"])
+                entries.append(entry)
+    return entries
+
+async def write_batch(entries: List[dict]):
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        # executemany: SQLAlchemy mengirimnya sebagai INSERT ... VALUES multi-baris
+        await db.execute(insert(AuditLog), entries)
+        await db.commit()
+
+class AuditWriter:
+    """Satu per worker; menulis antrian ke audit_log dalam batch BATCH_SIZE."""
+    
+    def __init__(self, spool_dir: str):
+        self.spool_dir = spool_dir
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.wakeup = asyncio.Event()
+        self.closing = asyncio.Event()
+        self.task = None
+    
+    def enqueue(self, entries: List[dict]):
+        overflow = []
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                overflow.append(entry)
+        self.wakeup.set()
+        if overflow:
+            # Database tertinggal jauh; simpan ke disk daripada memblokir request atau membuang entri
+            spool(self.spool_dir, overflow)
+    
+    def drain(self) -> List[dict]:
+        batch = []
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+    
+    async def pause(self, seconds: float):
+        """Tidur, tetapi langsung bangun saat shutdown."""
+        try:
+            await asyncio.wait_for(self.closing.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def write(self, batch: List[dict]) -> bool:
+        try:
+            await write_batch(batch)
+            return True
+        except Exception:
+            logger.exception("Gagal menulis %d entri audit", len(batch))
+            await asyncio.to_thread(spool, self.spool_dir, batch)
+            return False
+    
+    async def replay_spools(self):
+        try:
+            for path in await asyncio.to_thread(claim_spools, self.spool_dir):
+                entries = await asyncio.to_thread(read_spool, path)
+                for start in range(0, len(entries), BATCH_SIZE):
+                    await write_batch(entries[start:start + BATCH_SIZE])
+                os.remove(path)
+                logger.info("%d entri audit dari spool %s ditulis", len(entries), path)
+        except Exception:
+            # File .replay tetap ada dan diambil lagi pada percobaan berikutnya
+            logger.exception("Gagal memutar ulang spool audit")
+    
+    async def run(self):
+        await self.replay_spools()
+        while True:
+            if self.queue.empty():
+                if self.closing.is_set():
+                    return
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            if self.queue.qsize() < BATCH_SIZE:
+                await self.pause(FLUSH_INTERVAL)
+    
+            if not await self.write(self.drain()):
+                await self.pause(RETRY_INTERVAL)
+            elif not self.closing.is_set() and os.path.exists(spool_path(self.spool_dir, os.getpid())):
+                # Spool dari antrian penuh/gagal tulis sebelumnya, setelah database pulih
+                await self.replay_spools()
+    
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        """Tulis semua entri yang tersisa; yang gagal ditulis masuk spool."""
+        self.closing.set()
+        self.wakeup.set()
+        await self.task
+
+def register_events():
+    if not event.contains(Session, "do_orm_execute", on_orm_execute):
+        event.listen(Session, "do_orm_execute", on_orm_execute)
+        event.listen(Session, "after_flush", after_flush)
+        event.listen(Session, "after_commit", after_commit)
+        event.listen(Session, "after_rollback", after_rollback)
+
+def start_audit(spool_dir: str):
+    global _writer
+    register_events()
+    _writer = AuditWriter(spool_dir)
+    _writer.start()
+
+async def stop_audit():
+    """Dipanggil di shutdown sebelum engine ditutup."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        await writer.stop()
@@ -1,27 +1,32 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-import os
 
-from ..database import get_db
+from ..config import get_settings
+from ..database import current_tenant, get_db
 from ..models.models import User
+from .audit import audit_actor
+from .profiling import stage
+
+# jose dan bcrypt diimpor saat pertama dipakai agar startup tetap cepat
 
-SECRET_KEY = os.getenv("SESSION_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
 
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    import bcrypt
+    with stage("bcrypt"):
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    import bcrypt
+    with stage("bcrypt"):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -30,12 +35,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    from jose import jwt
+    encoded_jwt = jwt.encode(to_encode, get_settings().secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 def decode_token(token: str) -> Optional[dict]:
+    from jose import JWTError, jwt
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, get_settings().secret_key, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
@@ -44,35 +51,55 @@ async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
 ) -> User:
-    token = credentials.credentials
-    payload = decode_token(token)
+    # Termasuk query user; muncul sebagai `auth` di Server-Timing saat PROFILING aktif
+    with stage("auth"):
+        token = credentials.credentials
+        payload = decode_token(token)
+    
+        if payload is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token tidak valid",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
     
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token tidak valid",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token tidak valid",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
     
-    user_id: str = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token tidak valid",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        # Tenant request ditentukan oleh user ini, jadi pencariannya lintas tenant
+        result = await db.execute(select(User).where(User.id == user_id).execution_options(all_tenants=True))
+        user = result.scalar_one_or_none()
     
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User tidak ditemukan",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    
+        # Klaim tenant dipakai pembatas rate tanpa query; token lama atau user yang
+        # dipindah tenant harus login ulang
+        if payload.get("tenant") != user.tenant_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token tidak valid",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
     
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User tidak ditemukan",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        # Dependency berjalan di task yang sama dengan handler, jadi terbaca oleh event
+        # audit dan pembatas query tenant
+        audit_actor.set(user.id)
+        current_tenant.set(user.tenant_id)
+        if user.tenant_id is not None:
+            from .tenancy import apply_tenant_setting
     
-    return user
+            await apply_tenant_setting(db)
+        return user
 
 def require_roles(allowed_roles: list):
     async def role_checker(current_user: User = Depends(get_current_user)):
@@ -0,0 +1,240 @@
+"""
+Dump dan load massal lewat COPY Postgres (asyncpg), dipakai seed.py untuk seed,
+migrasi data antar environment, dan restore.
+
+Satu direktori dump berisi satu file per tabel (CSV dengan header, atau format
+binary COPY) dan manifest.json berisi kolom, jumlah baris, dan SHA-256 setiap file.
+Manifest ditulis terakhir, jadi dump yang terputus tidak bisa di-load.
+
+Setiap tabel memakai koneksinya sendiri sehingga dump/load berjalan paralel. Dump
+memakai satu snapshot bersama (pg_export_snapshot), seperti pg_dump -j, agar
+sales/expenses konsisten dengan outlets walau diambil dari koneksi berbeda.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+
+from ..models.models import Expense, Outlet, OutletCogs, Sale, Tenant, User
+from .sync import SKIP_CHANGE_LOG
+
+BULK_TABLES = {
+    "tenants": Tenant,
+    "outlets": Outlet,
+    "outlet_cogs": OutletCogs,
+    "users": User,
+    "sales": Sale,
+    "expenses": Expense,
+}
+
+# Tabel dalam satu tahap di-load bersamaan; tahap berikutnya menunggu foreign key-nya
+LOAD_STAGES = [["tenants"], ["outlets"], ["outlet_cogs", "users", "sales", "expenses"]]
+
+FORMATS = {"csv": "csv", "binary": "bin"}
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+class ChecksumError(ValueError):
+    pass
+
+def columns_of(table: str) -> List[str]:
+    return [column.name for column in BULK_TABLES[table].__table__.columns]
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def copy_options(format: str) -> dict:
+    return {"format": "csv", "header": True} if format == "csv" else {"format": "binary"}
+
+def copied_rows(status: str) -> int:
+    # Status COPY/INSERT dari asyncpg: "COPY 123", "INSERT 0 123"
+    return int(status.split()[-1])
+
+async def connect():
+    """Koneksi asyncpg langsung (bukan dari pool SQLAlchemy) untuk COPY dan SET TRANSACTION SNAPSHOT."""
+    from ..config import get_settings
+    
+    settings = get_settings()
+    if settings.edge_mode:
+        raise ValueError("Dump/load COPY hanya untuk Postgres, bukan database edge SQLite")
+    
+    import asyncpg
+    
+    return await asyncpg.connect(settings.async_database_url.replace("postgresql+asyncpg://", "postgresql://", 1))
+
+def read_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise ValueError(f"{path} tidak ada: dump belum selesai atau bukan direktori dump")
+    with open(path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Versi manifest {manifest.get('version')} tidak didukung")
+    return manifest
+
+def write_manifest(directory: str, manifest: dict):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+async def dump_table(table: str, directory: str, format: str, snapshot: Optional[str]) -> dict:
+    columns = columns_of(table)
+    name = f"{table}.{FORMATS[format]}"
+    digest = hashlib.sha256()
+    size = 0
+    
+    conn = await connect()
+    try:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            if snapshot:
+                await conn.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+    
+            with open(os.path.join(directory, name), "wb") as file:
+                buffer = bytearray()
+    
+                def write_chunk(chunk: bytes):
+                    digest.update(chunk)
+                    file.write(chunk)
+    
+                async def output(chunk: bytes):
+                    # asyncpg bisa memanggil output per pesan CopyData (satu baris);
+                    # ditulis ke disk di thread per CHUNK_SIZE
+                    nonlocal size
+                    size += len(chunk)
+                    buffer.extend(chunk)
+                    if len(buffer) >= CHUNK_SIZE:
+                        await asyncio.to_thread(write_chunk, bytes(buffer))
+                        buffer.clear()
+    
+                # COPY (SELECT ...) karena COPY tabel TO tidak bisa untuk tabel berpartisi
+                status = await conn.copy_from_query(
+                    f"SELECT {', '.join(map(quote, columns))} FROM {quote(table)}",
+                    output=output, **copy_options(format)
+                )
+                await asyncio.to_thread(write_chunk, bytes(buffer))
+    finally:
+        await conn.close()
+    
+    return {"file": name, "columns": columns, "rows": copied_rows(status), "bytes": size, "sha256": digest.hexdigest()}
+
+async def dump(directory: str, tables: List[str], format: str = "csv") -> dict:
+    os.makedirs(directory, exist_ok=True)
+    conn = await connect()
+    try:
+        # Transaksi pengekspor harus tetap terbuka sampai semua koneksi memakai snapshot-nya
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            snapshot = await conn.fetchval("SELECT pg_export_snapshot()")
+            results = await asyncio.gather(*(dump_table(table, directory, format, snapshot) for table in tables))
+    finally:
+        await conn.close()
+    
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "format": format,
+        "tables": dict(zip(tables, results)),
+    }
+    await asyncio.to_thread(write_manifest, directory, manifest)
+    return manifest
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def verify(directory: str) -> Dict[str, bool]:
+    manifest = await asyncio.to_thread(read_manifest, directory)
+    checksums = await asyncio.gather(*(
+        asyncio.to_thread(file_checksum, os.path.join(directory, entry["file"]))
+        for entry in manifest["tables"].values()
+    ))
+    return {
+        table: checksum == entry["sha256"]
+        for (table, entry), checksum in zip(manifest["tables"].items(), checksums)
+    }
+
+async def read_verified(path: str, expected: str):
+    """Baca file per chunk sambil menghitung SHA-256; file rusak membatalkan COPY di akhir stream."""
+    digest = hashlib.sha256()
+    
+    def read_chunk(file) -> bytes:
+        chunk = file.read(CHUNK_SIZE)
+        digest.update(chunk)
+        return chunk
+    
+    with open(path, "rb") as file:
+        while chunk := await asyncio.to_thread(read_chunk, file):
+            yield chunk
+    if digest.hexdigest() != expected:
+        raise ChecksumError(f"Checksum {os.path.basename(path)} tidak cocok dengan manifest")
+
+async def load_table(table: str, directory: str, manifest: dict) -> dict:
+    """
+    Tabel kosong di-COPY langsung, tanpa change_log. Tabel berisi di-COPY ke tabel
+    sementara lalu digabung dengan ON CONFLICT DO NOTHING: baris yang sudah ada
+    (id, atau outlet + tanggal untuk sales) tidak ditimpa.
+    """
+    entry = manifest["tables"][table]
+    missing = set(entry["columns"]) - set(columns_of(table))
+    if missing:
+        raise ValueError(f"Kolom {table} di dump tidak ada di database: {', '.join(sorted(missing))}")
+    columns = entry["columns"]
+    column_list = ", ".join(map(quote, columns))
+    source = read_verified(os.path.join(directory, entry["file"]), entry["sha256"])
+    
+    conn = await connect()
+    try:
+        async with conn.transaction():
+            direct = not await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {quote(table)})")
+    
+            if direct:
+                await conn.execute(f"SET LOCAL {SKIP_CHANGE_LOG} = 'on'")
+                status = await conn.copy_to_table(table, source=source, columns=columns, **copy_options(manifest["format"]))
+                loaded = inserted = copied_rows(status)
+            else:
+                staging = f"load_{table}"
+                await conn.execute(
+                    f"CREATE TEMP TABLE {quote(staging)} (LIKE {quote(table)} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                status = await conn.copy_to_table(staging, source=source, columns=columns, **copy_options(manifest["format"]))
+                loaded = copied_rows(status)
+                inserted = copied_rows(await conn.execute(
+                    f"INSERT INTO {quote(table)} ({column_list}) SELECT {column_list} FROM {quote(staging)} "
+                    "ON CONFLICT DO NOTHING"
+                ))
+    
+            if loaded != entry["rows"]:
+                raise ChecksumError(f"{table}: {loaded} baris dibaca, manifest mencatat {entry['rows']}")
+    finally:
+        await conn.close()
+    
+    return {"rows": loaded, "inserted": inserted, "direct": direct}
+
+async def load(directory: str, tables: Optional[List[str]] = None, replace: bool = False) -> Dict[str, dict]:
+    """`tables` None berarti semua tabel di dump."""
+    manifest = await asyncio.to_thread(read_manifest, directory)
+    tables = tables or list(manifest["tables"])
+    unknown = [table for table in tables if table not in manifest["tables"]]
+    if unknown:
+        raise ValueError(f"Tabel tidak ada di dump: {', '.join(unknown)}")
+    
+    if replace:
+        conn = await connect()
+        try:
+            # CASCADE: tabel lain yang mereferensikan (jobs, anomali, ...) ikut dikosongkan
+            await conn.execute(f"TRUNCATE {', '.join(map(quote, tables))} CASCADE")
+        finally:
+            await conn.close()
+    
+    results = {}
+    for stage in LOAD_STAGES:
+        selected = [table for table in stage if table in tables]
+        stage_results = await asyncio.gather(*(load_table(table, directory, manifest) for table in selected))
+        results.update(zip(selected, stage_results))
+    return results
@@ -0,0 +1,410 @@
+"""
+Kartu ringkasan harian + MTD (periode tanggal 10) yang dibagikan owner ke grup
+WhatsApp, sebagai teks (format sama dengan komponen WhatsAppSummary) dan PNG.
+
+Kartu disimpan di CARD_DIR dengan nama kunci konten: HMAC SESSION_SECRET atas scope,
+outlet, tanggal, dan versi data periode itu (max(updated_at) + count sales, expenses,
+outlet, dan riwayat COGS). Selama data tidak berubah, request hanya menjalankan satu
+query versi lalu memakai file yang sama. Isi sebuah URL kartu tidak pernah berubah,
+jadi file dikirim dengan Cache-Control immutable; kunci tidak bisa ditebak sehingga
+URL-nya bisa dibuka tanpa login, seperti gambar yang memang sudah dibagikan.
+
+CardRefresher membaca change_log: kartu yang pernah diminta di worker ini dan
+periodenya tersentuh perubahan sales/expenses dibuat ulang oleh CARD_WORKERS task
+latar belakang, sehingga share berikutnya langsung mendapat kartu baru. Perubahan
+yang terlewat tetap aman karena versi selalu dicek ulang saat request.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from time import monotonic, time
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import ChangeLog, Expense, Outlet, OutletCogs, Sale
+from .cogs import join_effective_cogs
+from .conditional import version_columns
+from .recurring import period_start
+from .scope import Scope
+from .tenancy import use_tenant
+
+logger = logging.getLogger(__name__)
+
+# Naikkan jika format teks/gambar berubah, agar kartu lama tidak dipakai lagi
+CARD_FORMAT = 1
+
+# Kartu yang diminta dalam rentang ini ikut dibuat ulang saat datanya berubah
+WATCH_SECONDS = 36 * 3600
+WATCH_LIMIT = 500
+POLL_INTERVAL = 10.0
+POLL_BATCH = 5000
+# File kartu yang lebih tua dari ini dihapus; jika masih diminta, dibuat lagi
+CARD_TTL_SECONDS = 7 * 86400
+CLEANUP_INTERVAL = 3600.0
+
+MONTHS = [
+    "Januari", "Februari", "Maret", "April", "Mei", "Juni",
+    "Juli", "Agustus", "September", "Oktober", "November", "Desember",
+]
+SHORT_MONTHS = ["Jan", "Feb", "Mar", "Apr", "Mei", "Jun", "Jul", "Agu", "Sep", "Okt", "Nov", "Des"]
+
+_refresher: Optional["CardRefresher"] = None
+
+@dataclass(frozen=True)
+class CardSpec:
+    scope: Scope
+    outlet_id: Optional[str]
+    date: str
+    
+    @property
+    def start(self) -> str:
+        return period_start(date.fromisoformat(self.date)).isoformat()
+    
+    def covers(self, tenant_id: Optional[str], outlet_id: Optional[str], day: Optional[str]) -> bool:
+        if tenant_id != self.scope.tenant_id or not day or not self.start <= day <= self.date:
+            return False
+        ids = self.scope.outlet_ids(self.outlet_id)
+        return ids is None or outlet_id in ids
+
+def format_rupiah(amount: float) -> str:
+    text = f"{abs(round(amount)):,}".replace(",", ".")
+    return f"-Rp {text}" if amount < 0 else f"Rp {text}"
+
+def format_date(value: str) -> str:
+    day = date.fromisoformat(value)
+    return f"{day.day} {MONTHS[day.month - 1]} {day.year}"
+
+def format_short(value: str) -> str:
+    day = date.fromisoformat(value)
+    return f"{day.day} {SHORT_MONTHS[day.month - 1]}"
+
+def period_criteria(spec: CardSpec) -> tuple:
+    sales = [Sale.date >= spec.start, Sale.date <= spec.date, *spec.scope.sales(spec.outlet_id)]
+    expenses = [Expense.date >= spec.start, Expense.date <= spec.date, *spec.scope.expenses(spec.outlet_id)]
+    outlets = spec.scope.outlets(Outlet.id, spec.outlet_id)
+    cogs = spec.scope.outlets(OutletCogs.outlet_id, spec.outlet_id)
+    return sales, expenses, outlets, cogs
+
+async def card_key(db: AsyncSession, spec: CardSpec) -> str:
+    from ..config import get_settings
+    
+    sales, expenses, outlets, cogs = period_criteria(spec)
+    result = await db.execute(select(
+        *version_columns(Sale, *sales),
+        *version_columns(Expense, *expenses),
+        *version_columns(Outlet, *outlets),
+        *version_columns(OutletCogs, *cogs),
+    ))
+    # Role tidak ikut kunci: owner dan super_admin dengan data sama berbagi kartu
+    identity = (
+        CARD_FORMAT,
+        spec.scope.tenant_id,
+        spec.scope.outlet_ids(spec.outlet_id),
+        spec.scope.sees_salaries,
+        spec.date,
+        tuple(result.one()),
+    )
+    digest = hmac.new(get_settings().secret_key.encode("utf-8"), repr(identity).encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:32]
+
+async def card_data(db: AsyncSession, spec: CardSpec) -> dict:
+    """Total hari itu dan MTD per outlet dalam satu query GROUP BY per tabel."""
+    sales, expenses, outlets, _ = period_criteria(spec)
+    today_sale = Sale.date == spec.date
+    revenue = Sale.cash + Sale.qris + Sale.grab + Sale.gofood + Sale.shopee + Sale.tiktok
+    
+    sales_query = select(Sale.outlet_id).join(Outlet, Sale.outlet_id == Outlet.id)
+    sales_query, effective_cogs = join_effective_cogs(sales_query)
+    cogs = Sale.total_sold * effective_cogs
+    sales_query = sales_query.add_columns(
+        func.sum(revenue).filter(today_sale).label("revenue"),
+        func.sum(cogs).filter(today_sale).label("cogs"),
+        func.sum(Sale.total_sold).filter(today_sale).label("sold"),
+        func.max(Sale.sold_out_time).filter(today_sale).label("sold_out_time"),
+        func.sum(revenue).label("mtd_revenue"),
+        func.sum(cogs).label("mtd_cogs"),
+        func.sum(Sale.total_sold).label("mtd_sold"),
+    ).where(*sales).group_by(Sale.outlet_id)
+    
+    expense_query = select(
+        Expense.outlet_id,
+        func.sum(Expense.amount).filter(Expense.date == spec.date).label("expenses"),
+        func.sum(Expense.amount).label("mtd_expenses"),
+    ).where(*expenses).group_by(Expense.outlet_id)
+    
+    outlet_result = await db.execute(select(Outlet.id, Outlet.name).where(*outlets).order_by(Outlet.name))
+    rows: Dict[str, dict] = {
+        outlet_id: {
+            "outletId": outlet_id, "outletName": name, "revenue": 0.0, "cogs": 0.0, "sold": 0, "soldOutTime": None,
+            "expenses": 0.0, "mtdRevenue": 0.0, "mtdCogs": 0.0, "mtdSold": 0, "mtdExpenses": 0.0,
+        }
+        for outlet_id, name in outlet_result.all()
+    }
+    for row in (await db.execute(sales_query)).mappings().all():
+        if row["outlet_id"] in rows:
+            rows[row["outlet_id"]].update(
+                revenue=row["revenue"] or 0.0, cogs=row["cogs"] or 0.0, sold=row["sold"] or 0,
+                soldOutTime=row["sold_out_time"], mtdRevenue=row["mtd_revenue"] or 0.0,
+                mtdCogs=row["mtd_cogs"] or 0.0, mtdSold=row["mtd_sold"] or 0,
+            )
+    for row in (await db.execute(expense_query)).mappings().all():
+        if row["outlet_id"] in rows:
+            rows[row["outlet_id"]].update(expenses=row["expenses"] or 0.0, mtdExpenses=row["mtd_expenses"] or 0.0)
+    
+    outlets_list = list(rows.values())
+    totals = {key: sum(row[key] for row in outlets_list) for key in (
+        "revenue", "cogs", "sold", "expenses", "mtdRevenue", "mtdCogs", "mtdSold", "mtdExpenses"
+    )}
+    gross_margin = totals["revenue"] - totals["cogs"]
+    # Satu outlet: diminta lewat outlet_id, atau admin_outlet yang memang hanya punya satu
+    single = outlets_list[0] if spec.scope.outlet_ids(spec.outlet_id) is not None and len(outlets_list) == 1 else None
+    return {
+        "date": spec.date,
+        "periodStart": spec.start,
+        "outletId": spec.outlet_id,
+        "outletName": single["outletName"] if single else "Semua Outlet",
+        "soldOutTime": single["soldOutTime"] if single else None,
+        "totalRevenue": totals["revenue"],
+        "totalSold": totals["sold"],
+        "cogsSold": totals["cogs"],
+        "grossMargin": gross_margin,
+        "grossMarginPercentage": gross_margin / totals["revenue"] * 100 if totals["revenue"] else 0.0,
+        "expenses": totals["expenses"],
+        "mtdRevenue": totals["mtdRevenue"],
+        "mtdGrossMargin": totals["mtdRevenue"] - totals["mtdCogs"],
+        "mtdTotalSold": totals["mtdSold"],
+        "mtdExpenses": totals["mtdExpenses"],
+        "mtdNetProfit": totals["mtdRevenue"] - totals["mtdCogs"] - totals["mtdExpenses"],
+        "outlets": [] if single else [
+            {"outletName": row["outletName"], "totalRevenue": row["revenue"], "totalSold": row["sold"]}
+            for row in sorted(outlets_list, key=lambda row: -row["revenue"])
+        ],
+    }
+
+def card_sections(data: dict) -> List[List[tuple]]:
+    """Baris (label, nilai) per bagian; dipakai teks dan gambar agar isinya sama."""
+    period = f"{format_short(data['periodStart'])}–{format_short(data['date'])}"
+    sections = [
+        [
+            ("Pendapatan Total", format_rupiah(data["totalRevenue"])),
+            ("Total Pukis Terjual", f"{data['totalSold']} pcs"),
+            ("COGS Terpakai", format_rupiah(data["cogsSold"])),
+            ("Gross Margin", f"{format_rupiah(data['grossMargin'])} ({data['grossMarginPercentage']:.1f}%)"),
+            ("Pengeluaran", format_rupiah(data["expenses"])),
+        ],
+        [
+            (f"MTD GM ({period})", format_rupiah(data["mtdGrossMargin"])),
+            (f"MTD Total Pukis Terjual ({period})", f"{data['mtdTotalSold']} pcs"),
+            (f"MTD Pengeluaran ({period})", format_rupiah(data["mtdExpenses"])),
+            (f"MTD Laba Bersih ({period})", format_rupiah(data["mtdNetProfit"])),
+        ],
+    ]
+    if data["outlets"]:
+        sections.append([
+            (row["outletName"], f"{format_rupiah(row['totalRevenue'])} ({row['totalSold']} pcs)")
+            for row in data["outlets"]
+        ])
+    if data["soldOutTime"]:
+        sections.append([("Jam Sold Out", data["soldOutTime"])])
+    return sections
+
+def card_title(data: dict) -> str:
+    return f"SUMMARY PENJUALAN – {data['outletName']} – {format_date(data['date'])}"
+
+def render_text(data: dict) -> str:
+    blocks = [card_title(data)]
+    for section in card_sections(data):
+        blocks.append("\n".join(f"{label}: {value}" for label, value in section))
+    return "\n\n".join(blocks) + "\n"
+
+def render_png(data: dict, font_path: Optional[str] = None) -> Optional[bytes]:
+    """PNG 1080px untuk WhatsApp; None jika Pillow tidak terpasang (pip install '.[cards]')."""
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except ImportError:
+        return None
+    
+    def font(size: int):
+        if font_path:
+            return ImageFont.truetype(font_path, size)
+        return ImageFont.load_default(size=size)
+    
+    width, margin, line_height, gap = 1080, 56, 48, 28
+    title_font, label_font, value_font = font(34), font(28), font(30)
+    sections = card_sections(data)
+    height = 200 + sum(len(section) * line_height + gap for section in sections) + margin
+    
+    image = Image.new("RGB", (width, height), "#fffaf0")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 150), fill="#b45309")
+    draw.text((margin, 36), f"SUMMARY PENJUALAN – {data['outletName']}", font=title_font, fill="white")
+    draw.text((margin, 88), format_date(data["date"]), font=label_font, fill="#fde68a")
+    
+    y = 190
+    for index, section in enumerate(sections):
+        if index:
+            draw.line((margin, y - gap // 2, width - margin, y - gap // 2), fill="#e7d8c0", width=2)
+        for label, value in section:
+            draw.text((margin, y), label, font=label_font, fill="#57534e")
+            draw.text((width - margin, y), value, font=value_font, fill="#1c1917", anchor="ra")
+            y += line_height
+        y += gap
+    
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+def card_path(card_dir: str, key: str, extension: str) -> str:
+    return os.path.join(card_dir, f"{key}.{extension}")
+
+def write_atomic(path: str, content: bytes):
+    with open(f"{path}.{os.getpid()}.tmp", "wb") as file:
+        file.write(content)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+def read_card(card_dir: str, key: str) -> Optional[dict]:
+    try:
+        with open(card_path(card_dir, key, "json"), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def save_card(card_dir: str, key: str, data: dict, text: str, png: Optional[bytes]) -> dict:
+    os.makedirs(card_dir, exist_ok=True)
+    write_atomic(card_path(card_dir, key, "txt"), text.encode("utf-8"))
+    if png is not None:
+        write_atomic(card_path(card_dir, key, "png"), png)
+    card = {"key": key, "text": text, "hasImage": png is not None, "data": data}
+    # JSON terakhir: keberadaannya menandakan kartu lengkap
+    write_atomic(card_path(card_dir, key, "json"), json.dumps(card).encode("utf-8"))
+    return card
+
+async def build_card(db: AsyncSession, spec: CardSpec, key: str) -> dict:
+    from ..config import get_settings
+    
+    settings = get_settings()
+    data = await card_data(db, spec)
+    text = render_text(data)
+    png = await asyncio.to_thread(render_png, data, settings.card_font)
+    return await asyncio.to_thread(save_card, settings.card_dir, key, data, text, png)
+
+async def get_card(db: AsyncSession, spec: CardSpec) -> dict:
+    from ..config import get_settings
+    
+    key = await card_key(db, spec)
+    card = await asyncio.to_thread(read_card, get_settings().card_dir, key)
+    if card is None:
+        card = await build_card(db, spec, key)
+    if _refresher is not None:
+        _refresher.watch(spec)
+    return card
+
+def remove_expired(card_dir: str, max_age: float) -> int:
+    if not os.path.isdir(card_dir):
+        return 0
+    cutoff = time() - max_age
+    removed = 0
+    for entry in os.scandir(card_dir):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+class CardRefresher:
+    """Satu per worker: memantau change_log dan membuat ulang kartu yang sedang dipakai."""
+    
+    def __init__(self, card_dir: str, workers: int):
+        self.card_dir = card_dir
+        self.workers = workers
+        self.watched: "OrderedDict[CardSpec, float]" = OrderedDict()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.queued = set()
+        self.cursor: Optional[int] = None
+    
+    def watch(self, spec: CardSpec):
+        self.watched[spec] = monotonic()
+        self.watched.move_to_end(spec)
+        while len(self.watched) > WATCH_LIMIT:
+            self.watched.popitem(last=False)
+    
+    def enqueue(self, spec: CardSpec):
+        if spec not in self.queued:
+            self.queued.add(spec)
+            self.queue.put_nowait(spec)
+    
+    async def poll(self):
+        from ..database import get_db_context
+    
+        async with get_db_context() as db:
+            if self.cursor is None:
+                # Mulai dari posisi sekarang; kartu lama dicek versinya saat diminta
+                self.cursor = await db.scalar(select(func.max(ChangeLog.id))) or 0
+                return
+            result = await db.execute(
+                select(ChangeLog.id, ChangeLog.tenant_id, ChangeLog.outlet_id, ChangeLog.date)
+                .where(ChangeLog.id > self.cursor, ChangeLog.table_name.in_(["sales", "expenses"]))
+                .order_by(ChangeLog.id).limit(POLL_BATCH)
+            )
+            rows = result.all()
+        if not rows:
+            return
+        self.cursor = rows[-1].id
+    
+        expired = monotonic() - WATCH_SECONDS
+        for spec, requested_at in list(self.watched.items()):
+            if requested_at < expired:
+                del self.watched[spec]
+            elif any(spec.covers(row.tenant_id, row.outlet_id, row.date) for row in rows):
+                self.enqueue(spec)
+    
+    async def refresh(self, spec: CardSpec):
+        from ..database import get_db_context
+    
+        with use_tenant(spec.scope.tenant_id):
+            async with get_db_context() as db:
+                key = await card_key(db, spec)
+                if not await asyncio.to_thread(os.path.exists, card_path(self.card_dir, key, "json")):
+                    await build_card(db, spec, key)
+    
+    async def work(self):
+        while True:
+            spec = await self.queue.get()
+            self.queued.discard(spec)
+            try:
+                await self.refresh(spec)
+            except Exception:
+                logger.exception("Gagal membuat ulang kartu ringkasan %s", spec.date)
+    
+    async def run(self):
+        workers = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+        last_cleanup = 0.0
+        try:
+            while True:
+                try:
+                    await self.poll()
+                    if monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                        removed = await asyncio.to_thread(remove_expired, self.card_dir, CARD_TTL_SECONDS)
+                        if removed:
+                            logger.info("%d file kartu ringkasan kedaluwarsa dihapus", removed)
+                        last_cleanup = monotonic()
+                except Exception:
+                    logger.exception("Gagal memantau perubahan untuk kartu ringkasan")
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+def start_card_refresher(card_dir: str, workers: int) -> asyncio.Task:
+    global _refresher
+    _refresher = CardRefresher(card_dir, workers)
+    return asyncio.create_task(_refresher.run())
@@ -0,0 +1,133 @@
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, and_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import current_tenant
+from ..models.models import Outlet, OutletCogs, Sale
+from .conditional import version_columns
+
+# Entri pertama riwayat berlaku sejak awal, supaya penjualan lama tetap memakai
+# COGS yang berlaku sebelum perubahan pertama
+COGS_EPOCH = "1970-01-01"
+OPEN_END = "9999-12-31"
+
+class CogsIndex:
+    """Indeks interval per outlet: tanggal mulai terurut + nilai, dicari dengan bisect."""
+    
+    def __init__(self, history: Dict[str, Tuple[List[str], List[float]]], current: Dict[str, float]):
+        self.history = history
+        self.current = current
+    
+    def lookup(self, outlet_id: str, sale_date: str) -> float:
+        entries = self.history.get(outlet_id)
+        if entries:
+            dates, values = entries
+            position = bisect_right(dates, sale_date) - 1
+            if position >= 0:
+                return values[position]
+        return self.current.get(outlet_id) or 0
+
+# Per tenant (None untuk single-tenant): (versi, indeks)
+_cache: Dict[Optional[str], Tuple[tuple, CogsIndex]] = {}
+
+async def get_cogs_index(db: AsyncSession) -> CogsIndex:
+    """Indeks di-cache per proses dan dibangun ulang hanya jika versi riwayat/outlet berubah."""
+    result = await db.execute(select(*version_columns(OutletCogs), *version_columns(Outlet)))
+    version = tuple(result.one())
+    tenant_id = current_tenant.get()
+    cached = _cache.get(tenant_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    history: Dict[str, Tuple[List[str], List[float]]] = {}
+    rows = await db.execute(
+        select(OutletCogs.outlet_id, OutletCogs.effective_from, OutletCogs.cogs_per_piece)
+        .order_by(OutletCogs.outlet_id, OutletCogs.effective_from)
+    )
+    for outlet_id, effective_from, cogs_per_piece in rows.all():
+        dates, values = history.setdefault(outlet_id, ([], []))
+        dates.append(effective_from)
+        values.append(cogs_per_piece)
+    
+    outlets = await db.execute(select(Outlet.id, Outlet.cogs_per_piece))
+    index = CogsIndex(history, {outlet_id: cogs for outlet_id, cogs in outlets.all()})
+    
+    _cache[tenant_id] = (version, index)
+    return index
+
+def cogs_periods():
+    """Riwayat COGS sebagai interval [effective_from, effective_to) untuk range join di SQL."""
+    effective_to = func.lead(OutletCogs.effective_from).over(
+        partition_by=OutletCogs.outlet_id,
+        order_by=OutletCogs.effective_from
+    )
+    return select(
+        OutletCogs.outlet_id,
+        OutletCogs.effective_from,
+        func.coalesce(effective_to, literal(OPEN_END)).label("effective_to"),
+        OutletCogs.cogs_per_piece,
+    ).subquery("cogs_periods")
+
+def join_effective_cogs(query, sale=Sale, outlet=Outlet):
+    """
+    Tambahkan range join ke riwayat COGS pada query penjualan yang sudah menyertakan
+    Outlet. Mengembalikan (query, kolom COGS per buah yang berlaku pada tanggal sale).
+    """
+    periods = cogs_periods()
+    query = query.outerjoin(
+        periods,
+        and_(
+            periods.c.outlet_id == sale.outlet_id,
+            periods.c.effective_from <= sale.date,
+            sale.date < periods.c.effective_to,
+        )
+    )
+    return query, func.coalesce(periods.c.cogs_per_piece, outlet.cogs_per_piece, 0).label("effective_cogs")
+
+async def set_outlet_cogs(
+    db: AsyncSession,
+    outlet: Outlet,
+    cogs_per_piece: float,
+    effective_from: Optional[str] = None
+) -> OutletCogs:
+    """
+    Catat COGS baru mulai effective_from (default hari ini) tanpa mengubah margin
+    penjualan sebelumnya. Outlet tanpa riwayat mendapat entri awal berisi nilai lamanya.
+    Jika nilai yang berlaku pada effective_from sudah sama, timeline tidak diubah dan
+    entri yang berlaku dikembalikan. Tidak melakukan commit.
+    """
+    today = date.today().isoformat()
+    effective_from = effective_from or today
+    
+    result = await db.execute(select(OutletCogs).where(OutletCogs.outlet_id == outlet.id))
+    entries = {entry.effective_from: entry for entry in result.scalars().all()}
+    timeline = {key: entry.cogs_per_piece for key, entry in entries.items()}
+    
+    if not entries and effective_from != COGS_EPOCH:
+        entries[COGS_EPOCH] = OutletCogs(
+            outlet_id=outlet.id, effective_from=COGS_EPOCH, cogs_per_piece=outlet.cogs_per_piece or 0
+        )
+        db.add(entries[COGS_EPOCH])
+        timeline[COGS_EPOCH] = outlet.cogs_per_piece or 0
+    
+    in_effect = max((key for key in timeline if key <= effective_from), default=None)
+    if in_effect is not None and timeline[in_effect] == cogs_per_piece:
+        return entries[in_effect]
+    
+    entry = entries.get(effective_from)
+    if entry:
+        entry.cogs_per_piece = cogs_per_piece
+    else:
+        entry = OutletCogs(outlet_id=outlet.id, effective_from=effective_from, cogs_per_piece=cogs_per_piece)
+        db.add(entry)
+    timeline[effective_from] = cogs_per_piece
+    
+    # outlets.cogs_per_piece tetap menyimpan nilai yang berlaku hari ini
+    started = [key for key in timeline if key <= today]
+    if started:
+        outlet.cogs_per_piece = timeline[max(started)]
+    
+    return entry
@@ -0,0 +1,159 @@
+"""
+Kompresi respons (brotli/gzip) sebagai middleware ASGI. Brotli dipakai jika paket
+`brotli` terpasang dan diminta klien; selain itu gzip. Respons di bawah ambang
+ukuran, tipe konten biner, dan respons yang sudah ter-encode dilewatkan apa adanya.
+Body streaming (laporan CSV, file) dikompresi per chunk tanpa di-buffer utuh.
+"""
+from importlib.util import find_spec
+from typing import Optional
+import asyncio
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Tipe teks yang layak dikompresi; gambar, PDF, dan arsip sudah terkompresi
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+# Chunk sebesar ini dikompresi di thread agar event loop tidak tertahan
+THREAD_THRESHOLD = 256 * 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+HAS_BROTLI = find_spec("brotli") is not None
+
+def accepted_encodings(accept_encoding: str) -> dict:
+    """`gzip, br;q=0.8, *;q=0` -> {"gzip": 1.0, "br": 0.8, "*": 0.0}"""
+    encodings = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    encodings = accepted_encodings(accept_encoding)
+    candidates = ["br", "gzip"] if HAS_BROTLI else ["gzip"]
+    
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = encodings.get(name, encodings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+class GzipCompressor:
+    def __init__(self):
+        # wbits 31: format gzip (header + trailer), bukan zlib mentah
+        self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+    
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+class BrotliCompressor:
+    def __init__(self):
+        import brotli
+    
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+    
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+COMPRESSORS = {"gzip": GzipCompressor, "br": BrotliCompressor}
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return "content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_TYPES)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+    
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+    
+        await CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+class CompressedResponder:
+    """Tahan `http.response.start` sampai chunk body pertama menentukan perlu kompresi atau tidak."""
+    
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+    
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+    
+    async def compress(self, data: bytes) -> bytes:
+        if len(data) >= THREAD_THRESHOLD:
+            return await asyncio.to_thread(self.compressor.compress, data)
+        return self.compressor.compress(data)
+    
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+    
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+    
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not is_compressible(headers):
+                self.passthrough = True
+            else:
+                headers.add_vary_header("Accept-Encoding")
+                self.passthrough = not more_body and len(body) < self.minimum_size
+    
+            if self.passthrough:
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+    
+            self.compressor = COMPRESSORS[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            if not more_body:
+                body = await self.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+            else:
+                del headers["Content-Length"]
+                body = await self.compress(body)
+    
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+    
+        body = await self.compress(body)
+        if not more_body:
+            body += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
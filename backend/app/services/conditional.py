@@ -0,0 +1,76 @@
+from datetime import timezone
+from email.utils import format_datetime
+from typing import Optional
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .scope import Scope
+
+CACHE_CONTROL = "private, no-cache"
+
+def version_columns(model, *criteria) -> tuple:
+    """max(updated_at) dan count untuk satu scope, sebagai scalar subquery."""
+    return (
+        select(func.max(model.updated_at)).where(*criteria).scalar_subquery(),
+        select(func.count()).select_from(model).where(*criteria).scalar_subquery(),
+    )
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    scope: Scope,
+    *columns,
+    extra: tuple = ()
+) -> Optional[Response]:
+    """
+    Hitung versi scope dalam satu query tanpa menyentuh isi baris.
+    `extra` untuk versi di luar database, mis. file arsip.
+    Mengembalikan response 304 jika ETag klien masih berlaku, selain itu
+    memasang header ETag/Last-Modified pada response dan mengembalikan None.
+    """
+    result = await db.execute(select(*columns))
+    version = tuple(result.one())
+    
+    etag = make_etag(
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        scope.tenant_id,
+        scope.role,
+        scope.outlet_id,
+        version,
+        extra
+    )
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    
+    timestamps = [value for value in version if hasattr(value, "tzinfo")]
+    if timestamps:
+        last_modified = max(timestamps)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    
+    # If-Modified-Since sengaja tidak dipakai: penghapusan baris tidak menggeser
+    # max(updated_at), sehingga hanya ETag (yang memuat count) yang bisa dipercaya.
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,137 @@
+from datetime import date, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import ProductionForecast
+from .analytics import SalesFrame, load_frame, to_day, from_day, weekday
+from .scheduler import db_time_ago, exclusive
+
+HISTORY_DAYS = 3 * 365
+# Bobot observasi turun setengahnya setiap 8 minggu
+HALF_LIFE_DAYS = 56
+
+# Jam operasional default untuk mengoreksi hari sold-out
+OPEN_MINUTE = 7 * 60
+CLOSE_MINUTE = 21 * 60
+MAX_UPLIFT = 2.0
+
+# Observasi semu rata-rata outlet yang dicampur ke tiap hari, agar kombinasi
+# outlet x hari dengan data sedikit tidak menghasilkan angka ekstrem
+PRIOR_WEIGHT = 3.0
+
+# z untuk service level ~80%: produksi cukup pada 4 dari 5 hari
+SERVICE_Z = 0.84
+PRODUCTION_STEP = 5
+
+def unconstrained_demand(frame: SalesFrame) -> np.ndarray:
+    """
+    Hari sold-out hanya memberi batas bawah permintaan. Ekstrapolasi penjualan
+    secara linear ke jam tutup, dibatasi MAX_UPLIFT.
+    """
+    censored = ~np.isnan(frame.sold_out_minute)
+    elapsed = np.clip(np.nan_to_num(frame.sold_out_minute) - OPEN_MINUTE, 1, None)
+    uplift = np.where(censored, np.clip((CLOSE_MINUTE - OPEN_MINUTE) / elapsed, 1, MAX_UPLIFT), 1)
+    return frame.total_sold * uplift
+
+def compute_forecasts(frame: SalesFrame, as_of_day: int) -> dict:
+    """
+    Perkiraan permintaan semua outlet x hari dalam satu lintasan vektor.
+    Mengembalikan array berbentuk (n_outlets, 7).
+    """
+    n_outlets = len(frame.outlet_ids)
+    n_groups = n_outlets * 7
+    groups = frame.outlet.astype(np.int64) * 7 + weekday(frame.day)
+    mask = frame.day < as_of_day
+    
+    age = np.maximum(as_of_day - frame.day, 0)
+    weights = np.where(mask, 0.5 ** (age / HALF_LIFE_DAYS), 0.0)
+    demand = unconstrained_demand(frame)
+    censored = (~np.isnan(frame.sold_out_minute)).astype(np.float64)
+    
+    sums = frame.group_sums(
+        np.vstack([
+            weights,
+            weights ** 2,
+            weights * demand,
+            weights * demand ** 2,
+            weights * censored,
+            np.ones(frame.size),
+        ]),
+        groups, mask, n_groups
+    ).reshape(6, n_outlets, 7)
+    weight_sum, weight_sq_sum, demand_sum, demand_sq_sum, censored_sum, observations = sums
+    
+    def weighted(values: np.ndarray, total: np.ndarray) -> np.ndarray:
+        return np.divide(values, total, out=np.zeros_like(values, dtype=np.float64), where=total > 0)
+    
+    day_mean = weighted(demand_sum, weight_sum)
+    day_var = weighted(demand_sq_sum, weight_sum) - day_mean ** 2
+    # Ukuran sampel efektif (Kish) karena observasi lama berbobot lebih kecil
+    effective_n = weighted(weight_sum ** 2, weight_sq_sum)
+    
+    # Shrinkage ke rata-rata outlet (semua hari) sebagai prior
+    outlet_mean = weighted(demand_sum.sum(axis=1, keepdims=True), weight_sum.sum(axis=1, keepdims=True))
+    
+    forecast = (effective_n * day_mean + PRIOR_WEIGHT * outlet_mean) / (effective_n + PRIOR_WEIGHT)
+    std = np.sqrt(np.maximum(day_var, 0))
+    recommended = np.ceil((forecast + SERVICE_Z * std) / PRODUCTION_STEP) * PRODUCTION_STEP
+    sold_out_rate = weighted(censored_sum, weight_sum)
+    
+    return {
+        "forecast": forecast,
+        "std": std,
+        "recommended": recommended.astype(np.int64),
+        "observations": observations.astype(np.int64),
+        "sold_out_rate": sold_out_rate,
+    }
+
+async def refresh_forecasts(db: AsyncSession, as_of: Optional[str] = None) -> int:
+    """Hitung ulang seluruh tabel production_forecasts dalam satu transaksi."""
+    as_of = as_of or date.today().isoformat()
+    as_of_day = to_day(as_of)
+    
+    frame = await load_frame(
+        db, None, from_day(as_of_day - HISTORY_DAYS), from_day(as_of_day - 1), comparison=False
+    )
+    result = compute_forecasts(frame, as_of_day)
+    
+    rows = [
+        {
+            "outlet_id": outlet_id,
+            "weekday": day,
+            "forecast_demand": round(float(result["forecast"][i, day]), 2),
+            "demand_std": round(float(result["std"][i, day]), 2),
+            "recommended_production": int(result["recommended"][i, day]),
+            "observations": int(result["observations"][i, day]),
+            "sold_out_rate": round(float(result["sold_out_rate"][i, day]), 4),
+        }
+        for i, outlet_id in enumerate(frame.outlet_ids)
+        for day in range(7)
+    ]
+    
+    await db.execute(delete(ProductionForecast))
+    if rows:
+        await db.execute(insert(ProductionForecast), rows)
+    await db.commit()
+    
+    return len(rows)
+
+async def nightly_refresh():
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        async with exclusive(db, "production_forecasts") as acquired:
+            if not acquired:
+                return
+    
+            # Worker lain mungkin sudah selesai lebih dulu dan melepas lock-nya.
+            # Bandingkan dengan jam database, bukan jam proses ini.
+            recent = await db.scalar(
+                select(func.max(ProductionForecast.computed_at) > db_time_ago(db, timedelta(hours=1)))
+            )
+            if recent:
+                return
+    
+            await refresh_forecasts(db)
@@ -0,0 +1,278 @@
+"""
+Antrian job latar belakang yang disimpan di tabel jobs.
+Setiap worker menjalankan JobRunner yang mengklaim job dengan FOR UPDATE SKIP LOCKED,
+sehingga job bertahan saat restart dan terbagi ke semua worker.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Type
+import asyncio
+import logging
+import os
+
+from pydantic import BaseModel
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models.models import Job, JobStatus, User
+from ..schemas.schemas import (
+    SalesExportParams, ExpensesExportParams, YearReportParams, ForecastRefreshParams, AnomalyScanParams,
+    SettlementReconcileParams
+)
+from . import reports
+from .scheduler import db_time_ago, exclusive
+from .tenancy import use_tenant
+
+logger = logging.getLogger(__name__)
+
+ALL_ROLES = ["super_admin", "owner", "admin_outlet", "finance"]
+
+POLL_INTERVAL = 2.0
+HEARTBEAT_INTERVAL = 10.0
+# Job berstatus running tanpa heartbeat selama ini dianggap ditinggal worker yang mati
+STALE_AFTER = timedelta(minutes=2)
+MAX_ATTEMPTS = 3
+RESULT_TTL = timedelta(days=7)
+
+@dataclass(frozen=True)
+class JobType:
+    handler: Callable[..., Awaitable[dict]]
+    params: Type[BaseModel]
+    roles: List[str]
+    # Batas job berjalan bersamaan untuk tipe ini, di semua worker
+    concurrency: int = 1
+    # Ekstensi file hasil, None jika job tidak menghasilkan file
+    output: Optional[str] = "csv"
+
+JOB_TYPES: Dict[str, JobType] = {
+    "sales_export": JobType(reports.export_sales, SalesExportParams, ALL_ROLES, concurrency=2),
+    "expenses_export": JobType(reports.export_expenses, ExpensesExportParams, ALL_ROLES, concurrency=2),
+    "year_report": JobType(reports.year_report, YearReportParams, ["super_admin", "owner", "finance"]),
+    "forecast_refresh": JobType(
+        reports.forecast_refresh, ForecastRefreshParams, ["super_admin", "owner"], output=None
+    ),
+    "settlement_reconcile": JobType(
+        reports.settlement_reconcile, SettlementReconcileParams, ["super_admin", "owner", "finance"]
+    ),
+    "anomaly_scan": JobType(
+        reports.anomaly_scan, AnomalyScanParams, ["super_admin", "owner"], output=None
+    ),
+}
+
+def result_path(job: Job) -> str:
+    return os.path.join(get_settings().job_result_dir, f"{job.id}.{JOB_TYPES[job.type].output}")
+
+def remove_file(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+async def submit_job(db: AsyncSession, user: User, job_type: str, params: BaseModel) -> Job:
+    """Simpan job baru lalu bangunkan runner di proses ini."""
+    job = Job(type=job_type, params=params.model_dump(), created_by=user.id)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    
+    if _runner is not None:
+        _runner.wake()
+    return job
+
+async def claim_job(db: AsyncSession, job_type: str, concurrency: int) -> Optional[Job]:
+    running = select(func.count()).select_from(Job).where(
+        Job.type == job_type, Job.status == JobStatus.running.value
+    ).scalar_subquery()
+    candidate = select(Job.id).where(
+        Job.type == job_type, Job.status == JobStatus.queued.value, running < concurrency
+    ).order_by(Job.created_at).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    
+    result = await db.execute(
+        update(Job).where(Job.id == candidate).values(
+            status=JobStatus.running.value,
+            attempts=Job.attempts + 1,
+            started_at=func.now(),
+            heartbeat_at=func.now(),
+        ).returning(Job)
+    )
+    return result.scalar_one_or_none()
+
+async def finish_job(job_id: str, status: JobStatus, **values):
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        # Hanya job yang masih running milik kita; bisa saja sudah diantrikan ulang
+        await db.execute(
+            update(Job).where(Job.id == job_id, Job.status == JobStatus.running.value)
+            .values(status=status.value, finished_at=func.now(), **values)
+        )
+        await db.commit()
+
+class JobRunner:
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.wakeup = asyncio.Event()
+        self.stopping = False
+    
+    def wake(self):
+        self.wakeup.set()
+    
+    def cancel_local(self, job_id: str) -> bool:
+        task = self.tasks.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last_maintenance = 0.0
+    
+        while True:
+            self.wakeup.clear()
+            # Masing-masing dalam try sendiri: pemeliharaan yang gagal tidak boleh
+            # menghentikan klaim job baru
+            if loop.time() - last_maintenance >= HEARTBEAT_INTERVAL:
+                for step in (self.heartbeat, self.recover):
+                    try:
+                        await step()
+                    except Exception:
+                        logger.exception("Pemeliharaan job runner (%s) gagal", step.__name__)
+                last_maintenance = loop.time()
+            try:
+                await self.claim()
+            except Exception:
+                logger.exception("Job runner gagal")
+    
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def claim(self):
+        from ..database import get_db_context
+    
+        for name, job_type in JOB_TYPES.items():
+            async with get_db_context() as db:
+                # Serialisasi klaim per tipe agar hitungan job running akurat antar worker
+                async with exclusive(db, f"jobs:{name}") as acquired:
+                    if not acquired:
+                        continue
+    
+                    claimed = []
+                    while job := await claim_job(db, name, job_type.concurrency):
+                        claimed.append(job)
+                    await db.commit()
+    
+            for job in claimed:
+                task = asyncio.create_task(self.execute(job))
+                self.tasks[job.id] = task
+                task.add_done_callback(lambda _, job_id=job.id: self.tasks.pop(job_id, None))
+    
+    async def execute(self, job: Job):
+        from ..database import get_db_context
+    
+        job_type = JOB_TYPES[job.type]
+        path = result_path(job) if job_type.output else None
+        try:
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Query dan baris baru handler dibatasi ke tenant pembuat job
+            with use_tenant(job.tenant_id):
+                async with get_db_context() as db:
+                    user = await db.get(User, job.created_by)
+                    result = await job_type.handler(db, user, job_type.params(**job.params), path)
+            await finish_job(job.id, JobStatus.succeeded, result=result, result_path=path)
+        except asyncio.CancelledError:
+            remove_file(path)
+            if self.stopping:
+                await self.requeue(job.id)
+            else:
+                await finish_job(job.id, JobStatus.cancelled)
+        except Exception as exc:
+            logger.exception("Job %s (%s) gagal", job.id, job.type)
+            remove_file(path)
+            await finish_job(job.id, JobStatus.failed, error=str(exc)[:1000] or type(exc).__name__)
+    
+    async def requeue(self, job_id: str):
+        from ..database import get_db_context
+    
+        async with get_db_context() as db:
+            await db.execute(
+                update(Job).where(Job.id == job_id, Job.status == JobStatus.running.value)
+                .values(status=JobStatus.queued.value, started_at=None, heartbeat_at=None)
+            )
+            await db.commit()
+    
+    async def heartbeat(self):
+        """Tandai job lokal masih hidup dan hentikan yang diminta batal dari worker lain."""
+        from ..database import get_db_context
+    
+        if not self.tasks:
+            return
+    
+        async with get_db_context() as db:
+            result = await db.execute(
+                update(Job).where(Job.id.in_(list(self.tasks)), Job.status == JobStatus.running.value)
+                .values(heartbeat_at=func.now())
+                .returning(Job.id, Job.cancel_requested)
+            )
+            rows = result.all()
+            await db.commit()
+    
+        for job_id, cancel_requested in rows:
+            if cancel_requested:
+                self.cancel_local(job_id)
+    
+    async def recover(self):
+        """Antrikan ulang job dari worker yang mati dan hapus hasil yang kedaluwarsa."""
+        from ..database import get_db_context
+    
+        async with get_db_context() as db:
+            async with exclusive(db, "jobs:recover") as acquired:
+                if not acquired:
+                    return
+    
+                # Batas waktu dihitung di database: kolomnya naive, now() Postgres tidak
+                stale = [Job.status == JobStatus.running.value, Job.heartbeat_at < db_time_ago(db, STALE_AFTER)]
+                await db.execute(
+                    update(Job).where(*stale, Job.attempts < MAX_ATTEMPTS)
+                    .values(status=JobStatus.queued.value, started_at=None, heartbeat_at=None)
+                )
+                await db.execute(
+                    update(Job).where(*stale, Job.attempts >= MAX_ATTEMPTS).values(
+                        status=JobStatus.failed.value,
+                        finished_at=func.now(),
+                        error="Worker berhenti saat menjalankan job"
+                    )
+                )
+    
+                expired = await db.execute(
+                    delete(Job).where(Job.finished_at < db_time_ago(db, RESULT_TTL)).returning(Job.result_path)
+                )
+                for path in expired.scalars().all():
+                    remove_file(path)
+                await db.commit()
+    
+    async def stop(self):
+        """Saat shutdown, job yang sedang berjalan dikembalikan ke antrian untuk worker berikutnya."""
+        self.stopping = True
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+_runner: Optional[JobRunner] = None
+
+def start_runner() -> asyncio.Task:
+    global _runner
+    _runner = JobRunner()
+    return asyncio.create_task(_runner.run())
+
+def get_runner() -> Optional[JobRunner]:
+    return _runner
+
+async def stop_runner():
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+    _runner = None
@@ -0,0 +1,209 @@
+"""
+Partisi range bulanan (Postgres) untuk tabel sales dan expenses pada kolom date.
+Query rentang pendek hanya menyentuh partisi bulan yang relevan (partition pruning).
+"""
+from datetime import date
+from typing import List, Optional
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+from .scheduler import exclusive
+
+logger = logging.getLogger(__name__)
+
+# Nama primary key disamakan dengan shared/schema.ts agar db:push tidak mencoba
+# membuat ulang. Primary key harus memuat kolom partisi, jadi (id, date).
+PARTITIONED_TABLES = {
+    "sales": "sales_id_date_pk",
+    "expenses": "expenses_id_date_pk",
+}
+MONTHS_AHEAD = 3
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+def month_start(value: str) -> date:
+    return date(int(value[:4]), int(value[5:7]), 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def month_range(first: date, last: date) -> List[date]:
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y%m}"
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+async def is_partitioned(db: AsyncSession, table: str) -> bool:
+    if db.bind.dialect.name != "postgresql":
+        return False
+    
+    result = await db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    )
+    return bool(result.scalar())
+
+async def existing_partitions(db: AsyncSession, table: str) -> List[str]:
+    result = await db.execute(
+        text("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:table)
+        """),
+        {"table": table}
+    )
+    return [row[0] for row in result.all()]
+
+async def create_partition(db: AsyncSession, table: str, month: date):
+    await db.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+async def split_default(db: AsyncSession, table: str, months: List[date]):
+    """
+    Partisi baru tidak bisa dibuat selama partisi default masih memuat baris
+    untuk rentangnya. Lepas default, buat partisinya, pindahkan barisnya,
+    lalu pasang kembali default dalam transaksi yang sama.
+    """
+    default = default_partition(table)
+    await db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+    for month in months:
+        await create_partition(db, table, month)
+        bounds = {"start": month.isoformat(), "end": add_months(month, 1).isoformat()}
+        await db.execute(text(
+            f'INSERT INTO "{table}" SELECT * FROM "{default}" WHERE date >= :start AND date < :end'
+        ), bounds)
+        await db.execute(text(
+            f'DELETE FROM "{default}" WHERE date >= :start AND date < :end'
+        ), bounds)
+    await db.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+
+async def ensure_partitions(db: AsyncSession, table: str, today: Optional[date] = None) -> List[str]:
+    """
+    Pindahkan baris di partisi default (backdate, atau tanggal jauh di depan) ke
+    partisi bulannya, lalu pastikan partisi bulan berjalan hingga MONTHS_AHEAD bulan
+    ke depan tersedia. Urutannya penting: CREATE TABLE ... PARTITION OF gagal jika
+    default masih memuat baris untuk bulan itu. Tidak melakukan commit.
+    """
+    first = (today or date.today()).replace(day=1)
+    
+    result = await db.execute(text(
+        f'SELECT DISTINCT substr(date, 1, 7) FROM "{default_partition(table)}" WHERE date ~ :pattern'
+    ), {"pattern": DATE_PATTERN})
+    stray_months = sorted(month_start(row[0]) for row in result.all())
+    if stray_months:
+        await split_default(db, table, stray_months)
+    created = [partition_name(table, month) for month in stray_months]
+    
+    existing = set(await existing_partitions(db, table))
+    for month in month_range(first, add_months(first, MONTHS_AHEAD)):
+        if partition_name(table, month) not in existing:
+            await create_partition(db, table, month)
+            created.append(partition_name(table, month))
+    
+    return created
+
+async def convert_to_partitioned(db: AsyncSession, table: str) -> bool:
+    """
+    Migrasi satu kali: ubah tabel biasa menjadi tabel berpartisi bulanan.
+    Mengunci tabel selama data disalin, jalankan saat aplikasi berhenti.
+    Tidak melakukan commit.
+    """
+    if db.bind.dialect.name != "postgresql":
+        raise ValueError("Partisi hanya didukung pada PostgreSQL")
+    if await is_partitioned(db, table):
+        return False
+    
+    from ..models.models import Base
+    from .search import SEARCH_INDEX, create_search_index
+    
+    pk_name = PARTITIONED_TABLES[table]
+    legacy = f"{table}_unpartitioned"
+    # Index trigram hanya ada jika pg_trgm terpasang (services.search)
+    had_search_index = table == "expenses" and await db.scalar(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{SEARCH_INDEX}"'}
+    )
+    
+    await db.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+    await db.execute(text(
+        f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (date)'
+    ))
+    
+    result = await db.execute(text(
+        f'SELECT min(date), max(date) FROM "{legacy}" WHERE date ~ :pattern'
+    ), {"pattern": DATE_PATTERN})
+    first, last = result.one()
+    today = date.today().replace(day=1)
+    first = month_start(first) if first else today
+    last = max(month_start(last) if last else today, add_months(today, MONTHS_AHEAD))
+    
+    for month in month_range(first, last):
+        await create_partition(db, table, month)
+    await db.execute(text(f'CREATE TABLE "{default_partition(table)}" PARTITION OF "{table}" DEFAULT'))
+    
+    await db.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"'))
+    await db.execute(text(f'DROP TABLE "{legacy}"'))
+    
+    # LIKE hanya menyalin kolom dan default. Foreign key (termasuk FK komposit tenant)
+    # dan index model dibuat ulang setelah data masuk; index otomatis diturunkan ke
+    # setiap partisi
+    await db.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{pk_name}" PRIMARY KEY (id, date)'))
+    model = Base.metadata.tables[table]
+    for constraint in sorted(model.foreign_key_constraints, key=lambda fk: fk.column_keys):
+        # Tanpa isolate_from_table=False constraint model ditandai "dibuat lewat ALTER"
+        # dan tidak ikut create_all berikutnya di proses yang sama
+        await db.execute(AddConstraint(constraint, isolate_from_table=False))
+    for index in sorted(model.indexes, key=lambda index: index.name):
+        await db.execute(CreateIndex(index))
+    if had_search_index:
+        await create_search_index(db)
+    return True
+
+async def drop_year_partitions(db: AsyncSession, table: str, year: int) -> int:
+    """Hapus partisi bulanan satu tahun (dipakai setelah tahun itu diarsipkan)."""
+    existing = set(await existing_partitions(db, table))
+    dropped = 0
+    for month in month_range(date(year, 1, 1), date(year, 12, 1)):
+        name = partition_name(table, month)
+        if name in existing:
+            await db.execute(text(f'DROP TABLE "{name}"'))
+            dropped += 1
+    return dropped
+
+async def maintain_partitions():
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        if db.bind.dialect.name != "postgresql":
+            return
+    
+        async with exclusive(db, "partitions") as acquired:
+            if not acquired:
+                return
+    
+            for table in PARTITIONED_TABLES:
+                if not await is_partitioned(db, table):
+                    continue
+                # Dipanggil juga saat startup: kegagalan satu tabel dicatat, tidak
+                # menghentikan aplikasi atau tabel lainnya
+                try:
+                    async with db.begin_nested():
+                        created = await ensure_partitions(db, table)
+                except Exception:
+                    logger.exception("Pemeliharaan partisi %s gagal", table)
+                    continue
+                if created:
+                    logger.info("Partisi baru untuk %s: %s", table, ", ".join(created))
+            await db.commit()
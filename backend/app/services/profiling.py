@@ -0,0 +1,319 @@
+"""
+Profiling opt-in (PROFILING=true), khusus super_admin:
+- header `Server-Timing` berisi durasi per tahap (auth, bcrypt, db, serialize, app);
+- sampling profiler per request lewat header `X-Profile: 1`, hasilnya (collapsed stack
+  atau flamegraph SVG) diambil dari /api/profiles/{id};
+- watchdog (LOOP_BLOCK_MS) yang mencatat stack saat event loop terblokir.
+Saat PROFILING nonaktif middleware dan event SQLAlchemy tidak dipasang, dan stage()
+hanya membaca satu ContextVar.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import traceback
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# {tahap: [total detik, jumlah]} untuk request yang sedang diprofil
+_timings: ContextVar[Optional[Dict[str, list]]] = ContextVar("profiling_timings", default=None)
+
+# 200 Hz: cukup rapat untuk request puluhan ms, murah untuk thread sampler
+SAMPLE_INTERVAL = 0.005
+# Profil yang disimpan per direktori; yang lebih lama dihapus
+MAX_PROFILES = 50
+
+PROFILE_ROLES = ["super_admin"]
+
+def add_timing(timings: Dict[str, list], name: str, seconds: float):
+    entry = timings.setdefault(name, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += 1
+
+@contextmanager
+def stage(name: str):
+    """Ukur durasi blok (boleh berisi await) ke Server-Timing request yang sedang diprofil."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(timings, name, perf_counter() - start)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _timings.get() is not None:
+        context._profiling_start = perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _timings.get()
+    start = getattr(context, "_profiling_start", None)
+    if timings is not None and start is not None:
+        add_timing(timings, "db", perf_counter() - start)
+
+def instrument_engine(sync_engine):
+    """Catat waktu setiap query ke tahap `db`. Hanya dipasang saat PROFILING aktif."""
+    from sqlalchemy import event
+    
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+def server_timing(timings: Dict[str, list]) -> str:
+    return ", ".join(
+        f'{name};dur={seconds * 1000:.2f};desc="{count}x"' if count > 1 else f"{name};dur={seconds * 1000:.2f}"
+        for name, (seconds, count) in timings.items()
+    )
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Sampler:
+    """
+    Ambil stack thread event loop setiap SAMPLE_INTERVAL dari thread terpisah. Sampel
+    mencakup semua coroutine yang berjalan di loop, jadi profil paling jelas pada worker
+    yang sepi; waktu menunggu I/O (mis. query) tampak sebagai frame select/epoll.
+    """
+    
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profiling-sampler", daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+    
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+def collapsed_text(stacks: Counter) -> str:
+    """Format collapsed stack (Brendan Gregg), bisa dibuka di speedscope atau flamegraph.pl."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def parse_collapsed(text: str) -> Counter:
+    stacks = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+def escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+def render_flamegraph(stacks: Counter, width: int = 1200, row_height: int = 16) -> str:
+    """Flamegraph SVG sederhana: lebar kotak sebanding jumlah sampel, akar di bawah."""
+    root = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["count"] += count
+        node = root
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += count
+    
+    def depth(node) -> int:
+        return 1 + max((depth(child) for child in node["children"].values()), default=0)
+    
+    rows = depth(root) - 1
+    height = rows * row_height + 20
+    total = max(root["count"], 1)
+    parts = []
+    
+    def draw(node, name: str, x: float, level: int):
+        box_width = node["count"] / total * width
+        if box_width < 0.5:
+            return
+        y = height - (level + 1) * row_height
+        hue = 10 + sum(map(ord, name)) % 40
+        label = escape(name)
+        parts.append(
+            f'<g><title>{label} ({node["count"]} sampel, {node["count"] / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{box_width:.1f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},90%,60%)"/>'
+        )
+        # Kira-kira 7 px per karakter pada font 11 px
+        if box_width > 40:
+            parts.append(
+                f'<text x="{x + 3:.1f}" y="{y + row_height - 4}" font-size="11" font-family="monospace">'
+                f"{escape(name[:int(box_width / 7)])}</text>"
+            )
+        parts.append("</g>")
+        for child_name, child in node["children"].items():
+            draw(child, child_name, x, level + 1)
+            x += child["count"] / total * width
+    
+    x = 0.0
+    for name, child in root["children"].items():
+        draw(child, name, x, 0)
+        x += child["count"] / total * width
+    
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">'
+        f'<text x="4" y="14" font-size="12" font-family="sans-serif">{total} sampel</text>'
+        + "".join(parts) + "</svg>"
+    )
+
+def profile_path(profile_dir: str, profile_id: str) -> str:
+    return os.path.join(profile_dir, f"{profile_id}.txt")
+
+def save_profile(profile_dir: str, profile_id: str, stacks: Counter):
+    os.makedirs(profile_dir, exist_ok=True)
+    with open(profile_path(profile_dir, profile_id), "w", encoding="utf-8") as file:
+        file.write(collapsed_text(stacks))
+    
+    profiles = sorted(
+        (entry for entry in os.scandir(profile_dir) if entry.name.endswith(".txt")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:-MAX_PROFILES]:
+        os.remove(entry.path)
+
+def list_profiles(profile_dir: str) -> List[dict]:
+    if not os.path.isdir(profile_dir):
+        return []
+    entries = [entry for entry in os.scandir(profile_dir) if entry.name.endswith(".txt")]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [
+        {"id": entry.name[:-4], "size": entry.stat().st_size, "createdAt": entry.stat().st_mtime}
+        for entry in entries
+    ]
+
+def token_role(headers: Headers) -> Optional[str]:
+    from .auth import decode_token
+    
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_token(token)
+    return payload.get("role") if payload else None
+
+class ProfilingMiddleware:
+    """
+    Dipasang hanya saat PROFILING aktif. Role dibaca dari JWT (sudah ditandatangani),
+    tanpa query user; request selain super_admin diteruskan tanpa pengukuran.
+    """
+    
+    def __init__(self, app, profile_dir: str):
+        self.app = app
+        self.profile_dir = profile_dir
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+    
+        headers = Headers(scope=scope)
+        if token_role(headers) not in PROFILE_ROLES:
+            await self.app(scope, receive, send)
+            return
+    
+        timings = {}
+        context_token = _timings.set(timings)
+        sampler = None
+        profile_id = None
+        if headers.get("x-profile"):
+            profile_id = uuid.uuid4().hex
+            sampler = Sampler(threading.get_ident())
+            sampler.start()
+        start = perf_counter()
+    
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                add_timing(timings, "app", perf_counter() - start)
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append("Server-Timing", server_timing(timings))
+                if profile_id:
+                    response_headers.append("X-Profile-Id", profile_id)
+            await send(message)
+    
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(context_token)
+            if sampler is not None:
+                sampler.stop()
+                await asyncio.to_thread(save_profile, self.profile_dir, profile_id, sampler.stacks)
+
+class LoopWatchdog:
+    """
+    Thread yang mencatat stack event loop jika loop tidak menjalankan callback lebih
+    dari `threshold` detik (mis. bcrypt, CPU-bound di handler async, I/O sinkron).
+    Biaya saat berjalan: satu call_later per threshold/4.
+    """
+    
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.loop = None
+        self.thread_id = None
+        self.last_beat = monotonic()
+        self.handle = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="loop-watchdog", daemon=True)
+    
+    def start(self):
+        """Dipanggil dari thread event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.beat()
+        self.thread.start()
+    
+    def stop(self):
+        self.stopped.set()
+        if self.handle is not None:
+            self.handle.cancel()
+        self.thread.join()
+    
+    def beat(self):
+        self.last_beat = monotonic()
+        self.handle = self.loop.call_later(self.interval, self.beat)
+    
+    def run(self):
+        blocked_since = None
+        while not self.stopped.wait(self.interval):
+            last_beat = self.last_beat
+            lag = monotonic() - last_beat
+            if lag <= self.threshold:
+                if blocked_since is not None:
+                    logger.warning(
+                        "Event loop kembali berjalan setelah terblokir %.0f ms", (monotonic() - blocked_since) * 1000
+                    )
+                    blocked_since = None
+                continue
+            if blocked_since == last_beat:
+                continue
+    
+            # Satu log per kejadian, dengan stack saat terdeteksi
+            blocked_since = last_beat
+            frame = sys._current_frames().get(self.thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            logger.warning("Event loop terblokir lebih dari %.0f ms:\n%s", lag * 1000, stack)
@@ -0,0 +1,116 @@
+"""
+Pengeluaran berulang: template sewa (bulanan) dan gaji dibuat menjadi baris expenses
+untuk setiap periode tanggal 10 s/d 9 bulan berikutnya, dalam satu INSERT multi-baris.
+"""
+from datetime import date, timedelta
+from typing import List, Optional
+import logging
+
+from sqlalchemy import select, insert, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Expense, RecurringExpense, generate_uuid
+from .partitions import add_months
+from .scheduler import exclusive
+
+logger = logging.getLogger(__name__)
+
+# Periode pembukuan dimulai tanggal 10 (lihat getMTDPeriod di frontend)
+PERIOD_START_DAY = 10
+
+def period_start(day: date) -> date:
+    month = day.replace(day=1)
+    if day.day < PERIOD_START_DAY:
+        month = add_months(month, -1)
+    return month.replace(day=PERIOD_START_DAY)
+
+def period_end(start: date) -> date:
+    return add_months(start.replace(day=1), 1).replace(day=PERIOD_START_DAY) - timedelta(days=1)
+
+def next_period(start: date) -> date:
+    return add_months(start.replace(day=1), 1).replace(day=PERIOD_START_DAY)
+
+def entry_date(start: date, day_of_month: int) -> date:
+    """Tanggal entri di dalam periode: 10-28 di bulan awal, 1-9 di bulan berikutnya."""
+    if day_of_month >= PERIOD_START_DAY:
+        return start.replace(day=day_of_month)
+    return next_period(start).replace(day=day_of_month)
+
+def due_periods(template: RecurringExpense, target: date) -> List[date]:
+    """Periode yang belum dibuat untuk template sampai dengan periode `target`."""
+    first = date.fromisoformat(template.start_period)
+    if template.last_period:
+        first = max(first, next_period(date.fromisoformat(template.last_period)))
+    last = target
+    if template.end_period:
+        last = min(last, date.fromisoformat(template.end_period))
+    
+    periods = []
+    while first <= last:
+        periods.append(first)
+        first = next_period(first)
+    return periods
+
+async def materialize(
+    db: AsyncSession,
+    as_of: Optional[date] = None,
+    dry_run: bool = False,
+    filters: Optional[list] = None
+) -> List[dict]:
+    """
+    Buat entri expenses untuk semua template aktif yang jatuh tempo sampai periode
+    `as_of`, termasuk periode yang terlewat. Idempoten: last_period dimajukan dalam
+    transaksi yang sama dengan INSERT, dan template dikunci (FOR UPDATE) agar dua
+    worker tidak membuat entri ganda. `dry_run` hanya mengembalikan pratinjau.
+    Tidak melakukan commit.
+    """
+    target = period_start(as_of or date.today())
+    query = select(RecurringExpense).where(
+        RecurringExpense.active.is_(True),
+        RecurringExpense.start_period <= target.isoformat(),
+        or_(RecurringExpense.last_period.is_(None), RecurringExpense.last_period < target.isoformat()),
+        *(filters or [])
+    ).order_by(RecurringExpense.outlet_id, RecurringExpense.start_period)
+    if not dry_run:
+        query = query.with_for_update()
+    
+    templates = (await db.execute(query)).scalars().all()
+    
+    rows = []
+    for template in templates:
+        periods = due_periods(template, target)
+        for start in periods:
+            rows.append({
+                "outlet_id": template.outlet_id,
+                "date": entry_date(start, template.day_of_month).isoformat(),
+                "type": template.type,
+                "description": template.description,
+                "amount": template.amount,
+                "recurring_id": template.id,
+                "period_start": start.isoformat(),
+            })
+        if periods and not dry_run:
+            template.last_period = periods[-1].isoformat()
+    
+    if rows and not dry_run:
+        columns = ("outlet_id", "date", "type", "description", "amount")
+        # id dibuat di sini (bukan default kolom) agar tercatat di audit log
+        await db.execute(insert(Expense), [
+            {"id": generate_uuid(), **{key: row[key] for key in columns}} for row in rows
+        ])
+        await db.flush()
+    return rows
+
+async def nightly_materialize():
+    """Dijadwalkan setiap hari; hanya membuat entri saat periode baru dimulai (idempoten)."""
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        async with exclusive(db, "recurring_expenses") as acquired:
+            if not acquired:
+                return
+    
+            rows = await materialize(db)
+            await db.commit()
+            if rows:
+                logger.info("%d pengeluaran berulang dibuat", len(rows))
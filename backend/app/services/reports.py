@@ -0,0 +1,207 @@
+"""
+Handler job latar belakang: ekspor CSV dan laporan tahunan.
+Setiap handler menerima (db, user, params, path) dan mengembalikan ringkasan hasil;
+jika job menghasilkan file, isinya ditulis ke `path`.
+"""
+from typing import AsyncIterator, List, Optional
+import csv
+import io
+import os
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Sale, Expense, Outlet, User
+from ..schemas.schemas import (
+    SalesExportParams, ExpensesExportParams, YearReportParams, ForecastRefreshParams, AnomalyScanParams,
+    SettlementReconcileParams
+)
+from .archive import overlapping_years, read_archive
+from .cogs import join_effective_cogs
+from .scope import Scope
+from .tenancy import model_columns
+
+BATCH_SIZE = 5000
+
+SALES_COLUMNS = [
+    "date", "outletName", "cash", "qris", "grab", "gofood", "shopee", "tiktok",
+    "totalRevenue", "totalSold", "totalProduction", "remaining", "returned", "soldOutTime",
+    "cogsPerPiece", "cogsSold", "grossMargin", "grossMarginPercentage", "id",
+]
+EXPENSE_COLUMNS = ["date", "outletName", "type", "description", "amount", "proof_url", "id"]
+SETTLEMENT_COLUMNS = [
+    "status", "date", "channel", "outletName", "store", "recorded", "settled", "difference", "lines", "outletId",
+]
+YEAR_REPORT_COLUMNS = [
+    "outletName", "month", "totalRevenue", "cogsSold", "grossMargin",
+    "expenses", "salaries", "netProfit", "totalSold",
+]
+
+def csv_chunk(columns: List[str], rows: List[dict], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+async def write_csv(path: str, columns: List[str], batches: AsyncIterator[List[dict]]) -> int:
+    import aiofiles
+    
+    count = 0
+    async with aiofiles.open(path, "w", newline="", encoding="utf-8") as file:
+        await file.write(csv_chunk(columns, [], header=True))
+        async for rows in batches:
+            await file.write(csv_chunk(columns, rows))
+            count += len(rows)
+    return count
+
+async def export_sales(db: AsyncSession, user: User, params: SalesExportParams, path: str) -> dict:
+    from ..routers.sales import sale_to_response, scoped_sales_query, archived_sales
+    
+    scope = Scope.for_user(user)
+    filters = scope.sales(params.outlet_id)
+    archive_filters = scope.archive_filters(params.outlet_id)
+    if params.start_date:
+        filters.append(Sale.date >= params.start_date)
+    if params.end_date:
+        filters.append(Sale.date <= params.end_date)
+    
+    query = scoped_sales_query(*filters).order_by(Sale.date.desc())
+    
+    async def batches():
+        result = await db.stream(query.execution_options(yield_per=BATCH_SIZE))
+        async for partition in result.partitions():
+            yield [sale_to_response(sale, outlet, cogs) for sale, outlet, cogs in partition]
+    
+        archived = overlapping_years("sales", params.start_date, params.end_date)
+        if archived:
+            yield await archived_sales(db, archived, params.start_date, params.end_date, archive_filters)
+    
+    return {"rows": await write_csv(path, SALES_COLUMNS, batches())}
+
+async def export_expenses(db: AsyncSession, user: User, params: ExpensesExportParams, path: str) -> dict:
+    scope = Scope.for_user(user)
+    filters = scope.expenses(params.outlet_id)
+    archive_filters = scope.archive_filters(params.outlet_id, expenses=True)
+    if params.start_date:
+        filters.append(Expense.date >= params.start_date)
+    if params.end_date:
+        filters.append(Expense.date <= params.end_date)
+    if params.type:
+        filters.append(Expense.type == params.type)
+        archive_filters.append(("type", "==", params.type))
+    
+    query = select(*model_columns(Expense), Outlet.name.label("outletName")).outerjoin(
+        Outlet, Expense.outlet_id == Outlet.id
+    ).where(*filters).order_by(Expense.date.desc())
+    
+    async def batches():
+        result = await db.stream(query.execution_options(yield_per=BATCH_SIZE))
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+    
+        archived = overlapping_years("expenses", params.start_date, params.end_date)
+        rows = await read_archive("expenses", archived, params.start_date, params.end_date, archive_filters)
+        if rows:
+            outlet_result = await db.execute(select(Outlet.id, Outlet.name))
+            outlet_names = dict(outlet_result.all())
+            for row in rows:
+                row["outletName"] = outlet_names.get(row["outlet_id"])
+            yield rows
+    
+    return {"rows": await write_csv(path, EXPENSE_COLUMNS, batches())}
+
+async def year_report(db: AsyncSession, user: User, params: YearReportParams, path: str) -> dict:
+    """Laba rugi per outlet per bulan untuk satu tahun, dihitung dengan GROUP BY di database."""
+    year = params.year
+    if year in overlapping_years("sales", f"{year}-01-01", f"{year}-12-31"):
+        raise ValueError(f"Data tahun {year} sudah diarsipkan")
+    
+    start, end = f"{year}-01-01", f"{year}-12-31"
+    sale_month = func.substr(Sale.date, 1, 7).label("month")
+    revenue = Sale.cash + Sale.qris + Sale.grab + Sale.gofood + Sale.shopee + Sale.tiktok
+    
+    sales_query = select(Sale.outlet_id, sale_month).join(Outlet, Sale.outlet_id == Outlet.id)
+    sales_query, effective_cogs = join_effective_cogs(sales_query)
+    sales_query = sales_query.add_columns(
+        func.sum(revenue).label("revenue"),
+        func.sum(Sale.total_sold * effective_cogs).label("cogs"),
+        func.sum(Sale.total_sold).label("sold"),
+    ).where(Sale.date >= start, Sale.date <= end).group_by(Sale.outlet_id, sale_month)
+    
+    expense_month = func.substr(Expense.date, 1, 7).label("month")
+    expense_filters = [Expense.date >= start, Expense.date <= end, *Scope.for_user(user).expenses()]
+    expense_query = select(
+        Expense.outlet_id,
+        expense_month,
+        func.sum(Expense.amount).filter(Expense.type != "gaji").label("expenses"),
+        func.sum(Expense.amount).filter(Expense.type == "gaji").label("salaries"),
+    ).where(*expense_filters).group_by(Expense.outlet_id, expense_month)
+    
+    report = {}
+    
+    def entry(outlet_id: str, month: str) -> dict:
+        return report.setdefault((outlet_id, month), {
+            "month": month, "totalRevenue": 0, "cogsSold": 0, "expenses": 0, "salaries": 0, "totalSold": 0,
+        })
+    
+    for outlet_id, month, revenue_sum, cogs_sum, sold in (await db.execute(sales_query)).all():
+        row = entry(outlet_id, month)
+        row.update(totalRevenue=revenue_sum or 0, cogsSold=cogs_sum or 0, totalSold=sold or 0)
+    for outlet_id, month, expenses, salaries in (await db.execute(expense_query)).all():
+        row = entry(outlet_id, month)
+        row.update(expenses=expenses or 0, salaries=salaries or 0)
+    
+    outlet_result = await db.execute(select(Outlet.id, Outlet.name))
+    outlet_names = dict(outlet_result.all())
+    
+    rows = []
+    for (outlet_id, month), row in report.items():
+        row["outletName"] = outlet_names.get(outlet_id)
+        row["grossMargin"] = row["totalRevenue"] - row["cogsSold"]
+        row["netProfit"] = row["grossMargin"] - row["expenses"] - row["salaries"]
+        rows.append(row)
+    rows.sort(key=lambda row: (row["outletName"] or "", row["month"]))
+    
+    async def batches():
+        yield rows
+    
+    await write_csv(path, YEAR_REPORT_COLUMNS, batches())
+    return {
+        "rows": len(rows),
+        "totalRevenue": sum(row["totalRevenue"] for row in rows),
+        "netProfit": sum(row["netProfit"] for row in rows),
+    }
+
+async def forecast_refresh(db: AsyncSession, user: User, params: ForecastRefreshParams, path: Optional[str]) -> dict:
+    from .forecast import refresh_forecasts
+    
+    return {"rows": await refresh_forecasts(db, params.as_of)}
+
+async def anomaly_scan(db: AsyncSession, user: User, params: AnomalyScanParams, path: Optional[str]) -> dict:
+    from .anomalies import scan_anomalies
+    
+    return {"anomalies": await scan_anomalies(db, params.as_of, params.days)}
+
+async def settlement_reconcile(db: AsyncSession, user: User, params: SettlementReconcileParams, path: str) -> dict:
+    """Laporan matched/short/over/missing per outlet x tanggal x channel; file upload dihapus setelah diproses."""
+    from .settlements import reconcile_upload, upload_path
+    
+    upload = upload_path(params.upload_id)
+    try:
+        rows, summary = await reconcile_upload(
+            db, Scope.for_user(user), params.upload_id, params.platform, params.tolerance, params.outlet_id
+        )
+    except ValueError:
+        # File tidak valid tidak akan berhasil diulang; gangguan lain (mis. restart) tetap bisa
+        if os.path.exists(upload):
+            os.remove(upload)
+        raise
+    os.remove(upload)
+    
+    async def batches():
+        yield rows
+    
+    await write_csv(path, SETTLEMENT_COLUMNS, batches())
+    return summary
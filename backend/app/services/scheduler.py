@@ -0,0 +1,54 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import zlib
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+def seconds_until(hour: int, minute: int = 0) -> float:
+    now = datetime.now()
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+def db_time_ago(db: AsyncSession, age: timedelta):
+    """
+    Ekspresi SQL "sekarang - age" menurut jam database, untuk dibandingkan dengan
+    kolom DateTime yang diisi func.now(). now() Postgres ber-zona waktu sedangkan
+    kolomnya naive, jadi selisihnya tidak boleh dihitung di Python.
+    """
+    seconds = int(age.total_seconds())
+    if db.bind.dialect.name == "postgresql":
+        return func.localtimestamp() - literal_column(f"interval '{seconds} seconds'")
+    return func.datetime("now", f"-{seconds} seconds")
+
+async def run_daily(name: str, hour: int, job: Callable[[], Awaitable], minute: int = 0):
+    """Jalankan job setiap hari pada jam tertentu (waktu server) sampai task dibatalkan."""
+    while True:
+        await asyncio.sleep(seconds_until(hour, minute))
+        try:
+            await job()
+        except Exception:
+            logger.exception("Job terjadwal %s gagal", name)
+
+@asynccontextmanager
+async def exclusive(db: AsyncSession, name: str):
+    """
+    Pastikan hanya satu worker yang menjalankan job `name` pada satu waktu.
+    Memakai advisory lock Postgres yang dilepas otomatis saat transaksi selesai.
+    """
+    if db.bind.dialect.name != "postgresql":
+        yield True
+        return
+    
+    result = await db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"),
+        {"key": zlib.crc32(name.encode("utf-8"))}
+    )
+    yield bool(result.scalar())
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from fastapi import Depends
+from sqlalchemy import false
+
+from ..models.models import Sale, Expense, User
+from .auth import get_current_user
+
+# Role yang boleh melihat dan mengelola pengeluaran gaji
+SALARY_ROLES = ["super_admin", "owner"]
+
+@dataclass(frozen=True)
+class Scope:
+    """
+    Batas data yang boleh diakses user, disusun sebagai klausa WHERE sehingga
+    baris di luar scope tidak pernah dimuat (dan tidak bisa diubah/dihapus).
+    """
+    role: str
+    outlet_id: Optional[str]
+    # Isolasi tenant sendiri dipasang services.tenancy di setiap query; di sini untuk
+    # kunci cache/ETag dan arsip Parquet yang tidak melewati SQLAlchemy
+    tenant_id: Optional[str] = None
+    
+    @classmethod
+    def for_user(cls, user: User) -> "Scope":
+        return cls(role=user.role, outlet_id=user.assigned_outlet_id, tenant_id=user.tenant_id)
+    
+    @property
+    def restricted(self) -> bool:
+        """admin_outlet hanya melihat outlet yang ditugaskan (atau tidak ada sama sekali)."""
+        return self.role == "admin_outlet"
+    
+    @property
+    def sees_salaries(self) -> bool:
+        return self.role in SALARY_ROLES
+    
+    def outlet_ids(self, requested: Optional[str] = None) -> Optional[List[str]]:
+        """Outlet yang boleh dibaca, dipersempit ke `requested`. None berarti semua outlet."""
+        if self.restricted:
+            return [self.outlet_id] if self.outlet_id else []
+        return [requested] if requested else None
+    
+    def can_access_outlet(self, outlet_id: str) -> bool:
+        return not self.restricted or outlet_id == self.outlet_id
+    
+    def outlets(self, column, requested: Optional[str] = None) -> list:
+        ids = self.outlet_ids(requested)
+        if ids is None:
+            return []
+        return [column == ids[0]] if ids else [false()]
+    
+    def sales(self, requested_outlet: Optional[str] = None) -> list:
+        return self.outlets(Sale.outlet_id, requested_outlet)
+    
+    def expenses(self, requested_outlet: Optional[str] = None, model=Expense) -> list:
+        """Juga untuk tabel lain berkolom outlet_id dan type, mis. RecurringExpense."""
+        criteria = self.outlets(model.outlet_id, requested_outlet)
+        if not self.sees_salaries:
+            criteria.append(model.type != "gaji")
+        return criteria
+    
+    def archive_filters(self, requested_outlet: Optional[str] = None, expenses: bool = False) -> list:
+        """Scope yang sama sebagai filter pyarrow untuk arsip Parquet."""
+        filters = []
+        if self.tenant_id is not None:
+            filters.append(("tenant_id", "==", self.tenant_id))
+        ids = self.outlet_ids(requested_outlet)
+        if ids is not None:
+            filters.append(("outlet_id", "in", ids))
+        if expenses and not self.sees_salaries:
+            filters.append(("type", "!=", "gaji"))
+        return filters
+
+async def get_scope(current_user: User = Depends(get_current_user)) -> Scope:
+    return Scope.for_user(current_user)
@@ -0,0 +1,92 @@
+"""
+Pencarian deskripsi pengeluaran. Di Postgres memakai index GIN pg_trgm sehingga
+pencarian substring ("tepung") dan salah ketik ("listirk") tetap memakai index;
+di SQLite jatuh ke ILIKE biasa.
+"""
+from time import monotonic
+from typing import Optional
+import logging
+
+from sqlalchemy import func, literal, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Expense
+from .scheduler import exclusive
+
+logger = logging.getLogger(__name__)
+
+# Nama index disamakan dengan shared/schema.ts agar db:push tidak membuat ulang
+SEARCH_INDEX = "IDX_expenses_description_trgm"
+
+# pg_trgm yang sudah terpasang diingat; yang belum dicek ulang setelah selang ini,
+# agar ekstensi yang dipasang belakangan terpakai tanpa restart
+RECHECK_SECONDS = 300
+
+# None berarti belum dicek
+_trigram_available: Optional[bool] = None
+_checked_at = 0.0
+
+async def create_search_index(db: AsyncSession):
+    """Tidak melakukan commit. Index di tabel berpartisi otomatis diturunkan ke setiap partisi."""
+    await db.execute(text(
+        f'CREATE INDEX IF NOT EXISTS "{SEARCH_INDEX}" ON expenses USING gin (description gin_trgm_ops)'
+    ))
+
+async def ensure_search_index():
+    """
+    Pasang ekstensi pg_trgm dan index trigram sekali untuk semua worker (advisory lock).
+    Gagal (mis. tanpa hak CREATE EXTENSION) berarti pencarian memakai ILIKE sampai
+    ekstensi dipasang, lihat trigram_available.
+    """
+    from ..database import get_db_context
+    
+    async with get_db_context() as db:
+        if db.bind.dialect.name != "postgresql":
+            return
+    
+        async with exclusive(db, "search_index") as acquired:
+            if not acquired:
+                return
+            if await db.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{SEARCH_INDEX}"'}):
+                return
+            try:
+                await db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await create_search_index(db)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                logger.warning("pg_trgm tidak tersedia, pencarian pengeluaran memakai ILIKE", exc_info=True)
+
+async def trigram_available(db: AsyncSession) -> bool:
+    global _trigram_available, _checked_at
+    
+    if db.bind.dialect.name != "postgresql":
+        return False
+    if _trigram_available or (_trigram_available is not None and monotonic() - _checked_at < RECHECK_SECONDS):
+        return _trigram_available
+    
+    _trigram_available = bool(await db.scalar(
+        text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+    ))
+    _checked_at = monotonic()
+    return _trigram_available
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+async def search_criteria(db: AsyncSession, query: str):
+    """
+    Kondisi WHERE dan skor urutan untuk kata kunci `query`.
+    Trigram: cocok jika substring atau mirip salah satu kata di deskripsi
+    (operator <%, ambang pg_trgm.word_similarity_threshold, default 0.6).
+    """
+    substring = Expense.description.ilike(f"%{escape_like(query)}%", escape="\\")
+    
+    if not await trigram_available(db):
+        return substring, None
+    
+    keyword = literal(query)
+    return (
+        or_(substring, keyword.op("<%")(Expense.description)),
+        func.word_similarity(keyword, Expense.description)
+    )
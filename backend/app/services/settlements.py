@@ -0,0 +1,305 @@
+"""
+Rekonsiliasi file settlement platform (Grab, GoFood, ShopeeFood, TikTok) dengan kolom
+channel di tabel sales. CSV dibaca baris per baris dan dijumlahkan per
+(outlet, tanggal, channel), lalu dicocokkan lewat dict dengan kunci yang sama
+terhadap hasil satu query sales untuk rentang tanggal di file.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import csv
+import os
+import re
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models.models import Sale, Outlet, PlatformAccount
+from .scope import Scope
+
+PLATFORMS = ["grab", "gofood", "shopee", "tiktok"]
+STATUSES = ["matched", "short", "over", "missing_sale", "missing_settlement", "unknown_outlet"]
+
+# Nama kolom yang dikenali (huruf kecil, spasi menjadi _), diurutkan dari yang paling diutamakan.
+# settlement_date adalah tanggal pencairan (T+1 s/d T+7), bukan tanggal sale, jadi
+# hanya dipakai jika file tidak punya tanggal transaksi
+DATE_COLUMNS = [
+    "transaction_date", "order_date", "tanggal", "date", "created_at", "created_time", "settlement_date"
+]
+STORE_COLUMNS = ["store_id", "merchant_id", "outlet_id", "shop_id", "store_name", "merchant_name", "outlet", "shop_name"]
+AMOUNT_COLUMNS = ["gross_sales", "gross_amount", "order_amount", "subtotal", "total", "amount", "nominal"]
+CHANNEL_COLUMNS = ["platform", "channel", "service"]
+STATUS_COLUMNS = ["status", "order_status", "transaction_status"]
+
+SKIPPED_STATUSES = {"cancelled", "canceled", "refunded", "failed", "rejected", "dibatalkan", "gagal"}
+CHANNEL_ALIASES = {
+    "grab": "grab", "grabfood": "grab", "grab_food": "grab",
+    "gofood": "gofood", "go_food": "gofood", "gojek": "gofood",
+    "shopee": "shopee", "shopeefood": "shopee", "shopee_food": "shopee",
+    "tiktok": "tiktok", "tiktok_shop": "tiktok", "tiktokshop": "tiktok",
+}
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y"]
+
+# Selisih di bawah ini dianggap cocok (pembulatan platform)
+DEFAULT_TOLERANCE = 500.0
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+def upload_path(upload_id: str) -> str:
+    # Nama file hanya dari upload_id yang tervalidasi, karena params job bisa dikirim user
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise ValueError("upload_id tidak valid")
+    return os.path.join(get_settings().settlement_dir, f"{upload_id}.csv")
+
+def normalize_header(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+def find_column(headers: List[str], candidates: List[str]) -> Optional[int]:
+    for candidate in candidates:
+        if candidate in headers:
+            return headers.index(candidate)
+    return None
+
+def parse_amount(value: str) -> float:
+    """
+    "Rp 12.500", "12,500.00", "12.500,50" dan "-3000" menjadi float. Pemisah terakhir
+    dianggap desimal hanya jika diikuti 1-2 digit; selain itu pemisah ribuan.
+    """
+    cleaned = re.sub(r"[^0-9,.\-]", "", value)
+    if not cleaned or cleaned == "-":
+        return 0.0
+    separator = max(cleaned.rfind(","), cleaned.rfind("."))
+    if separator >= 0 and 1 <= len(cleaned) - separator - 1 <= 2:
+        whole = re.sub(r"[,.]", "", cleaned[:separator])
+        return float(f"{whole}.{cleaned[separator + 1:]}")
+    return float(re.sub(r"[,.]", "", cleaned))
+
+@lru_cache(maxsize=4096)
+def parse_day(text: str) -> Optional[str]:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+def parse_date(value: str) -> str:
+    """Tanggal saja atau tanggal+jam; satu file hanya memuat sedikit tanggal unik, jadi di-cache."""
+    text = value.strip()
+    day = parse_day(text[:10])
+    if day:
+        return day
+    try:
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        raise ValueError(f"Format tanggal tidak dikenali: {value!r}")
+
+@dataclass
+class SettlementTotals:
+    """Hasil agregasi satu file: jumlah per (toko, tanggal, channel) dan jumlah baris."""
+    amounts: Dict[Tuple[str, str, str], float] = field(default_factory=lambda: defaultdict(float))
+    lines: Dict[Tuple[str, str, str], int] = field(default_factory=lambda: defaultdict(int))
+    rows: int = 0
+    skipped: int = 0
+
+def aggregate_file(path: str, platform: Optional[str]) -> SettlementTotals:
+    """Baca CSV secara streaming; memori sebanding jumlah kunci, bukan jumlah baris."""
+    totals = SettlementTotals()
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(file, dialect)
+    
+        headers = [normalize_header(name) for name in next(reader, [])]
+        date_column = find_column(headers, DATE_COLUMNS)
+        store_column = find_column(headers, STORE_COLUMNS)
+        amount_column = find_column(headers, AMOUNT_COLUMNS)
+        channel_column = find_column(headers, CHANNEL_COLUMNS)
+        status_column = find_column(headers, STATUS_COLUMNS)
+    
+        if date_column is None or store_column is None or amount_column is None:
+            raise ValueError("CSV harus memiliki kolom tanggal, toko/merchant dan nominal")
+        if channel_column is None and platform is None:
+            raise ValueError("Platform harus diisi jika CSV tidak memiliki kolom platform")
+    
+        for line_number, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            # Sel kosong di akhir baris sering tidak ditulis oleh ekspor spreadsheet
+            row.extend([""] * (len(headers) - len(row)))
+            try:
+                if status_column is not None and row[status_column].strip().lower() in SKIPPED_STATUSES:
+                    totals.skipped += 1
+                    continue
+                channel = platform
+                if channel_column is not None and row[channel_column].strip():
+                    channel = CHANNEL_ALIASES.get(normalize_header(row[channel_column]))
+                if channel is None:
+                    totals.skipped += 1
+                    continue
+                key = (row[store_column].strip(), parse_date(row[date_column]), channel)
+                amount = parse_amount(row[amount_column])
+            except (IndexError, ValueError) as exc:
+                raise ValueError(f"Baris {line_number}: {exc}")
+    
+            totals.amounts[key] += amount
+            totals.lines[key] += 1
+            totals.rows += 1
+    return totals
+
+async def resolve_outlets(db: AsyncSession, stores: List[str], platforms: List[str]) -> Dict[Tuple[str, str], str]:
+    """
+    Petakan (platform, kode toko) ke outlet_id: akun platform terdaftar lebih dulu,
+    lalu id outlet, lalu nama outlet (tanpa membedakan huruf besar/kecil).
+    """
+    accounts = await db.execute(
+        select(PlatformAccount.platform, PlatformAccount.external_id, PlatformAccount.outlet_id)
+        .where(PlatformAccount.platform.in_(platforms))
+    )
+    by_account = {(platform, external.lower()): outlet_id for platform, external, outlet_id in accounts.all()}
+    
+    outlets = await db.execute(select(Outlet.id, Outlet.name))
+    by_id = {}
+    by_name = {}
+    for outlet_id, name in outlets.all():
+        by_id[outlet_id.lower()] = outlet_id
+        by_name.setdefault((name or "").strip().lower(), outlet_id)
+    
+    mapping = {}
+    for platform in platforms:
+        for store in stores:
+            key = store.lower()
+            outlet_id = by_account.get((platform, key)) or by_id.get(key) or by_name.get(key)
+            if outlet_id:
+                mapping[(platform, store)] = outlet_id
+    return mapping
+
+def classify(recorded: Optional[float], settled: Optional[float], tolerance: float) -> str:
+    if settled is None:
+        return "missing_settlement"
+    if recorded is None:
+        return "missing_sale"
+    difference = settled - recorded
+    if abs(difference) <= tolerance:
+        return "matched"
+    return "short" if difference < 0 else "over"
+
+async def reconcile(
+    db: AsyncSession,
+    scope: Scope,
+    totals: SettlementTotals,
+    outlet_names: Dict[str, str],
+    tolerance: float = DEFAULT_TOLERANCE,
+    outlet_id: Optional[str] = None
+) -> List[dict]:
+    """
+    Cocokkan total settlement dengan sales outlet dalam scope (atau `outlet_id`) pada
+    rentang tanggal di file. Sale dengan nominal channel > 0 tanpa settlement dilaporkan
+    missing_settlement, hanya untuk pasangan outlet x channel yang muncul di file: file
+    satu toko Grab tidak mencakup outlet atau channel lain.
+    """
+    if not totals.amounts:
+        return []
+    
+    stores = sorted({store for store, _, _ in totals.amounts})
+    platforms = sorted({channel for _, _, channel in totals.amounts})
+    mapping = await resolve_outlets(db, stores, platforms)
+    allowed = scope.outlet_ids(outlet_id)
+    
+    rows = []
+    settled: Dict[Tuple[str, str, str], float] = defaultdict(float)
+    lines: Dict[Tuple[str, str, str], int] = defaultdict(int)
+    for (store, sale_date, channel), amount in totals.amounts.items():
+        target = mapping.get((channel, store))
+        if target is None:
+            rows.append({
+                "status": "unknown_outlet", "store": store, "date": sale_date, "channel": channel,
+                "settled": amount, "lines": totals.lines[(store, sale_date, channel)],
+            })
+            continue
+        if allowed is not None and target not in allowed:
+            continue
+        # Beberapa kode toko bisa mengarah ke outlet yang sama
+        settled[(target, sale_date, channel)] += amount
+        lines[(target, sale_date, channel)] += totals.lines[(store, sale_date, channel)]
+    
+    covered = {(key_outlet, channel) for key_outlet, _, channel in settled}
+    recorded: Dict[Tuple[str, str, str], float] = {}
+    if settled:
+        dates = [key[1] for key in settled]
+        result = await db.execute(
+            select(Sale.outlet_id, Sale.date, *[getattr(Sale, platform) for platform in platforms])
+            .where(
+                Sale.date >= min(dates), Sale.date <= max(dates),
+                Sale.outlet_id.in_(sorted({key_outlet for key_outlet, _ in covered})), *scope.sales(outlet_id)
+            )
+        )
+        for sale_outlet, sale_date, *amounts in result.all():
+            for platform, amount in zip(platforms, amounts):
+                if (sale_outlet, platform) in covered:
+                    recorded[(sale_outlet, sale_date, platform)] = float(amount or 0)
+    
+    for key in settled.keys() | {key for key, amount in recorded.items() if amount}:
+        key_outlet, sale_date, channel = key
+        expected = recorded.get(key)
+        actual = settled.get(key)
+        rows.append({
+            "status": classify(expected, actual, tolerance),
+            "outletId": key_outlet,
+            "outletName": outlet_names.get(key_outlet),
+            "date": sale_date,
+            "channel": channel,
+            "recorded": expected or 0,
+            "settled": actual or 0,
+            "difference": (actual or 0) - (expected or 0),
+            "lines": lines.get(key, 0),
+        })
+    
+    rows.sort(key=lambda row: (
+        STATUSES.index(row["status"]), row.get("outletName") or row.get("store") or "", row["date"], row["channel"]
+    ))
+    return rows
+
+def summarize(rows: List[dict]) -> dict:
+    summary = {status: {"count": 0, "difference": 0.0} for status in STATUSES}
+    for row in rows:
+        entry = summary[row["status"]]
+        entry["count"] += 1
+        entry["difference"] += row.get("difference", 0)
+    return {
+        "statuses": summary,
+        "recorded": sum(row.get("recorded", 0) for row in rows),
+        "settled": sum(row["settled"] for row in rows),
+    }
+
+async def reconcile_upload(
+    db: AsyncSession,
+    scope: Scope,
+    upload_id: str,
+    platform: Optional[str],
+    tolerance: float,
+    outlet_id: Optional[str] = None
+) -> Tuple[List[dict], dict]:
+    """Agregasi file (di thread, agar event loop tidak terblokir) lalu cocokkan dengan sales."""
+    path = upload_path(upload_id)
+    if not os.path.exists(path):
+        raise ValueError("File settlement tidak ditemukan")
+    
+    totals = await asyncio.to_thread(aggregate_file, path, platform)
+    outlet_result = await db.execute(select(Outlet.id, Outlet.name))
+    rows = await reconcile(db, scope, totals, dict(outlet_result.all()), tolerance, outlet_id)
+    
+    summary = summarize(rows)
+    summary.update(rows=totals.rows, skipped=totals.skipped)
+    if totals.amounts:
+        dates = [key[1] for key in totals.amounts]
+        summary.update(startDate=min(dates), endDate=max(dates))
+    return rows, summary
@@ -0,0 +1,483 @@
+"""
+Sinkronisasi delta antara outlet edge (SQLite lokal) dan central (Postgres).
+
+Trigger database mencatat setiap perubahan baris tabel tersinkron ke change_log,
+termasuk UPDATE/DELETE massal yang tidak lewat ORM. Delta berisi nilai baris saat
+ini, bukan riwayat, sehingga beberapa perubahan pada baris yang sama cukup dikirim
+sekali. Baris dicocokkan per kunci bisnis (sales per outlet_id + date, karena id
+sale yang dibuat offline berbeda dengan id di central); updated_at yang lebih baru
+menang, dan jika seri penerima mempertahankan barisnya.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import DateTime, select, insert, update, delete, func, literal_column, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Sale, Expense, Outlet, OutletCogs, ChangeLog, SyncState, User
+from .scheduler import db_time_ago, exclusive
+from .scope import Scope
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class SyncTable:
+    model: type
+    # Kunci untuk mencocokkan baris antar database
+    key: Tuple[str, ...]
+    outlet_column: str
+    date_column: Optional[str] = None
+    
+    @property
+    def natural_key(self) -> bool:
+        return self.key != ("id",)
+
+# Urutan ini juga urutan snapshot: outlet dan COGS sebelum transaksi
+SYNC_TABLES: Dict[str, SyncTable] = {
+    "outlets": SyncTable(Outlet, ("id",), "id"),
+    "outlet_cogs": SyncTable(OutletCogs, ("outlet_id", "effective_from"), "outlet_id", "effective_from"),
+    "sales": SyncTable(Sale, ("outlet_id", "date"), "outlet_id", "date"),
+    "expenses": SyncTable(Expense, ("id",), "outlet_id", "date"),
+}
+
+# Edge hanya mengirim data operasional outlet; outlet dan COGS dikelola di central
+PUSH_TABLES = ["sales", "expenses"]
+
+BATCH_SIZE = 500
+
+# Id change_log di Postgres dibagikan saat INSERT, bukan saat commit, sehingga transaksi
+# yang masih berjalan bisa menyisipkan id di bawah cursor yang sudah dikirim. Entri
+# yang lebih muda dari ini ditahan sampai pull berikutnya.
+SETTLE_SECONDS = 60
+
+# Selama baris sync_state ini ada (hanya terlihat oleh transaksi yang membuatnya),
+# trigger edge tidak mencatat perubahan, agar delta dari central tidak dikirim balik
+APPLYING = "applying"
+PULL_CURSOR = "pull_cursor"
+
+# Setting sesi Postgres yang mematikan pencatatan change_log untuk transaksi bulk load
+# (seed.py load); outlet edge menarik ulang snapshot setelahnya
+SKIP_CHANGE_LOG = "pukis.skip_change_log"
+
+PG_LOG_FUNCTION = """
+CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+DECLARE
+    old_row jsonb;
+    new_row jsonb;
+BEGIN
+    IF current_setting('pukis.skip_change_log', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    
+    -- TG_ARGV: nama tabel (TG_TABLE_NAME bisa berupa nama partisi), kolom outlet,
+    -- kolom tanggal, 'natural' jika baris dicocokkan lewat kolom outlet + tanggal
+    IF TG_OP <> 'INSERT' THEN
+        old_row := to_jsonb(OLD);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_row := to_jsonb(NEW);
+    END IF;
+    
+    IF TG_OP = 'DELETE' OR (
+        TG_OP = 'UPDATE' AND TG_ARGV[3] = 'natural'
+        AND (old_row ->> TG_ARGV[1], old_row ->> TG_ARGV[2])
+            IS DISTINCT FROM (new_row ->> TG_ARGV[1], new_row ->> TG_ARGV[2])
+    ) THEN
+        INSERT INTO change_log (table_name, row_id, outlet_id, date, op, tenant_id)
+        VALUES (TG_ARGV[0], old_row ->> 'id', old_row ->> TG_ARGV[1], old_row ->> TG_ARGV[2], 'delete',
+                old_row ->> 'tenant_id');
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO change_log (table_name, row_id, outlet_id, date, op, tenant_id)
+        VALUES (TG_ARGV[0], new_row ->> 'id', new_row ->> TG_ARGV[1], new_row ->> TG_ARGV[2], 'upsert',
+                new_row ->> 'tenant_id');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def pg_trigger(name: str, table: SyncTable) -> str:
+    args = [name, table.outlet_column, table.date_column or "", "natural" if table.natural_key else "id"]
+    return (
+        f'CREATE TRIGGER "change_log_{name}" AFTER INSERT OR UPDATE OR DELETE ON "{name}" '
+        f"FOR EACH ROW EXECUTE FUNCTION log_change({', '.join(repr(arg) for arg in args)})"
+    )
+
+def sqlite_triggers(name: str, table: SyncTable) -> List[str]:
+    not_applying = f"NOT EXISTS (SELECT 1 FROM sync_state WHERE name = '{APPLYING}')"
+    
+    def log(ref: str, op: str) -> str:
+        date = f"{ref}.{table.date_column}" if table.date_column else "NULL"
+        return (
+            f"INSERT INTO change_log (table_name, row_id, outlet_id, date, op, tenant_id) "
+            f"SELECT '{name}', {ref}.id, {ref}.{table.outlet_column}, {date}, '{op}', {ref}.tenant_id"
+        )
+    
+    # Kunci bisnis berubah (mis. tanggal sale diedit): kunci lama dihapus di sisi lain
+    moved = ""
+    if table.natural_key:
+        changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in table.key)
+        moved = f"{log('OLD', 'delete')} WHERE {changed};"
+    
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS change_log_{name}_insert AFTER INSERT ON {name} "
+        f"WHEN {not_applying} BEGIN {log('NEW', 'upsert')}; END",
+        f"CREATE TRIGGER IF NOT EXISTS change_log_{name}_update AFTER UPDATE ON {name} "
+        f"WHEN {not_applying} BEGIN {moved} {log('NEW', 'upsert')}; END",
+        f"CREATE TRIGGER IF NOT EXISTS change_log_{name}_delete AFTER DELETE ON {name} "
+        f"WHEN {not_applying} BEGIN {log('OLD', 'delete')}; END",
+    ]
+
+async def ensure_change_log():
+    """
+    Pasang trigger change_log. Di edge (SQLite) skema juga dibuat dari model karena
+    tidak ada migrasi drizzle; di central tabel change_log harus sudah ada (db:push).
+    """
+    from ..database import Base, get_db_context, get_engine
+    
+    engine = get_engine()
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for name, table in SYNC_TABLES.items():
+                for statement in sqlite_triggers(name, table):
+                    await conn.execute(text(statement))
+        return
+    
+    async with get_db_context() as db:
+        async with exclusive(db, "change_log") as acquired:
+            if not acquired:
+                return
+    
+            if not await db.scalar(text("SELECT to_regclass('change_log') IS NOT NULL")):
+                logger.warning("Tabel change_log belum ada, sinkronisasi outlet edge nonaktif")
+                return
+    
+            await db.execute(text(PG_LOG_FUNCTION))
+            for name, table in SYNC_TABLES.items():
+                # Hanya dibuat jika belum ada: CREATE TRIGGER mengunci tabel
+                exists = await db.scalar(
+                    text("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(:table) AND tgname = :name)"),
+                    {"table": name, "name": f"change_log_{name}"}
+                )
+                if not exists:
+                    await db.execute(text(pg_trigger(name, table)))
+        await db.commit()
+
+def encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def row_values(model, obj) -> dict:
+    return {column.name: encode(getattr(obj, column.key)) for column in model.__table__.columns}
+
+def decode_row(model, row: dict) -> dict:
+    values = {}
+    for column in model.__table__.columns:
+        # Tenant penerima ditentukan user/konteks yang menerapkan delta, bukan isi baris
+        if column.name not in row or column.name == "tenant_id":
+            continue
+        value = row[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        values[column.key] = value
+    return values
+
+def entry_key(entry: ChangeLog) -> dict:
+    table = SYNC_TABLES[entry.table_name]
+    logged = {"id": entry.row_id, table.outlet_column: entry.outlet_id}
+    if table.date_column:
+        logged[table.date_column] = entry.date
+    return {column: logged[column] for column in table.key}
+
+async def resolve_entries(
+    db: AsyncSession,
+    entries: List[ChangeLog],
+    criteria: Callable[[str], list] = lambda name: []
+) -> List[dict]:
+    """
+    Entri change_log -> delta, satu query per tabel. Upsert membawa nilai baris saat ini
+    pada posisi entri terakhirnya; baris yang sudah hilang dilewati karena entri
+    delete-nya menyusul.
+    """
+    latest = {}
+    for entry in entries:
+        if entry.op == "upsert":
+            latest[(entry.table_name, entry.row_id)] = entry.id
+    
+    rows = {}
+    for name, table in SYNC_TABLES.items():
+        ids = [row_id for table_name, row_id in latest if table_name == name]
+        if not ids:
+            continue
+        result = await db.execute(select(table.model).where(table.model.id.in_(ids), *criteria(name)))
+        for obj in result.scalars().all():
+            rows[(name, obj.id)] = row_values(table.model, obj)
+    
+    changes = []
+    for entry in entries:
+        identity = (entry.table_name, entry.row_id)
+        if entry.op == "delete":
+            changes.append({
+                "table": entry.table_name, "op": "delete",
+                "key": entry_key(entry), "changed_at": encode(entry.changed_at),
+            })
+        elif latest[identity] == entry.id and identity in rows:
+            changes.append({"table": entry.table_name, "op": "upsert", "row": rows[identity]})
+    return changes
+
+def check_scope(scope: Scope, name: str, rows: List[Optional[dict]]):
+    if name not in PUSH_TABLES:
+        raise PermissionError(f"Tabel {name} hanya dikelola di central")
+    for values in filter(None, rows):
+        if not scope.can_access_outlet(values.get("outlet_id")):
+            raise PermissionError("Data outlet lain tidak dapat dikirim")
+        if values.get("type") == "gaji" and not scope.sees_salaries:
+            raise PermissionError("Anda tidak memiliki akses ke data gaji")
+
+async def existing_rows(db: AsyncSession, table: SyncTable, keys: List[tuple]) -> Dict[tuple, dict]:
+    columns = [getattr(table.model, column) for column in table.key]
+    if len(columns) == 1:
+        clause = columns[0].in_([key[0] for key in keys])
+    else:
+        clause = tuple_(*columns).in_(keys)
+    
+    result = await db.execute(select(table.model).where(clause))
+    return {
+        tuple(getattr(obj, column) for column in table.key): {
+            column.key: getattr(obj, column.key) for column in table.model.__table__.columns
+        }
+        for obj in result.scalars().all()
+    }
+
+def is_newer(incoming: Optional[datetime], current: Optional[datetime]) -> bool:
+    if incoming is None:
+        return current is None
+    return current is None or incoming > current
+
+async def apply_changes(db: AsyncSession, changes: List[dict], scope: Optional[Scope] = None) -> dict:
+    """
+    Terapkan delta dari sisi lain dengan aturan last-writer-wins per kunci. `scope` diisi
+    di central (push dari edge) untuk menolak baris di luar akses user, None di edge.
+    Tidak melakukan commit.
+    """
+    parsed = []
+    for change in changes:
+        table = SYNC_TABLES[change["table"]]
+        if change["op"] == "upsert":
+            if not change.get("row"):
+                raise ValueError("Perubahan upsert tanpa data baris")
+            values = decode_row(table.model, change["row"])
+            key = tuple(values.get(column) for column in table.key)
+        else:
+            values = None
+            key = tuple((change.get("key") or {}).get(column) for column in table.key)
+        if None in key:
+            raise ValueError(f"Kunci {', '.join(table.key)} wajib untuk tabel {change['table']}")
+        parsed.append((change["table"], table, key, values, change.get("changed_at")))
+    
+    current_rows = {}
+    for name, table in SYNC_TABLES.items():
+        keys = list({key for table_name, _, key, _, _ in parsed if table_name == name})
+        if keys:
+            current_rows[name] = await existing_rows(db, table, keys)
+    
+    applied = skipped = 0
+    for name, table, key, values, changed_at in parsed:
+        current = current_rows[name].get(key)
+        where = [getattr(table.model, column) == value for column, value in zip(table.key, key)]
+    
+        if scope is not None:
+            check_scope(scope, name, [values, current])
+    
+        if values is not None:
+            if current is not None and not is_newer(values.get("updated_at"), current.get("updated_at")):
+                skipped += 1
+                continue
+            if current is None:
+                await db.execute(insert(table.model).values(**values))
+                current_rows[name][key] = values
+            else:
+                # id dan created_at milik baris penerima dipertahankan
+                changed = {column: value for column, value in values.items() if column not in ("id", "created_at")}
+                await db.execute(update(table.model).where(*where).values(**changed))
+                current_rows[name][key] = {**current, **changed}
+        else:
+            if current is None:
+                continue
+            deleted_at = datetime.fromisoformat(changed_at) if changed_at else None
+            if deleted_at is not None and current.get("updated_at") is not None and deleted_at < current["updated_at"]:
+                skipped += 1
+                continue
+            await db.execute(delete(table.model).where(*where))
+            current_rows[name][key] = None
+        applied += 1
+    
+    return {"applied": applied, "skipped": skipped}
+
+def scope_criteria(scope: Scope, outlet_id: Optional[str]) -> Callable[[str], list]:
+    def criteria(name: str) -> list:
+        table = SYNC_TABLES[name]
+        if name == "expenses":
+            return scope.expenses(outlet_id)
+        return scope.outlets(getattr(table.model, table.outlet_column), outlet_id)
+    return criteria
+
+async def prune_change_log():
+    """
+    Di central change_log hanya dibaca outlet edge, jadi entri lama dihapus berdasarkan
+    umur. Dihapus per id (semua id <= entri terakhir yang kedaluwarsa) agar id yang
+    tersisa selalu lebih besar dari semua yang dihapus, dan entri terbaru selalu
+    disimpan sebagai penanda posisi; lihat collect_changes. Di edge change_log adalah
+    antrian push yang dibuang oleh mark_pushed, jadi tidak disentuh.
+    """
+    from ..config import get_settings
+    from ..database import get_db_context
+    
+    retention_days = get_settings().change_log_retention_days
+    if retention_days <= 0:
+        return
+    
+    async with get_db_context() as db:
+        if db.bind.dialect.name != "postgresql":
+            return
+        async with exclusive(db, "change_log_prune") as acquired:
+            if not acquired:
+                return
+            expired_through = select(func.max(ChangeLog.id)).where(
+                ChangeLog.changed_at < db_time_ago(db, timedelta(days=retention_days))
+            ).scalar_subquery()
+            newest = select(func.max(ChangeLog.id)).scalar_subquery()
+            result = await db.execute(
+                delete(ChangeLog).where(ChangeLog.id <= expired_through, ChangeLog.id < newest)
+                .execution_options(all_tenants=True)
+            )
+            await db.commit()
+    if result.rowcount:
+        logger.info("%d entri change_log lebih tua dari %d hari dihapus", result.rowcount, retention_days)
+
+def settle_cutoff(db: AsyncSession):
+    # changed_at berasal dari jam database, jadi batasnya juga dihitung di database
+    if db.bind.dialect.name == "postgresql":
+        return func.localtimestamp() - literal_column(f"interval '{SETTLE_SECONDS} seconds'")
+    return func.datetime("now", f"-{SETTLE_SECONDS} seconds")
+
+async def collect_changes(
+    db: AsyncSession,
+    scope: Scope,
+    outlet_id: Optional[str],
+    since: int,
+    limit: int = BATCH_SIZE
+) -> dict:
+    """
+    Delta untuk outlet edge setelah cursor `since`. `since` 0 berarti snapshot penuh
+    semua tabel dalam scope, begitu juga cursor yang entri sesudahnya sudah dihapus
+    prune_change_log. Cursor berikutnya dikembalikan bersama delta.
+    """
+    criteria = scope_criteria(scope, outlet_id)
+    settled = ChangeLog.changed_at <= settle_cutoff(db)
+    
+    if since:
+        # Lintas tenant: id tenant lain juga mengisi urutan id
+        oldest = await db.scalar(select(func.min(ChangeLog.id)).execution_options(all_tenants=True))
+        if oldest is not None and since < oldest - 1:
+            since = 0
+    
+    if since == 0:
+        cursor = await db.scalar(select(func.coalesce(func.max(ChangeLog.id), 0)).where(settled))
+        changes = []
+        for name, table in SYNC_TABLES.items():
+            result = await db.execute(select(table.model).where(*criteria(name)))
+            changes.extend(
+                {"table": name, "op": "upsert", "row": row_values(table.model, obj)}
+                for obj in result.scalars().all()
+            )
+        return {"changes": changes, "cursor": cursor, "more": False, "snapshot": True}
+    
+    result = await db.execute(
+        select(ChangeLog, settled.label("settled"))
+        .where(ChangeLog.id > since, *scope.outlets(ChangeLog.outlet_id, outlet_id))
+        .order_by(ChangeLog.id)
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    more = len(rows) > limit
+    
+    # Berhenti di entri pertama yang belum settle agar tidak ada id yang terlewati
+    entries = []
+    for entry, is_settled in rows[:limit]:
+        if not is_settled:
+            more = False
+            break
+        entries.append(entry)
+    
+    changes = await resolve_entries(db, entries, criteria)
+    return {"changes": changes, "cursor": entries[-1].id if entries else since, "more": more, "snapshot": False}
+
+async def get_state(db: AsyncSession, name: str) -> Optional[str]:
+    return await db.scalar(select(SyncState.value).where(SyncState.name == name))
+
+async def set_state(db: AsyncSession, name: str, value: str):
+    result = await db.execute(update(SyncState).where(SyncState.name == name).values(value=value))
+    if result.rowcount == 0:
+        await db.execute(insert(SyncState).values(name=name, value=value))
+
+async def pending_changes(db: AsyncSession, limit: int = BATCH_SIZE) -> Tuple[List[dict], Optional[int]]:
+    """Perubahan lokal edge yang belum dikirim, beserta id entri terakhir."""
+    result = await db.execute(select(ChangeLog).order_by(ChangeLog.id).limit(limit))
+    entries = result.scalars().all()
+    if not entries:
+        return [], None
+    return await resolve_entries(db, entries), entries[-1].id
+
+async def mark_pushed(db: AsyncSession, last_id: int):
+    """Antrian edge dibuang setelah diterima central. Tidak melakukan commit."""
+    await db.execute(delete(ChangeLog).where(ChangeLog.id <= last_id))
+
+async def delete_missing(db: AsyncSession, changes: List[dict]) -> int:
+    """
+    Snapshot berisi semua baris central dalam scope edge, tanpa entri delete. Baris edge
+    yang kuncinya tidak ada di snapshot sudah dihapus di central selama cursor edge
+    tertinggal (atau sebelum pull --full), jadi ikut dihapus; jika tidak, push berikutnya
+    bisa mengembalikannya ke central. Baris dengan perubahan lokal yang belum di-push
+    dipertahankan. Tidak melakukan commit.
+    """
+    pending = set((await db.execute(select(ChangeLog.table_name, ChangeLog.row_id))).all())
+    
+    deleted = 0
+    # Kebalikan urutan snapshot: transaksi dan COGS sebelum outletnya
+    for name, table in reversed(list(SYNC_TABLES.items())):
+        kept = {
+            tuple(change["row"].get(column) for column in table.key)
+            for change in changes if change["table"] == name
+        }
+        result = await db.execute(select(table.model.id, *[getattr(table.model, column) for column in table.key]))
+        stale = [
+            row_id for row_id, *key in result.all()
+            if tuple(key) not in kept and (name, row_id) not in pending
+        ]
+        for start in range(0, len(stale), BATCH_SIZE):
+            await db.execute(delete(table.model).where(table.model.id.in_(stale[start:start + BATCH_SIZE])))
+        deleted += len(stale)
+    return deleted
+
+async def apply_pulled(db: AsyncSession, payload: dict) -> dict:
+    """Terapkan hasil /api/sync/pull di edge tanpa mencatatnya ke antrian push. Tidak melakukan commit."""
+    await db.execute(insert(SyncState).values(name=APPLYING))
+    
+    deleted = await delete_missing(db, payload["changes"]) if payload.get("snapshot") else 0
+    result = await apply_changes(db, payload["changes"])
+    result["deleted"] = deleted
+    if payload.get("user"):
+        # Akun sync ikut disalin (hanya pada snapshot) agar admin outlet tetap bisa login saat offline
+        values = decode_row(User, payload["user"])
+        if await db.get(User, values["id"]):
+            await db.execute(update(User).where(User.id == values["id"]).values(**values))
+        else:
+            await db.execute(insert(User).values(**values))
+    
+    await db.execute(delete(SyncState).where(SyncState.name == APPLYING))
+    await set_state(db, PULL_CURSOR, str(payload["cursor"]))
+    return result
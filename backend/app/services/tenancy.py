@@ -0,0 +1,262 @@
+"""
+Mode multi-tenant (MULTI_TENANT=true) untuk franchise di satu database.
+
+- Tenant diambil dari user di get_current_user (klaim `tenant` JWT harus cocok) dan
+  disimpan di ContextVar database.current_tenant; job dan tugas terjadwal memakai
+  tenant job / for_each_tenant.
+- Setiap SELECT/UPDATE/DELETE ORM diberi kriteria tenant_id lewat with_loader_criteria,
+  termasuk subquery dan join; INSERT mengisi tenant_id dari default kolom. Query yang
+  memang lintas tenant memakai execution option `all_tenants=True`.
+- TENANT_RLS=true menambah row-level security Postgres sebagai lapisan kedua (mis.
+  untuk SQL mentah): policy membaca setting transaksi `pukis.tenant_id`.
+- TenantLimitMiddleware membatasi request per menit dan request bersamaan (berarti
+  koneksi pool) per tenant, sehingga satu tenant tidak menghabiskan pool bersama.
+"""
+from contextlib import contextmanager
+from time import monotonic
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import math
+
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from ..database import Base, current_tenant
+from ..models.models import Tenant, TenantMixin
+
+logger = logging.getLogger(__name__)
+
+# Setting transaksi Postgres yang dibaca policy RLS
+TENANT_SETTING = "pukis.tenant_id"
+POLICY_NAME = "tenant_isolation"
+
+# Request yang menunggu slot koneksi tenant lebih lama dari ini ditolak 503
+QUEUE_TIMEOUT = 10.0
+LIMITS_REFRESH_INTERVAL = 60.0
+
+def tenant_tables() -> list:
+    return sorted(
+        mapper.local_table.name
+        for mapper in Base.registry.mappers
+        if issubclass(mapper.class_, TenantMixin)
+    )
+
+def model_columns(model) -> list:
+    """
+    Semua kolom sebagai atribut ORM, pengganti select(Model.__table__): select atas Table
+    Core tidak diberi kriteria tenant.
+    """
+    return [getattr(model, column.key) for column in model.__table__.columns]
+
+@contextmanager
+def use_tenant(tenant_id: Optional[str]):
+    token = current_tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+def on_orm_execute(state: ORMExecuteState):
+    tenant_id = current_tenant.get()
+    if tenant_id is None or state.is_insert:
+        return
+    if state.execution_options.get("all_tenants", False):
+        return
+    # Lambda di-cache per statement; tenant_id menjadi bound parameter, bukan literal
+    state.statement = state.statement.options(
+        with_loader_criteria(TenantMixin, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+    )
+
+def set_tenant_setting(session: Session, transaction, connection):
+    tenant_id = current_tenant.get()
+    if tenant_id is not None:
+        connection.execute(text("SELECT set_config(:name, :tenant, true)"), {"name": TENANT_SETTING, "tenant": tenant_id})
+
+def register_events(rls: bool):
+    if not event.contains(Session, "do_orm_execute", on_orm_execute):
+        event.listen(Session, "do_orm_execute", on_orm_execute)
+    if rls and not event.contains(Session, "after_begin", set_tenant_setting):
+        event.listen(Session, "after_begin", set_tenant_setting)
+
+async def apply_tenant_setting(db):
+    """
+    Transaksi yang sudah berjalan sebelum tenant diketahui (query user di
+    get_current_user) tidak melewati after_begin lagi, jadi setting-nya dipasang di sini.
+    """
+    from ..config import get_settings
+    
+    if get_settings().tenant_rls and db.in_transaction() and db.bind.dialect.name == "postgresql":
+        await db.execute(
+            text("SELECT set_config(:name, :tenant, true)"), {"name": TENANT_SETTING, "tenant": current_tenant.get()}
+        )
+
+def policy_sql(table: str) -> str:
+    # Tanpa setting (konteks sistem: scheduler, job runner, CLI) semua baris terlihat
+    setting = f"current_setting('{TENANT_SETTING}', true)"
+    return (
+        f'CREATE POLICY {POLICY_NAME} ON "{table}" '
+        f"USING (coalesce({setting}, '') = '' OR tenant_id = {setting})"
+    )
+
+async def ensure_tenant_policies():
+    """Pasang RLS di semua tabel tenant (Postgres, TENANT_RLS=true). FORCE agar pemilik tabel juga terkena."""
+    from ..database import get_db_context
+    from .scheduler import exclusive
+    
+    async with get_db_context() as db:
+        if db.bind.dialect.name != "postgresql":
+            return
+        async with exclusive(db, "tenant_policies") as acquired:
+            if not acquired:
+                return
+            for table in tenant_tables():
+                exists = await db.scalar(
+                    text("SELECT EXISTS (SELECT 1 FROM pg_policies WHERE tablename = :table AND policyname = :name)"),
+                    {"table": table, "name": POLICY_NAME}
+                )
+                if exists:
+                    continue
+                await db.execute(text(f'ALTER TABLE "{table}" ENABLE ROW LEVEL SECURITY'))
+                await db.execute(text(f'ALTER TABLE "{table}" FORCE ROW LEVEL SECURITY'))
+                await db.execute(text(policy_sql(table)))
+        await db.commit()
+
+async def for_each_tenant(task: Callable[[], Awaitable[None]]):
+    """Jalankan tugas terjadwal sekali per tenant (mode multi-tenant), atau sekali saja."""
+    from ..config import get_settings
+    from ..database import get_db_context
+    
+    if not get_settings().multi_tenant:
+        await task()
+        return
+    
+    async with get_db_context() as db:
+        tenant_ids = (await db.execute(select(Tenant.id).order_by(Tenant.created_at))).scalars().all()
+    for tenant_id in tenant_ids:
+        with use_tenant(tenant_id):
+            try:
+                await task()
+            except Exception:
+                logger.exception("Tugas %s gagal untuk tenant %s", getattr(task, "__name__", task), tenant_id)
+
+def token_tenant(headers: Headers) -> Optional[str]:
+    from .auth import decode_token
+    
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_token(token)
+    return payload.get("tenant") if payload else None
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+    
+    def take(self) -> float:
+        """0 jika boleh lanjut, selain itu detik sampai token berikutnya tersedia."""
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class TenantLimits:
+    """Bucket dan semaphore per tenant di worker ini; override dari tabel tenants dimuat berkala."""
+    
+    def __init__(self, rate_limit: int, max_connections: int):
+        self.default_rate = rate_limit
+        self.default_connections = max_connections
+        self.overrides: Dict[str, tuple] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+    
+    def bucket(self, tenant_id: str) -> Optional[TokenBucket]:
+        rate = self.overrides.get(tenant_id, (None, None))[0] or self.default_rate
+        if rate <= 0:
+            return None
+        bucket = self.buckets.get(tenant_id)
+        if bucket is None or bucket.capacity != rate:
+            bucket = self.buckets[tenant_id] = TokenBucket(rate)
+        return bucket
+    
+    def semaphore(self, tenant_id: str) -> asyncio.Semaphore:
+        semaphore = self.semaphores.get(tenant_id)
+        if semaphore is None:
+            limit = self.overrides.get(tenant_id, (None, None))[1] or self.default_connections
+            semaphore = self.semaphores[tenant_id] = asyncio.Semaphore(limit)
+        return semaphore
+    
+    async def refresh(self):
+        from ..database import get_db_context
+    
+        async with get_db_context() as db:
+            rows = await db.execute(select(Tenant.id, Tenant.rate_limit, Tenant.max_connections))
+            overrides = {tenant_id: (rate, connections) for tenant_id, rate, connections in rows.all()}
+        # Semaphore yang batasnya berubah dibuat ulang; request yang sedang memegang slot lama tetap selesai
+        for tenant_id, (_, connections) in overrides.items():
+            if self.overrides.get(tenant_id, (None, None))[1] != connections:
+                self.semaphores.pop(tenant_id, None)
+        self.overrides = overrides
+    
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Gagal memuat batas tenant")
+            await asyncio.sleep(LIMITS_REFRESH_INTERVAL)
+
+class TenantLimitMiddleware:
+    """
+    Dipasang hanya di mode multi-tenant. Tenant dibaca dari klaim JWT tanpa query;
+    request tanpa tenant (login, akun platform) tidak dibatasi di sini.
+    """
+    
+    def __init__(self, app, limits: TenantLimits):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+    
+        tenant_id = token_tenant(Headers(scope=scope))
+        if tenant_id is None:
+            await self.app(scope, receive, send)
+            return
+    
+        bucket = self.limits.bucket(tenant_id)
+        wait = bucket.take() if bucket is not None else 0.0
+        if wait > 0:
+            response = JSONResponse(
+                {"detail": "Terlalu banyak permintaan, coba lagi sebentar"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+    
+        semaphore = self.limits.semaphore(tenant_id)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            response = JSONResponse(
+                {"detail": "Server sedang sibuk untuk tenant ini, coba lagi sebentar"},
+                status_code=503,
+                headers={"Retry-After": str(int(QUEUE_TIMEOUT))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            semaphore.release()
@@ -0,0 +1,84 @@
+"""
+Partisi bulanan dan arsip Parquet untuk tabel sales dan expenses
+Jalankan:
+    python backend/archive.py partition      # migrasi satu kali, saat aplikasi berhenti
+    python backend/archive.py archive 2023   # ekspor tahun tertutup, lalu hapus dari database
+    python backend/archive.py status
+Arsip membutuhkan pyarrow: pip install pyarrow
+"""
+import argparse
+import asyncio
+from datetime import date
+
+from sqlalchemy import select, func
+
+from app.database import get_db_context, dispose_engine
+from app.services.archive import ARCHIVE_TABLES, archive_year, archived_years
+from app.services.partitions import (
+    PARTITIONED_TABLES, convert_to_partitioned, ensure_partitions, existing_partitions, is_partitioned
+)
+
+async def partition(tables):
+    async with get_db_context() as db:
+        for table in tables:
+            if await convert_to_partitioned(db, table):
+                print(f"{table}: dikonversi menjadi tabel berpartisi bulanan")
+            else:
+                created = await ensure_partitions(db, table)
+                print(f"{table}: sudah berpartisi, {len(created)} partisi baru")
+        await db.commit()
+
+async def archive(tables, year: int, force: bool):
+    # Analitik membandingkan dengan tahun lalu dari tabel aktif, jadi secara default
+    # tahun lalu tetap di database
+    if year >= date.today().year - 1 and not force:
+        raise SystemExit(f"Tahun {year} masih dipakai perbandingan tahunan, gunakan --force")
+    
+    async with get_db_context() as db:
+        for table in tables:
+            count = await archive_year(db, table, year)
+            print(f"{table} {year}: {count} baris diarsipkan")
+
+async def status(tables):
+    async with get_db_context() as db:
+        for table in tables:
+            model = ARCHIVE_TABLES[table]
+            result = await db.execute(select(func.count(), func.min(model.date), func.max(model.date)))
+            count, first, last = result.one()
+            print(f"{table}: {count} baris aktif ({first} s/d {last})")
+    
+            if await is_partitioned(db, table):
+                print(f"  {len(await existing_partitions(db, table))} partisi")
+            else:
+                print("  belum berpartisi")
+            print(f"  arsip: {', '.join(map(str, archived_years(table))) or '-'}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Partisi dan arsip sales/expenses")
+    parser.add_argument("--table", choices=list(PARTITIONED_TABLES), action="append",
+                        help="Default: semua tabel")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("partition", help="Konversi ke tabel berpartisi bulanan")
+    archive_parser = commands.add_parser("archive", help="Ekspor satu tahun tertutup ke Parquet")
+    archive_parser.add_argument("year", type=int)
+    archive_parser.add_argument("--force", action="store_true")
+    commands.add_parser("status")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    tables = args.table or list(PARTITIONED_TABLES)
+    
+    try:
+        if args.command == "partition":
+            await partition(tables)
+        elif args.command == "archive":
+            await archive(tables, args.year, args.force)
+        else:
+            await status(tables)
+    finally:
+        await dispose_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
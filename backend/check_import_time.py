@@ -0,0 +1,92 @@
+"""
+Cek anggaran waktu import aplikasi (cold start)
+Jalankan: python backend/check_import_time.py [--budget-ms 400]
+Juga dijalankan oleh `uv run pytest` (backend/tests/test_import_time.py).
+
+Yang dianggarkan adalah waktu import modul aplikasi sendiri di atas FastAPI,
+SQLAlchemy dan Pydantic, yang sudah diimpor lebih dulu di interpreter yang sama.
+Waktu import framework itu sangat bergantung pada mesin (0,7-1 detik di server
+kecil) dan tidak bisa dikurangi oleh kode aplikasi.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Modul berat yang harus diimpor saat pertama dipakai, bukan saat startup
+LAZY_MODULES = ["jose", "bcrypt", "aiofiles", "numpy", "pyarrow", "brotli", "PIL"]
+
+# Selalu dibutuhkan aplikasi; tidak dihitung dalam anggaran
+FRAMEWORK_MODULES = ["fastapi", "pydantic", "sqlalchemy.orm", "sqlalchemy.ext.asyncio"]
+
+DEFAULT_BUDGET_MS = 400
+DEFAULT_RUNS = 5
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+def measure(module: str) -> dict:
+    result = run_python("-X", "importtime", "-c", f"import {module}")
+    if result.returncode != 0:
+        raise SystemExit(f"Import {module} gagal tanpa DATABASE_URL:\n{result.stderr}")
+    
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # format: "import time: <self us> | <cumulative us> | <nama modul>"
+        _, cumulative_us, name = line.split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+def app_import_ms(module: str, runs: int) -> float:
+    """Waktu import tercepat dari beberapa proses baru; gangguan mesin hanya menambah waktu."""
+    script = (
+        f"import {', '.join(FRAMEWORK_MODULES)}\n"
+        "from time import perf_counter\n"
+        "start = perf_counter()\n"
+        f"import {module}\n"
+        "print((perf_counter() - start) * 1000)\n"
+    )
+    timings = []
+    for _ in range(runs):
+        result = run_python("-c", script)
+        if result.returncode != 0:
+            raise SystemExit(f"Import {module} gagal tanpa DATABASE_URL:\n{result.stderr}")
+        timings.append(float(result.stdout.strip()))
+    return min(timings)
+
+def eager_modules(module: str) -> list:
+    return sorted({name for name in measure(module) if name.split(".")[0] in LAZY_MODULES})
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek waktu import aplikasi")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+    
+    total_ms = app_import_ms(args.module, args.runs)
+    eager = eager_modules(args.module)
+    
+    print(f"import {args.module} di atas framework: {total_ms:.0f} ms (anggaran {args.budget_ms:.0f} ms)")
+    
+    failed = False
+    if total_ms > args.budget_ms:
+        print("GAGAL: melebihi anggaran waktu import")
+        failed = True
+    if eager:
+        print(f"GAGAL: modul berikut seharusnya diimpor secara lazy: {', '.join(eager)}")
+        failed = True
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,119 @@
 """
-Script untuk membuat Super Admin user pertama
-Jalankan: python backend/seed.py
+Bootstrap super admin serta dump/load massal data lewat COPY Postgres
+Jalankan:
+    python backend/seed.py                              # super admin (sama dengan `admin`)
+    python backend/seed.py admin --email a@b.id         # password dari SUPERADMIN_PASSWORD atau dibuat acak
+    python backend/seed.py dump /var/backups/pukis      # tenants, outlets, outlet_cogs, users, sales, expenses
+    python backend/seed.py dump /tmp/pukis --format binary --table sales
+    python backend/seed.py verify /var/backups/pukis    # cek checksum tanpa database
+    python backend/seed.py load /var/backups/pukis      # tabel kosong di-COPY langsung, selain itu digabung
+    python backend/seed.py load /var/backups/pukis --replace
 """
-from app.database import SessionLocal, engine, Base
+import argparse
+import asyncio
+import os
+import secrets
+
+from sqlalchemy import select
+
+from app.database import get_db_context, dispose_engine
 from app.models.models import User
-from app.services.auth import get_password_hash
+from app.services.bulk import BULK_TABLES, FORMATS, dump, load, verify
 
-Base.metadata.create_all(bind=engine)
+DEFAULT_EMAIL = "superadmin@pukis.id"
 
-def seed_super_admin():
-    db = SessionLocal()
+async def bootstrap_admin(email: str, password: str, reset: bool):
+    from app.services.auth import get_password_hash
     
-    try:
-        existing = db.query(User).filter(User.email == "superadmin@pukis.id").first()
-        
-        if existing:
-            print("Super Admin sudah ada!")
+    async with get_db_context() as db:
+        existing = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+        if existing and not reset:
+            print(f"Super Admin {email} sudah ada (gunakan --reset-password untuk mengganti password)")
             return
-        
-        super_admin = User(
-            email="superadmin@pukis.id",
-            first_name="Super",
-            last_name="Admin",
-            role="super_admin",
-            password=get_password_hash("superadmin123")
-        )
-        
-        db.add(super_admin)
-        db.commit()
-        
-        print("Super Admin berhasil dibuat!")
-        print("Email: superadmin@pukis.id")
-        print("Password: superadmin123")
-        
+    
+        generated = not password
+        password = password or secrets.token_urlsafe(12)
+        hashed = await asyncio.to_thread(get_password_hash, password)
+        if existing:
+            existing.password = hashed
+            existing.role = "super_admin"
+        else:
+            db.add(User(email=email, first_name="Super", last_name="Admin", role="super_admin", password=hashed))
+        await db.commit()
+    
+    print(f"Super Admin {'diperbarui' if existing else 'berhasil dibuat'}!")
+    print(f"Email: {email}")
+    if generated:
+        print(f"Password: {password}")
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Super admin, dump dan load data (COPY)")
+    parser.set_defaults(
+        command="admin", email=DEFAULT_EMAIL, password=os.getenv("SUPERADMIN_PASSWORD"), reset_password=False
+    )
+    commands = parser.add_subparsers(dest="command")
+    
+    admin_parser = commands.add_parser("admin", help="Buat super admin pertama")
+    admin_parser.add_argument("--email", default=DEFAULT_EMAIL)
+    admin_parser.add_argument("--password", default=os.getenv("SUPERADMIN_PASSWORD"),
+                              help="Default SUPERADMIN_PASSWORD; kosong berarti dibuat acak")
+    admin_parser.add_argument("--reset-password", action="store_true",
+                              help="Ganti password jika email sudah ada")
+    
+    dump_parser = commands.add_parser("dump", help="Ekspor tabel ke direktori (paralel, satu snapshot)")
+    dump_parser.add_argument("directory")
+    dump_parser.add_argument("--format", choices=list(FORMATS), default="csv",
+                             help="binary lebih cepat, tetapi hanya untuk versi Postgres dan skema yang sama")
+    
+    load_parser = commands.add_parser("load", help="Impor direktori dump")
+    load_parser.add_argument("directory")
+    load_parser.add_argument("--replace", action="store_true",
+                             help="Kosongkan tabel (CASCADE) sebelum impor, untuk restore")
+    
+    verify_parser = commands.add_parser("verify", help="Cocokkan checksum file dengan manifest")
+    verify_parser.add_argument("directory")
+    
+    for command_parser in (dump_parser, load_parser):
+        command_parser.add_argument("--table", choices=list(BULK_TABLES), action="append",
+                                    help="Default: semua tabel")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    selected = getattr(args, "table", None)
+    tables = [table for table in BULK_TABLES if table in selected] if selected else None
+    
+    try:
+        if args.command == "admin":
+            await bootstrap_admin(args.email, args.password, args.reset_password)
+        elif args.command == "dump":
+            manifest = await dump(args.directory, tables or list(BULK_TABLES), args.format)
+            for table, entry in manifest["tables"].items():
+                print(f"{table}: {entry['rows']} baris, {format_size(entry['bytes'])}, sha256 {entry['sha256'][:12]}")
+        elif args.command == "verify":
+            results = await verify(args.directory)
+            for table, valid in results.items():
+                print(f"{table}: {'OK' if valid else 'RUSAK'}")
+            if not all(results.values()):
+                raise SystemExit(1)
+        else:
+            results = await load(args.directory, tables, args.replace)
+            for table, result in results.items():
+                mode = "COPY langsung" if result["direct"] else "digabung"
+                print(f"{table}: {result['rows']} baris dibaca, {result['inserted']} ditambahkan ({mode})")
+            if any(result["direct"] for result in results.values()):
+                print("Catatan: baris hasil COPY langsung tidak masuk change_log; outlet edge perlu `sync.py pull --full`")
+    except ValueError as error:
+        raise SystemExit(str(error))
     finally:
-        db.close()
+        await dispose_engine()
 
 if __name__ == "__main__":
-    seed_super_admin()
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Entrypoint produksi untuk backend FastAPI (multi-worker, tanpa reload)
+Jalankan: python backend/serve.py --workers 4
+"""
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 1, 4)))
+
+def pool_sizing(workers: int, max_connections: int, reserved: int) -> tuple:
+    """
+    Bagi koneksi Postgres yang tersedia ke semua worker sehingga
+    workers * (pool_size + max_overflow) tidak melebihi max_connections.
+    """
+    per_worker = max((max_connections - reserved) // workers, 1)
+    pool_size = max(per_worker * 2 // 3, 1)
+    return pool_size, per_worker - pool_size
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pukis Monitoring API (produksi)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=75,
+                        help="Detik koneksi idle dibiarkan terbuka (di atas idle timeout proxy)")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Detik menunggu request berjalan selesai setelah SIGTERM")
+    parser.add_argument("--limit-concurrency", type=int, default=None)
+    parser.add_argument("--db-max-connections", type=int,
+                        default=int(os.getenv("DB_MAX_CONNECTIONS", "100")))
+    parser.add_argument("--db-reserved-connections", type=int,
+                        default=int(os.getenv("DB_RESERVED_CONNECTIONS", "10")),
+                        help="Koneksi yang disisakan untuk psql, migrasi dan cron")
+    parser.add_argument("--no-access-log", action="store_true")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    
+    pool_size, max_overflow = pool_sizing(
+        args.workers, args.db_max_connections, args.db_reserved_connections
+    )
+    # Worker mewarisi environment proses induk, database.py membacanya saat import
+    os.environ.setdefault("DB_POOL_SIZE", str(pool_size))
+    os.environ.setdefault("DB_MAX_OVERFLOW", str(max_overflow))
+    
+    print(
+        f"Menjalankan {args.workers} worker, pool {os.environ['DB_POOL_SIZE']}"
+        f"+{os.environ['DB_MAX_OVERFLOW']} koneksi per worker"
+    )
+    
+    # SIGTERM ditangani uvicorn: berhenti menerima koneksi baru, menunggu
+    # request berjalan hingga --graceful-timeout, lalu menjalankan shutdown lifespan.
+    uvicorn.run(
+        "app.main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if has_module("uvloop") else "auto",
+        http="httptools" if has_module("httptools") else "auto",
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_concurrency=args.limit_concurrency,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        access_log=not args.no_access_log,
+        lifespan="on",
+    )
+
+if __name__ == "__main__":
+    main()
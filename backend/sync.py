@@ -0,0 +1,154 @@
+"""
+Sinkronisasi outlet edge (SQLite lokal) dengan backend central
+Jalankan di mesin outlet dengan EDGE_DATABASE_PATH terisi:
+    python backend/sync.py run                  # push lalu pull, sekali
+    python backend/sync.py run --interval 300   # terus-menerus; saat offline dicoba lagi
+    python backend/sync.py pull --full          # ambil ulang seluruh data outlet
+Butuh CENTRAL_URL, SYNC_EMAIL dan SYNC_PASSWORD (akun admin outlet di central).
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from app.config import get_settings
+from app.database import get_db_context, dispose_engine
+from app.services.sync import (
+    BATCH_SIZE, PULL_CURSOR, apply_pulled, ensure_change_log, get_state, mark_pushed, pending_changes
+)
+
+class CentralClient:
+    def __init__(self, url: str, email: str, password: str):
+        self.url = url.rstrip("/")
+        self.email = email
+        self.password = password
+        self.token = None
+    
+    def request(self, method: str, path: str, payload=None, compress: bool = False) -> dict:
+        headers = {"Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+            if compress:
+                data = gzip.compress(data)
+                headers["Content-Encoding"] = "gzip"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+    
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        with urllib.request.urlopen(request, timeout=120) as response:
+            body = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+        return json.loads(body)
+    
+    async def call(self, method: str, path: str, payload=None, compress: bool = False) -> dict:
+        # urllib memblokir; dijalankan di thread agar tidak perlu klien HTTP tambahan
+        return await asyncio.to_thread(self.request, method, path, payload, compress)
+    
+    async def login(self):
+        self.token = None
+        result = await self.call("POST", "/api/auth/login", {"email": self.email, "password": self.password})
+        self.token = result["access_token"]
+
+async def push(client: CentralClient) -> int:
+    total = 0
+    while True:
+        async with get_db_context() as db:
+            changes, last_id = await pending_changes(db, BATCH_SIZE)
+        if last_id is None:
+            return total
+    
+        if changes:
+            result = await client.call("POST", "/api/sync/push", {"changes": changes}, compress=True)
+            print(f"push: {result['applied']} diterapkan, {result['skipped']} kalah konflik")
+        # Perubahan lokal yang masuk selama push punya id lebih besar dan tetap di antrian
+        async with get_db_context() as db:
+            await mark_pushed(db, last_id)
+            await db.commit()
+        total += len(changes)
+
+async def pull(client: CentralClient, outlet_id: str, full: bool) -> int:
+    async with get_db_context() as db:
+        since = 0 if full else int(await get_state(db, PULL_CURSOR) or 0)
+    
+    total = 0
+    while True:
+        query = {"since": since, "limit": BATCH_SIZE}
+        if outlet_id:
+            query["outlet_id"] = outlet_id
+        payload = await client.call("GET", f"/api/sync/pull?{urllib.parse.urlencode(query)}")
+        if payload.get("snapshot") and since:
+            print("pull: cursor lebih tua dari retensi change_log central, menerima snapshot penuh")
+    
+        async with get_db_context() as db:
+            result = await apply_pulled(db, payload)
+            await db.commit()
+        if payload["changes"]:
+            print(f"pull: {result['applied']} diterapkan, {result['skipped']} kalah konflik")
+        if result["deleted"]:
+            print(f"pull: {result['deleted']} baris yang sudah dihapus di central ikut dihapus")
+    
+        total += len(payload["changes"])
+        since = payload["cursor"]
+        if not payload["more"]:
+            return total
+
+async def sync_once(client: CentralClient, args):
+    await client.login()
+    if args.command in ("push", "run"):
+        await push(client)
+    if args.command in ("pull", "run"):
+        await pull(client, args.outlet, args.full)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sinkronisasi outlet edge dengan central")
+    parser.add_argument("command", choices=["push", "pull", "run"])
+    parser.add_argument("--central-url", default=os.getenv("CENTRAL_URL"))
+    parser.add_argument("--email", default=os.getenv("SYNC_EMAIL"))
+    parser.add_argument("--password", default=os.getenv("SYNC_PASSWORD"))
+    parser.add_argument("--outlet", default=os.getenv("EDGE_OUTLET_ID"),
+                        help="Outlet yang ditarik; default outlet akun admin outlet")
+    parser.add_argument("--full", action="store_true", help="Pull snapshot penuh, abaikan cursor")
+    parser.add_argument("--interval", type=int, default=0,
+                        help="Detik antar sinkronisasi; 0 berarti sekali jalan")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    if not get_settings().edge_mode:
+        raise SystemExit("EDGE_DATABASE_PATH belum diisi: sync.py hanya dijalankan di outlet edge")
+    if not (args.central_url and args.email and args.password):
+        raise SystemExit("CENTRAL_URL, SYNC_EMAIL dan SYNC_PASSWORD wajib diisi")
+    
+    client = CentralClient(args.central_url, args.email, args.password)
+    try:
+        await ensure_change_log()
+        while True:
+            try:
+                await sync_once(client, args)
+            except urllib.error.HTTPError as error:
+                detail = error.read().decode("utf-8", "replace")
+                if not args.interval:
+                    raise SystemExit(f"Central menolak sinkronisasi ({error.code}): {detail}")
+                print(f"Central menolak sinkronisasi ({error.code}): {detail}")
+            except (urllib.error.URLError, OSError) as error:
+                # Offline: antrian lokal tetap tersimpan dan dikirim pada percobaan berikutnya
+                if not args.interval:
+                    raise SystemExit(f"Central tidak dapat dihubungi: {error}")
+                print(f"Central tidak dapat dihubungi: {error}")
+    
+            if not args.interval:
+                break
+            # Full snapshot cukup sekali; putaran berikutnya memakai cursor
+            args.full = False
+            await asyncio.sleep(args.interval)
+    finally:
+        await dispose_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
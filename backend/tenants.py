@@ -0,0 +1,140 @@
+"""
+Kelola tenant untuk mode multi-tenant (MULTI_TENANT=true)
+Jalankan:
+    python backend/tenants.py create "Pukis Bandung" --owner-email owner@bandung.id
+    python backend/tenants.py create "Pukis Solo" --rate-limit 1200 --max-connections 4
+    python backend/tenants.py list
+    python backend/tenants.py limits <tenant_id> --rate-limit 300   # 0 = kembali ke default
+    python backend/tenants.py adopt <tenant_id>   # data single-tenant (tenant_id NULL) menjadi milik tenant
+"""
+import argparse
+import asyncio
+import os
+import secrets
+
+from sqlalchemy import func, select, text, update
+
+from app.database import Base, get_db_context, dispose_engine
+from app.models.models import Outlet, Tenant, TenantMixin, User
+from app.services.sync import SKIP_CHANGE_LOG
+
+async def create_tenant(name: str, rate_limit, max_connections, owner_email, owner_password):
+    from app.services.auth import get_password_hash
+    
+    async with get_db_context() as db:
+        tenant = Tenant(name=name, rate_limit=rate_limit or None, max_connections=max_connections or None)
+        db.add(tenant)
+        await db.flush()
+    
+        generated = False
+        if owner_email:
+            if (await db.execute(select(User.id).where(User.email == owner_email))).first():
+                raise SystemExit(f"Email {owner_email} sudah terdaftar")
+            generated = not owner_password
+            owner_password = owner_password or secrets.token_urlsafe(12)
+            hashed = await asyncio.to_thread(get_password_hash, owner_password)
+            db.add(User(email=owner_email, first_name=name, role="owner", password=hashed, tenant_id=tenant.id))
+        await db.commit()
+    
+    print(f"Tenant {name} dibuat: {tenant.id}")
+    if owner_email:
+        print(f"Owner: {owner_email}")
+        if generated:
+            print(f"Password: {owner_password}")
+
+async def list_tenants():
+    async with get_db_context() as db:
+        outlet_count = (
+            select(func.count()).select_from(Outlet).where(Outlet.tenant_id == Tenant.id).scalar_subquery()
+        )
+        user_count = select(func.count()).select_from(User).where(User.tenant_id == Tenant.id).scalar_subquery()
+        rows = await db.execute(
+            select(Tenant, outlet_count, user_count).order_by(Tenant.created_at)
+        )
+        for tenant, outlets, users in rows.all():
+            limits = f"rate {tenant.rate_limit or 'default'}/menit, koneksi {tenant.max_connections or 'default'}"
+            print(f"{tenant.id}  {tenant.name}  ({outlets} outlet, {users} user, {limits})")
+
+async def set_limits(tenant_id: str, rate_limit, max_connections):
+    values = {}
+    if rate_limit is not None:
+        values["rate_limit"] = rate_limit or None
+    if max_connections is not None:
+        values["max_connections"] = max_connections or None
+    if not values:
+        raise SystemExit("Isi --rate-limit dan/atau --max-connections")
+    
+    async with get_db_context() as db:
+        result = await db.execute(update(Tenant).where(Tenant.id == tenant_id).values(**values))
+        if not result.rowcount:
+            raise SystemExit(f"Tenant {tenant_id} tidak ditemukan")
+        await db.commit()
+    print("Batas diperbarui; worker memuatnya dalam satu menit")
+
+async def adopt(tenant_id: str, include_admins: bool):
+    """
+    Pindahkan data tanpa tenant (instalasi single-tenant sebelumnya) ke satu tenant.
+    Outlet lebih dulu karena FK (tenant_id, outlet_id) tabel lain merujuk ke sana.
+    """
+    async with get_db_context() as db:
+        if await db.get(Tenant, tenant_id) is None:
+            raise SystemExit(f"Tenant {tenant_id} tidak ditemukan")
+        if db.bind.dialect.name == "postgresql":
+            # Bukan perubahan data bagi outlet edge; jangan banjiri change_log
+            await db.execute(text(f"SET LOCAL {SKIP_CHANGE_LOG} = 'on'"))
+    
+        models = sorted(
+            (mapper.class_ for mapper in Base.registry.mappers if issubclass(mapper.class_, TenantMixin)),
+            key=lambda model: (model is not Outlet, model.__tablename__)
+        )
+        for model in models:
+            criteria = [model.tenant_id.is_(None)]
+            if model is User and not include_admins:
+                # super_admin tanpa tenant tetap menjadi akun platform
+                criteria.append(User.role != "super_admin")
+            result = await db.execute(update(model).where(*criteria).values(tenant_id=tenant_id))
+            if result.rowcount:
+                print(f"{model.__tablename__}: {result.rowcount} baris")
+        await db.commit()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kelola tenant (mode multi-tenant)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    create_parser = commands.add_parser("create", help="Buat tenant, opsional dengan akun owner")
+    create_parser.add_argument("name")
+    create_parser.add_argument("--owner-email")
+    create_parser.add_argument("--owner-password", default=os.getenv("OWNER_PASSWORD"),
+                               help="Default OWNER_PASSWORD; kosong berarti dibuat acak")
+    
+    limits_parser = commands.add_parser("limits", help="Ubah batas request tenant")
+    limits_parser.add_argument("tenant_id")
+    
+    for command_parser in (create_parser, limits_parser):
+        command_parser.add_argument("--rate-limit", type=int, help="Request per menit per worker")
+        command_parser.add_argument("--max-connections", type=int, help="Request bersamaan per worker")
+    
+    commands.add_parser("list", help="Daftar tenant")
+    
+    adopt_parser = commands.add_parser("adopt", help="Pindahkan data tanpa tenant ke tenant ini")
+    adopt_parser.add_argument("tenant_id")
+    adopt_parser.add_argument("--include-admins", action="store_true",
+                              help="Pindahkan juga super_admin (default: tetap akun platform)")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    try:
+        if args.command == "create":
+            await create_tenant(args.name, args.rate_limit, args.max_connections, args.owner_email, args.owner_password)
+        elif args.command == "list":
+            await list_tenants()
+        elif args.command == "limits":
+            await set_limits(args.tenant_id, args.rate_limit, args.max_connections)
+        else:
+            await adopt(args.tenant_id, args.include_admins)
+    finally:
+        await dispose_engine()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Tes yang butuh Postgres memakai fixture `postgres` dan dilewati jika TEST_DATABASE_URL
+tidak diisi. Database itu dikosongkan (drop_all/create_all) di setiap tes, jadi
+jangan arahkan ke database yang berisi data.
+"""
+from typing import Optional
+import asyncio
+import os
+
+import pytest
+
+from app.config import get_settings
+from app.database import Base, dispose_engine, init_engine
+import app.models.models  # noqa: F401  (daftarkan tabel di Base.metadata)
+
+# Semua direktori kerja aplikasi diarahkan ke folder sementara tes
+DIR_SETTINGS = [
+    "UPLOAD_DIR", "ARCHIVE_DIR", "JOB_RESULT_DIR", "SETTLEMENT_DIR", "AUDIT_SPOOL_DIR", "CARD_DIR", "PROFILE_DIR"
+]
+
+class Postgres:
+    def run(self, scenario, *args):
+        """Jalankan coroutine dengan engine baru di event loop-nya sendiri."""
+        async def main():
+            init_engine()
+            try:
+                return await scenario(*args)
+            finally:
+                await dispose_engine()
+        return asyncio.run(main())
+    
+    def client(self, user_id: str, tenant_id: Optional[str] = None):
+        """Klien HTTP ke aplikasi (tanpa lifespan; engine dari run()) dengan token user."""
+        import httpx
+        from app.main import app
+        from app.services.auth import create_access_token
+    
+        token = create_access_token({"sub": user_id, "tenant": tenant_id})
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://test",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+async def reset_schema():
+    from app.database import get_engine
+    
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+@pytest.fixture
+def postgres(monkeypatch, tmp_path):
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL tidak diisi")
+    
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.delenv("EDGE_DATABASE_PATH", raising=False)
+    for name in DIR_SETTINGS:
+        monkeypatch.setenv(name, str(tmp_path / name.lower()))
+    get_settings.cache_clear()
+    
+    database = Postgres()
+    database.run(reset_schema)
+    yield database
+    get_settings.cache_clear()
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.database import get_db_context
+from app.models.models import Outlet, Sale
+from app.routers.analytics import validate_range
+from app.services.analytics import (
+    CHANNELS, SalesFrame, channel_mix, empty_frame, load_frame, outlet_comparison, summarize, to_day, trend
+)
+
+OUTLETS = {"o1": ("Dago", 2000), "o2": ("Buah Batu", 2500)}
+# outlet, tanggal, nominal per channel, terjual, produksi, retur
+SALES = [
+    ("o1", "2026-10-12", {"cash": 100000, "grab": 50000}, 30, 40, 2),
+    ("o1", "2026-10-13", {"qris": 80000}, 20, 20, 0),
+    ("o2", "2026-10-12", {"cash": 40000, "gofood": 20000}, 15, 20, 1),
+    # Periode sebelumnya (10-11 Oktober), minggu lalu dan tahun lalu (364 hari)
+    ("o1", "2026-10-10", {"cash": 150000}, 30, 30, 0),
+    ("o2", "2026-10-05", {"cash": 30000}, 10, 10, 0),
+    ("o1", "2025-10-13", {"cash": 115000}, 23, 25, 0),
+]
+
+def known_frame() -> SalesFrame:
+    # Urutan outlet mengikuti load_frame: berdasarkan nama
+    outlet_ids = sorted(OUTLETS, key=lambda outlet_id: OUTLETS[outlet_id][0])
+    return SalesFrame(
+        outlet_ids=outlet_ids,
+        outlet_names=[OUTLETS[outlet_id][0] for outlet_id in outlet_ids],
+        outlet=np.array([outlet_ids.index(row[0]) for row in SALES], dtype=np.int32),
+        day=np.array([to_day(row[1]) for row in SALES], dtype=np.int32),
+        channels=np.array([[row[2].get(channel, 0) for row in SALES] for channel in CHANNELS], dtype=np.float64),
+        total_sold=np.array([row[3] for row in SALES], dtype=np.float64),
+        total_production=np.array([row[4] for row in SALES], dtype=np.float64),
+        returned=np.array([row[5] for row in SALES], dtype=np.float64),
+        sold_out_minute=np.full(len(SALES), np.nan),
+        unit_cogs=np.array([OUTLETS[row[0]][1] for row in SALES], dtype=np.float64),
+    )
+
+def check_known_numbers(frame: SalesFrame):
+    summary = summarize(frame, "2026-10-12", "2026-10-13")
+    assert (summary["totalRevenue"], summary["cogsSold"], summary["grossMargin"]) == (290000, 137500, 152500)
+    assert (summary["totalSold"], summary["totalProduction"], summary["returned"]) == (65, 80, 3)
+    assert summary["grossMarginPercentage"] == 52.59
+    assert summary["previousPeriod"]["totalRevenue"] == 150000
+    assert summary["lastYear"]["totalRevenue"] == 115000
+    assert (summary["revenueChange"], summary["revenueChangeYoY"]) == (93.33, 152.17)
+    assert summary["totalSoldChange"] == 116.67
+    
+    mix = channel_mix(frame, "2026-10-12", "2026-10-13", by_outlet=True)
+    amounts = {entry["channel"]: (entry["amount"], entry["share"]) for entry in mix["channels"]}
+    assert amounts["cash"] == (140000, 48.28)
+    assert amounts["qris"] == (80000, 27.59)
+    assert amounts["grab"] == (50000, 17.24)
+    assert amounts["gofood"] == (20000, 6.9)
+    assert amounts["shopee"] == (0, 0)
+    outlets = {entry["outletId"]: entry for entry in mix["outlets"]}
+    assert outlets["o1"]["totalRevenue"] == 230000
+    assert outlets["o2"]["channels"]["gofood"] == 20000
+    assert outlets["o2"]["shares"]["cash"] == 66.67
+    
+    points = trend(frame, "2026-10-12", "2026-10-13")["points"]
+    assert [point["date"] for point in points] == ["2026-10-12", "2026-10-13"]
+    assert [point["totalRevenue"] for point in points] == [210000, 80000]
+    assert [point["cogsSold"] for point in points] == [97500, 40000]
+    assert [point["totalSold"] for point in points] == [45, 20]
+    assert [point["revenueChangeWoW"] for point in points] == [600.0, None]
+    assert [point["revenueChangeYoY"] for point in points] == [82.61, None]
+    
+    ranked = outlet_comparison(frame, "2026-10-12", "2026-10-13")["outlets"]
+    assert [(entry["rank"], entry["outletId"]) for entry in ranked] == [(1, "o1"), (2, "o2")]
+    dago, buah_batu = ranked
+    assert (dago["totalRevenue"], dago["cogsSold"], dago["totalSold"], dago["returned"]) == (230000, 100000, 50, 2)
+    assert (dago["sellThrough"], dago["revenueShare"], dago["revenueChange"]) == (83.33, 79.31, 53.33)
+    assert (buah_batu["grossMargin"], buah_batu["grossMarginPercentage"]) == (22500, 37.5)
+    assert (buah_batu["sellThrough"], buah_batu["revenueShare"], buah_batu["revenueChange"]) == (75.0, 20.69, None)
+
+def test_known_sales():
+    check_known_numbers(known_frame())
+
+def test_known_sales_loaded_from_database(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([
+                Outlet(id=outlet_id, name=name, cogs_per_piece=cogs) for outlet_id, (name, cogs) in OUTLETS.items()
+            ])
+            await db.flush()
+            db.add_all([
+                Sale(
+                    outlet_id=outlet_id, date=sale_date, total_sold=sold, total_production=production,
+                    returned=returned, **channels
+                )
+                for outlet_id, sale_date, channels, sold, production, returned in SALES
+            ])
+            await db.commit()
+            return await load_frame(db, None, "2026-10-12", "2026-10-13")
+    
+    check_known_numbers(postgres.run(scenario))
+
+def test_empty_range_with_outlets():
+    # Outlet sudah ada, penjualan belum: semua angka nol, bukan error casting bincount
+    frame = empty_frame(["o1", "o2"], ["Dago", "Buah Batu"])
+    
+    points = trend(frame, "2026-10-01", "2026-10-07")["points"]
+    assert len(points) == 7
+    assert all(point["totalRevenue"] == 0 for point in points)
+    
+    weekly = trend(frame, "2026-10-01", "2026-10-31", granularity="week")["points"]
+    assert all(point["totalSold"] == 0 for point in weekly)
+    
+    outlets = outlet_comparison(frame, "2026-10-01", "2026-10-07")["outlets"]
+    assert [outlet["outletId"] for outlet in outlets] == ["o1", "o2"]
+    assert all(outlet["totalRevenue"] == 0 for outlet in outlets)
+    
+    mix = channel_mix(frame, "2026-10-01", "2026-10-07", by_outlet=True)
+    assert mix["totalRevenue"] == 0
+    assert len(mix["outlets"]) == 2
+    
+    assert summarize(frame, "2026-10-01", "2026-10-07")["totalRevenue"] == 0
+
+def test_group_sums_is_float():
+    frame = empty_frame(["o1"], ["Dago"])
+    sums = frame.group_sums(frame.metrics, frame.outlet, frame.mask(0, 1), 1)
+    assert sums.dtype == np.float64
+    assert sums.shape == (5, 1)
+
+@pytest.mark.parametrize("start_date, end_date", [("2026-02-30", "2026-03-01"), ("2026-10-01", "2026-13-01")])
+def test_invalid_calendar_date_is_400(start_date, end_date):
+    with pytest.raises(HTTPException) as error:
+        validate_range(start_date, end_date)
+    assert error.value.status_code == 400
+
+def test_reversed_range_is_400():
+    with pytest.raises(HTTPException) as error:
+        validate_range("2026-10-02", "2026-10-01")
+    assert error.value.status_code == 400
@@ -0,0 +1,33 @@
+from sqlalchemy import func, select
+
+from app.database import get_db_context
+from app.models.models import Outlet, Sale, SalesBaseline, User
+from app.services import anomalies
+
+def test_sale_saved_when_detection_fails(postgres, monkeypatch):
+    async def failing_observe(*args, **kwargs):
+        raise RuntimeError("deteksi gagal")
+    
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([User(id="u1", email="owner@example.com", role="owner"), Outlet(id="o1", name="Dago")])
+            await db.commit()
+    
+        async with postgres.client("u1") as client:
+            created = await client.post("/api/sales", json={"outlet_id": "o1", "date": "2026-10-12", "cash": 1000})
+            assert created.status_code == 200, created.text
+            assert created.json()["cash"] == 1000
+    
+            # Deteksi berhasil lagi: jendela tersimpan dari session deteksi sendiri
+            monkeypatch.setattr(anomalies, "observe_sale", observe_sale)
+            updated = await client.patch(f"/api/sales/{created.json()['id']}", json={"cash": 2000})
+            assert updated.status_code == 200, updated.text
+            assert updated.json()["cash"] == 2000
+    
+        async with get_db_context() as db:
+            assert await db.scalar(select(Sale.cash)) == 2000
+            assert await db.scalar(select(func.count()).select_from(SalesBaseline)) == 1
+    
+    observe_sale = anomalies.observe_sale
+    monkeypatch.setattr(anomalies, "observe_sale", failing_observe)
+    postgres.run(scenario)
@@ -0,0 +1,32 @@
+import os
+
+from app.config import get_settings
+from app.database import get_db_context
+from app.models.models import User
+
+def test_list_rejects_invalid_dates_with_archive(postgres):
+    # Cukup keberadaan file: tahun arsip dibaca dari nama file
+    for table in ["sales", "expenses"]:
+        directory = os.path.join(get_settings().archive_dir, table)
+        os.makedirs(directory)
+        open(os.path.join(directory, "2023.parquet"), "wb").close()
+    
+    async def scenario():
+        async with get_db_context() as db:
+            db.add(User(id="u1", email="owner@example.com", role="owner"))
+            await db.commit()
+    
+        async with postgres.client("u1") as client:
+            for path, params in [
+                ("/api/sales", {"start_date": "abc"}),
+                ("/api/sales", {"date": "10-12-2026"}),
+                ("/api/expenses", {"end_date": "abc"}),
+                ("/api/expenses/search", {"q": "gas", "start_date": "abc"}),
+            ]:
+                response = await client.get(path, params=params)
+                assert response.status_code == 422, response.text
+    
+            response = await client.get("/api/sales", params={"start_date": "2026-10-01"})
+            assert response.status_code == 200, response.text
+    
+    postgres.run(scenario)
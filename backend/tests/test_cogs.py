@@ -0,0 +1,35 @@
+from app.database import get_db_context
+from app.models.models import Outlet, User
+
+def test_patch_cancels_scheduled_cogs(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([
+                User(id="u1", email="owner@example.com", role="owner"),
+                Outlet(id="o1", name="Dago", cogs_per_piece=5000),
+            ])
+            await db.commit()
+    
+        async with postgres.client("u1") as client:
+            scheduled = await client.post(
+                "/api/outlets/o1/cogs", json={"effective_from": "2099-01-01", "cogs_per_piece": 5500}
+            )
+            assert scheduled.status_code == 200, scheduled.text
+    
+            # Sama dengan nilai hari ini, tapi membatalkan kenaikan terjadwal
+            cancelled = await client.patch(
+                "/api/outlets/o1", json={"cogs_per_piece": 5000, "cogs_effective_from": "2099-01-01"}
+            )
+            assert cancelled.status_code == 200, cancelled.text
+            history = (await client.get("/api/outlets/o1/cogs")).json()
+            timeline = {entry["effective_from"]: entry["cogs_per_piece"] for entry in history}
+            assert timeline["2099-01-01"] == 5000
+    
+            # Timeline tidak berubah: tidak ada entri baru
+            unchanged = await client.patch(
+                "/api/outlets/o1", json={"cogs_per_piece": 5000, "cogs_effective_from": "2099-06-01"}
+            )
+            assert unchanged.status_code == 200, unchanged.text
+            assert len((await client.get("/api/outlets/o1/cogs")).json()) == len(history)
+    
+    postgres.run(scenario)
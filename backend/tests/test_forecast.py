@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+
+from app.database import get_db_context
+from app.models.models import Outlet, ProductionForecast, Sale, User
+from app.routers.forecast import get_production_forecast
+from app.services.analytics import empty_frame, to_day
+from app.services.forecast import compute_forecasts, nightly_refresh, refresh_forecasts
+
+def test_outlets_without_sales():
+    # Deploy pertama: outlet sudah ada, penjualan belum
+    result = compute_forecasts(empty_frame(["o1", "o2"], ["Dago", "Buah Batu"]), to_day("2026-10-19"))
+    assert result["forecast"].shape == (2, 7)
+    assert not result["forecast"].any()
+    assert not result["recommended"].any()
+
+@pytest.mark.parametrize("value", ["2026-02-30", "2026-13-01"])
+def test_invalid_date_is_400(value):
+    async def scenario():
+        with pytest.raises(HTTPException) as error:
+            await get_production_forecast(date_=value, outlet_id=None, db=None, scope=None)
+        return error.value.status_code
+    
+    assert asyncio.run(scenario()) == 400
+
+def test_nightly_refresh_after_first_compute(postgres):
+    async def computed_at():
+        async with get_db_context() as db:
+            return await db.scalar(select(func.max(ProductionForecast.computed_at)))
+    
+    async def scenario():
+        async with get_db_context() as db:
+            db.add(Outlet(id="o1", name="Dago"))
+            await db.flush()
+            db.add(Sale(outlet_id="o1", date="2026-10-12", cash=100000, total_sold=20))
+            await db.commit()
+            assert await refresh_forecasts(db, "2026-10-19") == 7
+    
+        # Baru dihitung: dilewati
+        first = await computed_at()
+        await nightly_refresh()
+        assert await computed_at() == first
+    
+        # Sudah lebih dari satu jam: dihitung ulang
+        async with get_db_context() as db:
+            await db.execute(update(ProductionForecast).values(computed_at=func.now() - func.make_interval(0, 0, 0, 0, 2)))
+            await db.commit()
+        stale = await computed_at()
+        await nightly_refresh()
+        assert await computed_at() > stale
+    
+    postgres.run(scenario)
+
+def test_concurrent_first_requests(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([User(id="u1", email="owner@example.com", role="owner"), Outlet(id="o1", name="Dago")])
+            await db.flush()
+            db.add_all([
+                Sale(outlet_id="o1", date=f"2026-10-{day}", cash=100000, total_sold=20) for day in range(10, 20)
+            ])
+            await db.commit()
+    
+        async with postgres.client("u1") as client:
+            responses = await asyncio.gather(*[
+                client.get("/api/forecast/production", params={"date": "2026-10-20"}) for _ in range(4)
+            ])
+        # Satu request menghitung; yang kalah lock menerima daftar kosong, bukan 500
+        assert [response.status_code for response in responses] == [200] * 4
+        assert any(response.json() for response in responses)
+    
+        async with get_db_context() as db:
+            assert await db.scalar(select(func.count()).select_from(ProductionForecast)) == 7
+    
+    postgres.run(scenario)
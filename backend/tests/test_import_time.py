@@ -0,0 +1,7 @@
+from check_import_time import DEFAULT_BUDGET_MS, DEFAULT_RUNS, app_import_ms, eager_modules
+
+def test_app_import_within_budget():
+    assert app_import_ms("app.main", DEFAULT_RUNS) <= DEFAULT_BUDGET_MS
+
+def test_heavy_modules_are_lazy():
+    assert eager_modules("app.main") == []
@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+from sqlalchemy import func, select, update
+
+from app.database import get_db_context
+from app.models.models import Job, JobStatus, Outlet, Sale, User
+from app.schemas.schemas import SalesExportParams
+from app.services.jobs import JobRunner, submit_job
+
+async def wait_for_status(job_id: str, statuses: set, timeout: float = 15.0) -> Job:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        async with get_db_context() as db:
+            job = await db.get(Job, job_id)
+        if job.status in statuses or loop.time() > deadline:
+            return job
+        await asyncio.sleep(0.1)
+
+def test_runner_claims_and_recovers_on_postgres(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            user = User(id="u1", email="owner@example.com", role="owner")
+            db.add_all([user, Outlet(id="o1", name="Dago")])
+            await db.flush()
+            db.add(Sale(outlet_id="o1", date="2026-10-12", cash=100000, total_sold=20))
+            await db.commit()
+    
+            # Ditinggal worker mati: satu masih boleh dicoba lagi, satu sudah habis percobaan
+            ago = lambda minutes: func.localtimestamp() - func.make_interval(0, 0, 0, 0, 0, minutes)
+            retry = Job(type="anomaly_scan", status=JobStatus.running.value, attempts=1, created_by="u1")
+            exhausted = Job(type="anomaly_scan", status=JobStatus.running.value, attempts=3, created_by="u1")
+            expired = Job(type="anomaly_scan", status=JobStatus.succeeded.value, created_by="u1")
+            db.add_all([retry, exhausted, expired])
+            await db.flush()
+            await db.execute(update(Job).where(Job.id.in_([retry.id, exhausted.id])).values(heartbeat_at=ago(5)))
+            await db.execute(update(Job).where(Job.id == expired.id).values(finished_at=ago(8 * 24 * 60)))
+            await db.commit()
+    
+            job = await submit_job(db, user, "sales_export", SalesExportParams())
+    
+        runner = JobRunner(poll_interval=0.1)
+        task = asyncio.create_task(runner.run())
+        try:
+            finished = await wait_for_status(job.id, {JobStatus.succeeded.value, JobStatus.failed.value})
+            assert finished.status == JobStatus.succeeded.value, finished.error
+            assert os.path.exists(finished.result_path)
+    
+            # Diantrikan ulang lalu diklaim dan dijalankan lagi
+            rerun = await wait_for_status(retry.id, {JobStatus.succeeded.value})
+            assert rerun.status == JobStatus.succeeded.value
+            assert rerun.attempts == 2
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.stop()
+    
+        async with get_db_context() as db:
+            assert (await db.get(Job, exhausted.id)).status == JobStatus.failed.value
+            assert await db.scalar(select(func.count()).select_from(Job).where(Job.id == expired.id)) == 0
+    
+    postgres.run(scenario)
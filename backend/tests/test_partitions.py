@@ -0,0 +1,85 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from app.database import get_db_context
+from app.models.models import Outlet, Sale
+from app.services.partitions import (
+    MONTHS_AHEAD, add_months, convert_to_partitioned, default_partition, ensure_partitions, existing_partitions,
+    partition_name
+)
+
+def test_far_future_row_in_default_enters_window(postgres):
+    today = date(2026, 10, 19)
+    # Di luar jendela MONTHS_AHEAD saat ditulis, jadi masuk partisi default
+    far_month = add_months(today.replace(day=1), MONTHS_AHEAD + 2)
+    
+    async def scenario():
+        async with get_db_context() as db:
+            await convert_to_partitioned(db, "sales")
+            await db.commit()
+    
+            db.add(Outlet(id="o1", name="Dago"))
+            await db.flush()
+            db.add(Sale(outlet_id="o1", date=far_month.replace(day=15).isoformat(), cash=1000))
+            await db.commit()
+            in_default = await db.scalar(text(f'SELECT count(*) FROM "{default_partition("sales")}"'))
+            assert in_default == 1
+    
+            # Beberapa bulan kemudian bulan itu masuk jendela pembuatan partisi
+            created = await ensure_partitions(db, "sales", add_months(today, 2))
+            await db.commit()
+    
+            assert partition_name("sales", far_month) in created
+            assert partition_name("sales", far_month) in await existing_partitions(db, "sales")
+            assert await db.scalar(text(f'SELECT count(*) FROM "{default_partition("sales")}"')) == 0
+            assert await db.scalar(text(f'SELECT count(*) FROM "{partition_name("sales", far_month)}"')) == 1
+    
+            # Dijalankan lagi tanpa perubahan: tidak ada yang dibuat
+            assert await ensure_partitions(db, "sales", add_months(today, 2)) == []
+    
+    postgres.run(scenario)
+
+def test_maintenance_failure_does_not_raise(postgres, monkeypatch, caplog):
+    from app.services import partitions
+    
+    async def broken(db, table, today=None):
+        raise RuntimeError("partisi rusak")
+    
+    async def scenario():
+        async with get_db_context() as db:
+            await convert_to_partitioned(db, "sales")
+            await db.commit()
+        monkeypatch.setattr(partitions, "ensure_partitions", broken)
+        # Dipanggil dari lifespan: startup harus tetap jalan
+        await partitions.maintain_partitions()
+    
+    postgres.run(scenario)
+    assert "Pemeliharaan partisi sales gagal" in caplog.text
+
+async def table_schema(db, table: str):
+    foreign_keys = await db.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:table) AND contype = 'f'"
+    ), {"table": table})
+    # Primary key sengaja berbeda: tabel berpartisi memakai (id, date)
+    indexes = await db.execute(text(
+        "SELECT indexname, replace(indexdef, ' ON ONLY ', ' ON ') FROM pg_indexes "
+        "WHERE tablename = :table AND indexname NOT LIKE '%pk%' AND indexname NOT LIKE '%pkey'"
+    ), {"table": table})
+    return sorted(foreign_keys.all()), sorted(indexes.all())
+
+def test_conversion_keeps_foreign_keys_and_indexes(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            for table in ["sales", "expenses"]:
+                foreign_keys, indexes = await table_schema(db, table)
+                # outlet_id -> outlets, tenant_id -> tenants dan FK komposit tenant
+                assert len(foreign_keys) == 3
+                assert f"IDX_{table}_tenant_date" in [name for name, _ in indexes]
+    
+                await convert_to_partitioned(db, table)
+                await db.commit()
+                assert await table_schema(db, table) == (foreign_keys, indexes)
+    
+    postgres.run(scenario)
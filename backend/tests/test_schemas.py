@@ -0,0 +1,26 @@
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.schemas import ExpensesExportParams, OutletCogsCreate, OutletUpdate, SalesExportParams
+
+@pytest.mark.parametrize("value", ["1/7/2026", "2026-7-1", "2026-02-30", "20260701"])
+def test_cogs_effective_from_must_be_iso_date(value):
+    with pytest.raises(ValidationError):
+        OutletCogsCreate(effective_from=value, cogs_per_piece=1500)
+    with pytest.raises(ValidationError):
+        OutletUpdate(cogs_per_piece=1500, cogs_effective_from=value)
+
+def test_cogs_valid():
+    assert OutletCogsCreate(effective_from="2026-07-01", cogs_per_piece=1500).effective_from == "2026-07-01"
+    assert OutletUpdate(cogs_per_piece=1500).cogs_effective_from is None
+
+def test_outlet_update_rejects_negative_cogs():
+    with pytest.raises(ValidationError):
+        OutletUpdate(cogs_per_piece=-1)
+
+def test_export_dates_must_be_iso_date():
+    with pytest.raises(ValidationError):
+        SalesExportParams(start_date="abc")
+    with pytest.raises(ValidationError):
+        ExpensesExportParams(end_date="2026-13-01")
+    assert SalesExportParams(start_date="2026-10-01").end_date is None
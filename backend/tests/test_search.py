@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.database import get_db_context
+from app.models.models import Expense, Outlet, User
+from app.services import search
+
+class FakeSession:
+    """Session Postgres tiruan yang menjawab cek pg_extension dari daftar."""
+    def __init__(self, answers):
+        self.bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+        self.answers = list(answers)
+        self.queries = 0
+    
+    async def scalar(self, statement):
+        self.queries += 1
+        return self.answers.pop(0)
+
+def test_missing_trigram_is_rechecked(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search, "monotonic", lambda: now[0])
+    monkeypatch.setattr(search, "_trigram_available", None)
+    db = FakeSession([False, True])
+    
+    async def scenario():
+        assert await search.trigram_available(db) is False
+        # Masih dalam selang cek: tidak query lagi
+        now[0] += search.RECHECK_SECONDS - 1
+        assert await search.trigram_available(db) is False
+        assert db.queries == 1
+    
+        # Ekstensi dipasang belakangan: terpakai tanpa restart, lalu diingat
+        now[0] += 2
+        assert await search.trigram_available(db) is True
+        now[0] += search.RECHECK_SECONDS * 10
+        assert await search.trigram_available(db) is True
+        assert db.queries == 2
+    
+    asyncio.run(scenario())
+
+def test_concurrent_startup_and_search(postgres, monkeypatch):
+    monkeypatch.setattr(search, "_trigram_available", None)
+    
+    async def scenario():
+        # Beberapa worker start bersamaan; tanpa pg_trgm pun tidak ada yang gagal
+        await asyncio.gather(*[search.ensure_search_index() for _ in range(3)])
+    
+        async with get_db_context() as db:
+            db.add_all([User(id="u1", email="owner@example.com", role="owner"), Outlet(id="o1", name="Dago")])
+            await db.flush()
+            db.add(Expense(outlet_id="o1", date="2026-10-12", description="Tepung terigu", amount=50000))
+            await db.commit()
+    
+        async with postgres.client("u1") as client:
+            response = await client.get("/api/expenses/search", params={"q": "tepung"})
+            assert response.status_code == 200, response.text
+            assert [row["description"] for row in response.json()] == ["Tepung terigu"]
+    
+    postgres.run(scenario)
@@ -0,0 +1,102 @@
+import asyncio
+
+from app.database import get_db_context
+from app.models.models import Outlet, PlatformAccount, Sale, User
+from app.services.jobs import JobRunner
+from app.services.scope import Scope
+from app.services.settlements import SettlementTotals, aggregate_file, reconcile
+
+SETTLEMENT_CSV = """Store ID,Transaction Date,Gross Sales,Status
+GRAB-001,12/10/2026,"100.000",completed
+GRAB-001,12/10/2026,"50.000",completed
+GRAB-001,13/10/2026,"60.000",completed
+GRAB-001,13/10/2026,"9.999",cancelled
+GRAB-999,13/10/2026,"1.000",completed
+"""
+
+def test_settlement_import_end_to_end(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([User(id="u1", email="finance@example.com", role="finance"), Outlet(id="o1", name="Dago")])
+            await db.flush()
+            db.add_all([
+                PlatformAccount(outlet_id="o1", platform="grab", external_id="GRAB-001"),
+                Sale(outlet_id="o1", date="2026-10-12", grab=150000),
+                Sale(outlet_id="o1", date="2026-10-13", grab=80000),
+            ])
+            await db.commit()
+    
+        runner = JobRunner(poll_interval=0.1)
+        task = asyncio.create_task(runner.run())
+        try:
+            async with postgres.client("u1") as client:
+                response = await client.post(
+                    "/api/settlements/import",
+                    files={"file": ("grab.csv", SETTLEMENT_CSV.encode(), "text/csv")},
+                    data={"platform": "grab"},
+                )
+                assert response.status_code == 202, response.text
+                job_id = response.json()["jobId"]
+    
+                for _ in range(150):
+                    job = (await client.get(f"/api/jobs/{job_id}")).json()
+                    if job["status"] not in ("queued", "running"):
+                        break
+                    await asyncio.sleep(0.1)
+                assert job["status"] == "succeeded", job
+    
+                summary = job["result"]
+                assert summary["rows"] == 4
+                assert summary["skipped"] == 1
+                assert summary["statuses"]["matched"]["count"] == 1
+                assert summary["statuses"]["short"] == {"count": 1, "difference": -20000.0}
+                assert summary["statuses"]["unknown_outlet"]["count"] == 1
+    
+                report = await client.get(f"/api/jobs/{job_id}/download")
+                assert report.status_code == 200
+                # Header + matched, short, unknown_outlet
+                assert len(report.text.splitlines()) == 4
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.stop()
+    
+    postgres.run(scenario)
+
+def test_transaction_date_preferred_over_settlement_date(tmp_path):
+    path = tmp_path / "grab.csv"
+    path.write_text(
+        "Store ID,Settlement Date,Transaction Date,Gross Sales\n"
+        "GRAB-001,2026-10-15,2026-10-12,100000\n"
+    )
+    totals = aggregate_file(str(path), "grab")
+    assert dict(totals.amounts) == {("GRAB-001", "2026-10-12", "grab"): 100000.0}
+
+def test_missing_settlement_limited_to_file_accounts(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([Outlet(id="o1", name="Dago"), Outlet(id="o2", name="Buah Batu")])
+            await db.flush()
+            db.add_all([
+                PlatformAccount(outlet_id="o1", platform="grab", external_id="GRAB-001"),
+                Sale(outlet_id="o1", date="2026-10-12", grab=100000, gofood=40000),
+                Sale(outlet_id="o1", date="2026-10-13", grab=70000),
+                Sale(outlet_id="o2", date="2026-10-12", grab=90000),
+            ])
+            await db.commit()
+    
+            totals = SettlementTotals()
+            for sale_date, amount in [("2026-10-12", 100000.0), ("2026-10-13", 60000.0)]:
+                totals.amounts[("GRAB-001", sale_date, "grab")] = amount
+                totals.lines[("GRAB-001", sale_date, "grab")] = 1
+            scope = Scope(role="finance", outlet_id=None)
+            rows = await reconcile(db, scope, totals, {"o1": "Dago", "o2": "Buah Batu"})
+    
+        statuses = sorted((row["outletId"], row["date"], row["channel"], row["status"]) for row in rows)
+        # GoFood o1 dan Grab o2 tidak ada di file, jadi tidak dilaporkan missing_settlement
+        assert statuses == [
+            ("o1", "2026-10-12", "grab", "matched"),
+            ("o1", "2026-10-13", "grab", "short"),
+        ]
+    
+    postgres.run(scenario)
@@ -0,0 +1,102 @@
+import asyncio
+
+from sqlalchemy import delete, func, select, update
+
+from app.config import get_settings
+from app.database import dispose_engine, get_db_context, init_engine
+from app.models.models import ChangeLog, Expense, Outlet, Sale, User
+from app.services.sync import apply_pulled, ensure_change_log, prune_change_log
+
+def days_ago(days: int):
+    return func.localtimestamp() - func.make_interval(0, 0, 0, days)
+
+def test_change_log_retention_and_pull_payload(postgres):
+    async def scenario():
+        await ensure_change_log()
+        async with get_db_context() as db:
+            db.add_all([
+                User(id="u1", email="admin@example.com", role="admin_outlet", assigned_outlet_id="o1", password="hash"),
+                Outlet(id="o1", name="Dago"),
+            ])
+            await db.flush()
+            db.add_all([Sale(outlet_id="o1", date=f"2026-10-{day:02d}", cash=1000) for day in range(10, 14)])
+            await db.commit()
+    
+            ids = (await db.execute(select(ChangeLog.id).order_by(ChangeLog.id))).scalars().all()
+            assert len(ids) == 5
+            # Semua entri sudah lewat retensi dan masa settle
+            await db.execute(update(ChangeLog).values(changed_at=days_ago(40)))
+            await db.commit()
+    
+        await prune_change_log()
+        async with get_db_context() as db:
+            remaining = (await db.execute(select(ChangeLog.id))).scalars().all()
+        # Entri terbaru disimpan sebagai penanda posisi cursor
+        assert remaining == [ids[-1]]
+    
+        async with postgres.client("u1") as client:
+            # Cursor di tengah rentang yang sudah dihapus: snapshot penuh beserta akun
+            stale = (await client.get("/api/sync/pull", params={"since": ids[1]})).json()
+            assert stale["snapshot"] is True
+            assert stale["user"]["password"] == "hash"
+            assert len([change for change in stale["changes"] if change["table"] == "sales"]) == 4
+    
+            # Delta biasa tidak membawa akun (dan hash password)
+            current = (await client.get("/api/sync/pull", params={"since": stale["cursor"]})).json()
+            assert current["snapshot"] is False
+            assert "user" not in current
+    
+            # Cursor tepat sebelum entri tersisa tidak kehilangan apa pun
+            delta = (await client.get("/api/sync/pull", params={"since": ids[-2]})).json()
+            assert delta["snapshot"] is False
+            assert len(delta["changes"]) == 1
+    
+    postgres.run(scenario)
+
+def test_edge_snapshot_removes_rows_deleted_on_central(monkeypatch, tmp_path):
+    monkeypatch.setenv("EDGE_DATABASE_PATH", str(tmp_path / "edge.db"))
+    get_settings.cache_clear()
+    
+    async def scenario():
+        await ensure_change_log()
+        async with get_db_context() as db:
+            db.add(Outlet(id="o1", name="Dago"))
+            await db.flush()
+            db.add_all([Sale(outlet_id="o1", date=f"2026-10-{day}", cash=1000) for day in (10, 11, 12)])
+            db.add(Expense(id="e1", outlet_id="o1", date="2026-10-10", description="Gas", amount=50000))
+            await db.commit()
+            # Semua sudah di-push, kecuali sale yang dibuat sesudahnya
+            await db.execute(delete(ChangeLog))
+            db.add(Sale(outlet_id="o1", date="2026-10-13", cash=1000))
+            await db.commit()
+    
+            # Sale 11-12 dan expense e1 dihapus di central; id sale 10 di central berbeda
+            snapshot = {
+                "changes": [
+                    {"table": "outlets", "op": "upsert", "row": {"id": "o1", "name": "Dago"}},
+                    {"table": "sales", "op": "upsert", "row": {
+                        "id": "central-10", "outlet_id": "o1", "date": "2026-10-10", "cash": 1500,
+                        "updated_at": "2026-10-19T08:00:00",
+                    }},
+                ],
+                "cursor": 42, "more": False, "snapshot": True,
+            }
+            result = await apply_pulled(db, snapshot)
+            await db.commit()
+            assert result["deleted"] == 3
+    
+            sales = (await db.execute(select(Sale.date, Sale.cash).order_by(Sale.date))).all()
+            assert sales == [("2026-10-10", 1500), ("2026-10-13", 1000)]
+            assert await db.scalar(select(func.count()).select_from(Expense)) == 0
+            # Penghapusan dari snapshot tidak masuk antrian push
+            assert (await db.execute(select(ChangeLog.table_name, ChangeLog.op))).all() == [("sales", "upsert")]
+    
+    async def main():
+        init_engine()
+        try:
+            await scenario()
+        finally:
+            await dispose_engine()
+    
+    asyncio.run(main())
+    get_settings.cache_clear()
@@ -0,0 +1,43 @@
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.database import get_db_context
+from app.models.models import Expense, Outlet, RecurringExpense, Sale, Tenant, User
+from app.services.tenancy import on_orm_execute, register_events
+
+def test_create_rejects_outlet_of_other_tenant(postgres):
+    async def scenario():
+        async with get_db_context() as db:
+            db.add_all([Tenant(id="ta", name="Franchise A"), Tenant(id="tb", name="Franchise B")])
+            await db.flush()
+            db.add_all([
+                User(id="ua", email="a@example.com", role="owner", tenant_id="ta"),
+                Outlet(id="oa", name="Dago", tenant_id="ta"),
+                Outlet(id="ob", name="Buah Batu", tenant_id="tb"),
+            ])
+            await db.commit()
+    
+        async with postgres.client("ua", "ta") as client:
+            # Outlet tenant lain diperlakukan seperti tidak ada, bukan IntegrityError dari FK komposit
+            for path, body in [
+                ("/api/sales", {"outlet_id": "ob", "date": "2026-10-10", "cash": 1000}),
+                ("/api/expenses", {"outlet_id": "ob", "date": "2026-10-10", "description": "Gas", "amount": 50000}),
+                ("/api/recurring-expenses", {"outlet_id": "ob", "type": "bulanan", "description": "Sewa", "amount": 1000000}),
+            ]:
+                response = await client.post(path, json=body)
+                assert response.status_code == 404, response.text
+                assert response.json()["detail"] == "Outlet tidak ditemukan"
+    
+            sale = await client.post("/api/sales", json={"outlet_id": "oa", "date": "2026-10-10", "cash": 1000})
+            assert sale.status_code == 200, sale.text
+    
+        async with get_db_context() as db:
+            assert await db.scalar(select(func.count()).select_from(Sale)) == 1
+            assert await db.scalar(select(func.count()).select_from(Expense)) == 0
+            assert await db.scalar(select(func.count()).select_from(RecurringExpense)) == 0
+    
+    register_events(rls=False)
+    try:
+        postgres.run(scenario)
+    finally:
+        event.remove(Session, "do_orm_execute", on_orm_execute)
@@ -1,5 +1,8 @@
 import { sql } from "drizzle-orm";
-import { pgTable, text, varchar, integer, real, timestamp, jsonb, index } from "drizzle-orm/pg-core";
+import {
+  pgTable, text, varchar, integer, bigserial, real, timestamp, jsonb, index, uniqueIndex, primaryKey, boolean, foreignKey,
+  type AnyPgColumn,
+} from "drizzle-orm/pg-core";
 import { createInsertSchema } from "drizzle-zod";
 import { z } from "zod";
 
@@ -17,6 +20,28 @@ export const sessions = pgTable(
 // User roles enum - Added super_admin for managing other admins
 export type UserRole = "super_admin" | "owner" | "admin_outlet" | "finance";
 
+// Franchise/operator dalam mode multi-tenant (MULTI_TENANT=true, backend/app/services/tenancy.py).
+// Semua tabel data memiliki tenant_id; NULL untuk data single-tenant dan akun platform.
+export const tenants = pgTable("tenants", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  name: text("name").notNull(),
+  rateLimit: integer("rate_limit"), // request per menit per worker; NULL = TENANT_RATE_LIMIT
+  maxConnections: integer("max_connections"), // request bersamaan per worker; NULL = TENANT_MAX_CONNECTIONS
+  createdAt: timestamp("created_at").defaultNow(),
+});
+
+export type Tenant = typeof tenants.$inferSelect;
+
+const tenantId = () => varchar("tenant_id").references((): AnyPgColumn => tenants.id);
+
+// Outlet yang dirujuk harus milik tenant yang sama (tidak dicek selama tenant_id NULL)
+const tenantOutletFk = (name: string, tenantColumn: AnyPgColumn, outletColumn: AnyPgColumn) =>
+  foreignKey({
+    name: `FK_${name}_tenant_outlet`,
+    columns: [tenantColumn, outletColumn],
+    foreignColumns: [outlets.tenantId, outlets.id],
+  });
+
 // Users table - Extended from Replit Auth with role-based access
 // password field is optional - only used for admin users created by SUPER_ADMIN
 export const users = pgTable("users", {
@@ -30,7 +55,11 @@ export const users = pgTable("users", {
   assignedOutletId: varchar("assigned_outlet_id"), // For admin_outlet role
   createdAt: timestamp("created_at").defaultNow(),
   updatedAt: timestamp("updated_at").defaultNow(),
-});
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("users", table.tenantId, table.assignedOutletId),
+  index("IDX_users_tenant").on(table.tenantId),
+]);
 
 export type UpsertUser = typeof users.$inferInsert;
 export type User = typeof users.$inferSelect;
@@ -55,11 +84,34 @@ export const outlets = pgTable("outlets", {
   name: text("name").notNull(),
   cogsPerPiece: real("cogs_per_piece").notNull().default(0),
   createdAt: timestamp("created_at").notNull().defaultNow(),
-});
+  updatedAt: timestamp("updated_at").notNull().defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  // Tujuan FK (tenant_id, outlet_id) tabel lain, sekaligus daftar outlet per tenant
+  uniqueIndex("IDX_outlets_tenant_id").on(table.tenantId, table.id),
+]);
+
+// Effective-dated COGS history per outlet (YYYY-MM-DD). A sale uses the row with
+// the latest effective_from <= sale date; outlets.cogs_per_piece holds today's value.
+export const outletCogs = pgTable("outlet_cogs", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  outletId: varchar("outlet_id").notNull(),
+  effectiveFrom: text("effective_from").notNull(),
+  cogsPerPiece: real("cogs_per_piece").notNull().default(0),
+  createdAt: timestamp("created_at").notNull().defaultNow(),
+  updatedAt: timestamp("updated_at").notNull().defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("outlet_cogs", table.tenantId, table.outletId),
+  uniqueIndex("IDX_outlet_cogs_outlet_effective").on(table.outletId, table.effectiveFrom),
+]);
+
+export type OutletCogs = typeof outletCogs.$inferSelect;
 
 export const insertOutletSchema = createInsertSchema(outlets).omit({
   id: true,
   createdAt: true,
+  updatedAt: true,
 });
 
 export type InsertOutlet = z.infer<typeof insertOutletSchema>;
@@ -67,7 +119,7 @@ export type Outlet = typeof outlets.$inferSelect;
 
 // Sales records table
 export const sales = pgTable("sales", {
-  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  id: varchar("id").notNull().default(sql`gen_random_uuid()`),
   outletId: varchar("outlet_id").notNull(),
   date: text("date").notNull(), // YYYY-MM-DD format
   cash: real("cash").notNull().default(0),
@@ -83,7 +135,15 @@ export const sales = pgTable("sales", {
   soldOutTime: text("sold_out_time"), // HH:mm format
   createdAt: timestamp("created_at").notNull().defaultNow(),
   updatedAt: timestamp("updated_at").notNull().defaultNow(),
-});
+  tenantId: tenantId(),
+}, (table) => [
+  // Primary key memuat date karena tabel dipartisi per bulan (backend/archive.py)
+  primaryKey({ columns: [table.id, table.date] }),
+  tenantOutletFk("sales", table.tenantId, table.outletId),
+  index("IDX_sales_outlet_date").on(table.outletId, table.date),
+  // Ringkasan semua outlet tenant per rentang tanggal
+  index("IDX_sales_tenant_date").on(table.tenantId, table.date),
+]);
 
 export const insertSalesSchema = createInsertSchema(sales).omit({
   id: true,
@@ -159,7 +219,7 @@ export type ExpenseType = "harian" | "bulanan" | "gaji";
 
 // Expenses table
 export const expenses = pgTable("expenses", {
-  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  id: varchar("id").notNull().default(sql`gen_random_uuid()`),
   outletId: varchar("outlet_id").notNull(),
   date: text("date").notNull(), // YYYY-MM-DD format
   type: varchar("type").$type<ExpenseType>().notNull(), // "harian" atau "bulanan"
@@ -168,7 +228,16 @@ export const expenses = pgTable("expenses", {
   proofUrl: text("proof_url"), // URL to uploaded proof file (photo/PDF)
   createdAt: timestamp("created_at").notNull().defaultNow(),
   updatedAt: timestamp("updated_at").notNull().defaultNow(),
-});
+  tenantId: tenantId(),
+}, (table) => [
+  // Primary key memuat date karena tabel dipartisi per bulan (backend/archive.py)
+  primaryKey({ columns: [table.id, table.date] }),
+  tenantOutletFk("expenses", table.tenantId, table.outletId),
+  index("IDX_expenses_outlet_date").on(table.outletId, table.date),
+  index("IDX_expenses_tenant_date").on(table.tenantId, table.date),
+  // Pencarian deskripsi (GET /api/expenses/search), butuh: CREATE EXTENSION pg_trgm
+  index("IDX_expenses_description_trgm").using("gin", sql`${table.description} gin_trgm_ops`),
+]);
 
 export const insertExpenseSchema = createInsertSchema(expenses).omit({
   id: true,
@@ -201,3 +270,158 @@ export type Expense = typeof expenses.$inferSelect;
 export type ExpenseWithOutlet = Expense & {
   outletName?: string;
 };
+
+// Production forecasts - precomputed nightly by the FastAPI backend
+// One row per outlet per weekday (0 = Monday)
+export const productionForecasts = pgTable("production_forecasts", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  outletId: varchar("outlet_id").notNull(),
+  weekday: integer("weekday").notNull(),
+  forecastDemand: real("forecast_demand").notNull().default(0),
+  demandStd: real("demand_std").notNull().default(0),
+  recommendedProduction: integer("recommended_production").notNull().default(0),
+  observations: integer("observations").notNull().default(0),
+  soldOutRate: real("sold_out_rate").notNull().default(0),
+  computedAt: timestamp("computed_at").defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("production_forecasts", table.tenantId, table.outletId),
+  uniqueIndex("IDX_production_forecasts_outlet_weekday").on(table.outletId, table.weekday),
+]);
+
+export type ProductionForecast = typeof productionForecasts.$inferSelect;
+
+// Antrian job latar belakang (laporan/ekspor berat), diproses oleh backend FastAPI
+export const jobs = pgTable("jobs", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  type: varchar("type").notNull(),
+  status: varchar("status").notNull().default("queued"), // queued, running, succeeded, failed, cancelled
+  params: jsonb("params").notNull().default({}),
+  result: jsonb("result"),
+  resultPath: text("result_path"),
+  error: text("error"),
+  attempts: integer("attempts").notNull().default(0),
+  cancelRequested: boolean("cancel_requested").notNull().default(false),
+  createdBy: varchar("created_by"),
+  createdAt: timestamp("created_at").defaultNow(),
+  startedAt: timestamp("started_at"),
+  heartbeatAt: timestamp("heartbeat_at"),
+  finishedAt: timestamp("finished_at"),
+  tenantId: tenantId(),
+}, (table) => [
+  index("IDX_jobs_status_type").on(table.status, table.type, table.createdAt),
+  index("IDX_jobs_created_by").on(table.createdBy, table.createdAt),
+  index("IDX_jobs_tenant_created").on(table.tenantId, table.createdAt),
+]);
+
+export type Job = typeof jobs.$inferSelect;
+
+// Template pengeluaran berulang (bulanan/gaji), dibuat otomatis per periode tanggal 10-9
+export const recurringExpenses = pgTable("recurring_expenses", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  outletId: varchar("outlet_id").notNull(),
+  type: varchar("type").$type<ExpenseType>().notNull().default("bulanan"),
+  description: text("description").notNull(),
+  amount: real("amount").notNull(),
+  dayOfMonth: integer("day_of_month").notNull().default(10), // 1-28
+  startPeriod: text("start_period").notNull(), // YYYY-MM-10
+  endPeriod: text("end_period"),
+  lastPeriod: text("last_period"), // periode terakhir yang sudah dibuat
+  active: boolean("active").notNull().default(true),
+  createdBy: varchar("created_by"),
+  createdAt: timestamp("created_at").defaultNow(),
+  updatedAt: timestamp("updated_at").defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("recurring_expenses", table.tenantId, table.outletId),
+  index("IDX_recurring_expenses_outlet").on(table.outletId),
+]);
+
+export type RecurringExpense = typeof recurringExpenses.$inferSelect;
+
+// Jendela bergulir metrik harian per outlet x hari (0 = Senin) untuk deteksi anomali
+export const salesBaselines = pgTable("sales_baselines", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  outletId: varchar("outlet_id").notNull(),
+  weekday: integer("weekday").notNull(),
+  history: jsonb("history").notNull().default([]), // [[tanggal, [nilai per metrik]], ...]
+  updatedAt: timestamp("updated_at").defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("sales_baselines", table.tenantId, table.outletId),
+  uniqueIndex("IDX_sales_baselines_outlet_weekday").on(table.outletId, table.weekday),
+]);
+
+// Anomali penjualan harian (robust z-score), dibuat oleh backend FastAPI
+export const salesAnomalies = pgTable("sales_anomalies", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  outletId: varchar("outlet_id").notNull(),
+  saleId: varchar("sale_id"),
+  date: text("date").notNull(), // YYYY-MM-DD
+  metric: varchar("metric").notNull(), // revenue, cash, ..., returnRate, waste
+  value: real("value").notNull(),
+  expected: real("expected").notNull(), // median jendela pembanding
+  score: real("score").notNull(),
+  observations: integer("observations").notNull().default(0),
+  acknowledged: boolean("acknowledged").notNull().default(false),
+  detectedAt: timestamp("detected_at").defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("sales_anomalies", table.tenantId, table.outletId),
+  uniqueIndex("IDX_sales_anomalies_outlet_date_metric").on(table.outletId, table.date, table.metric),
+  index("IDX_sales_anomalies_tenant_date").on(table.tenantId, table.date),
+]);
+
+export type SalesAnomaly = typeof salesAnomalies.$inferSelect;
+
+// Kode toko/merchant di platform delivery, untuk rekonsiliasi file settlement ke outlet
+export const platformAccounts = pgTable("platform_accounts", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  outletId: varchar("outlet_id").notNull(),
+  platform: varchar("platform").notNull(), // grab, gofood, shopee, tiktok
+  externalId: varchar("external_id").notNull(),
+  createdAt: timestamp("created_at").defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  tenantOutletFk("platform_accounts", table.tenantId, table.outletId),
+  uniqueIndex("IDX_platform_accounts_platform_external").on(table.platform, table.externalId),
+]);
+
+export type PlatformAccount = typeof platformAccounts.$inferSelect;
+
+// Diisi trigger backend (services/sync.py); dibaca outlet edge lewat /api/sync/pull
+export const changeLog = pgTable("change_log", {
+  id: bigserial("id", { mode: "number" }).primaryKey(),
+  tableName: varchar("table_name").notNull(),
+  rowId: varchar("row_id").notNull(),
+  outletId: varchar("outlet_id"),
+  date: varchar("date"),
+  op: varchar("op").notNull(), // upsert, delete
+  changedAt: timestamp("changed_at").defaultNow(),
+  tenantId: tenantId(),
+}, (table) => [
+  index("IDX_change_log_outlet_id").on(table.outletId, table.id),
+  index("IDX_change_log_tenant_id").on(table.tenantId, table.id),
+]);
+
+export type ChangeLogEntry = typeof changeLog.$inferSelect;
+
+export const auditLog = pgTable("audit_log", {
+  id: bigserial("id", { mode: "number" }).primaryKey(),
+  entity: varchar("entity").notNull(), // sales, expenses
+  entityId: varchar("entity_id").notNull(),
+  outletId: varchar("outlet_id"),
+  date: varchar("date"),
+  action: varchar("action").notNull(), // create, update, delete
+  userId: varchar("user_id"),
+  changes: jsonb("changes").notNull().default({}),
+  changedAt: timestamp("changed_at").notNull(),
+  tenantId: tenantId(),
+}, (table) => [
+  index("IDX_audit_log_entity").on(table.entity, table.entityId, table.changedAt),
+  index("IDX_audit_log_outlet_date").on(table.outletId, table.date),
+  index("IDX_audit_log_changed_at").on(table.changedAt),
+  index("IDX_audit_log_tenant_changed_at").on(table.tenantId, table.changedAt),
+]);
+
+export type AuditLogEntry = typeof auditLog.$inferSelect;